@@ -10,7 +10,6 @@ import subprocess
 import argparse
 import json
 import pymongo
-import numpy
 import uuid
 import socket
 import functools
@@ -18,8 +17,9 @@ from prettytable import PrettyTable
 from datetime import datetime
 from dateutil import tz
 
-from mdbaas.opsmgrutil import OpsMgrConnector, OpsManagerGroupRole
-from mdbaas.errors import HostNotFoundError
+from mdbaas.opsmgrutil import OpsMgrConnector, OpsManagerGroupRole, ProjectHostIndex, HostnameIndex, MeasurementPlanner
+from mdbaas.errors import HostNotFoundError, ApiRequestError
+from mdbaas.util import ResponseCache, MeasurementSet, LazyJson, loads
 
 from operator import itemgetter
 
@@ -93,12 +93,12 @@ def findHostData(hostName, hostType=MONGOD):
 
     logging.info("Looking for group with id {} in ops manager...".format(groupId))
     matchingHost = None
-    hostsInGroup = opsMgrConnector.getHosts(groupId)
-    for host in hostsInGroup["results"]:
-        logging.debug("Checking if hostname {} is in host".format(hostName, json.dumps(host, indent=4)))
+    hostsInGroup = hostIndex.getHostsForGroup(groupId)
+    for host in hostsInGroup:
+        logging.debug("Checking if hostname %s is in host %s", hostName, LazyJson(host))
         if isHostOfType(host, hostType) and host["hostname"] == hostName:
             matchingHost = host
-    logging.debug("Found matching host {}".format(json.dumps(matchingHost, indent=4)))
+    logging.debug("Found matching host %s", LazyJson(matchingHost))
 
     if matchingHost is None:
         raise HostNotFoundError(hostName)
@@ -158,20 +158,7 @@ def findGroupIdForHostDataInOpsManager(hostNames):
     :return:
     """
     logging.debug("Finding group id for host with name {} in Ops Manager".format(str(hostNames)))
-
-    groups = opsMgrConnector.getAllGroups()
-    for group in groups["results"]:
-        logging.debug("Found group {}".format(json.dumps(group, indent=4)))
-        groupId = group["id"]
-
-        logging.debug("Fetching hosts for group {}".format(groupId))
-        hosts = opsMgrConnector.getHosts(groupId)
-        for host in hosts["results"]:
-            for hostName in hostNames:
-                logging.debug("Inspecting host {} attempting to find host {}".format(json.dumps(host, indent=4), hostName))
-                if host["hostname"] == hostName:
-                    return groupId
-    return None
+    return hostnameIndex.findGroupId(hostNames)
 
 
 def getMeasurementsForHost(groupId, hostId):
@@ -194,13 +181,14 @@ def getMeasurementsForHost(groupId, hostId):
     ]
     granularity = "PT1M"  # 1 minute granularity
     period = "PT1H"  # 1 hour back
-    diskMeasurementData = None
+    diskMeasurementData = []
 
+    # Plan the disk and host measurement requests together so they are sent at the same time
+    planner = MeasurementPlanner(opsMgrConnector, maxWorkers=2)
+    diskRequest = None
     if diskForDataDir is not None:
-        diskMeasurementData = opsMgrConnector.getDiskPartitionMeasurementOverPeriodForHost(groupId, hostId, diskForDataDir["partitionName"],
-                                                                                          granularity, period, diskMeasurementTypes)
-        logging.debug("Got disk measurementsdata : {}".format(json.dumps(diskMeasurementData, indent=4)))
-        diskMeasurementData = diskMeasurementData["measurements"]
+        diskRequest = planner.addDiskRequest(groupId, hostId, diskForDataDir["partitionName"], diskMeasurementTypes,
+                                             granularity, period)
 
     hostMeasurementTypes = [
         "CONNECTIONS",
@@ -226,8 +214,14 @@ def getMeasurementsForHost(groupId, hostId):
         "QUERY_TARGETING_SCANNED_OBJECTS_PER_RETURNED"
     ]
 
-    measurementsData = opsMgrConnector.getMeasurementsOverPeriodForHost(groupId, hostId, granularity, period, hostMeasurementTypes)
-    logging.debug("Got measurements data : {}".format(json.dumps(measurementsData, indent=4)))
+    hostRequest = planner.addHostRequest(groupId, hostId, hostMeasurementTypes, granularity, period)
+    planner.execute()
+
+    if diskRequest is not None:
+        logging.debug("Got disk measurementsdata : %s", LazyJson(diskRequest.getResult()))
+        diskMeasurementData = diskRequest.getResult()["measurements"]
+    measurementsData = hostRequest.getResult()
+    logging.debug("Got measurements data : %s", LazyJson(measurementsData))
     measurementsData["measurements"].extend(diskMeasurementData)
     return measurementsData
 
@@ -250,7 +244,7 @@ def getSlowQueryLogForTime(groupId, hostId, timePeriod):
     :return:
     """
     resp = opsMgrConnector.getSlowQueryLogsForGroupAndHost(groupId, hostId, timePeriod, None, None, None)
-    logging.debug("Got slow query logs resp {}".format(json.dumps(resp, indent=4)))
+    logging.debug("Got slow query logs resp %s", LazyJson(resp))
 
     if "errorCode" in resp and resp["errorCode"] == "USER_UNAUTHORIZED":
         logging.debug("Creating a temporary project-level API key...")
@@ -330,16 +324,30 @@ def getSlowQueryLogsForLastHour(groupId, hostId):
     :return:
     """
     lastHourInMillis = 60*60*1000
+    try:
+        # Decode the slow query logs one at a time as they are read rather than the whole response at once
+        return cleanSlowQueryLogs(opsMgrConnector.iterSlowQueryLogsForGroupAndHost(groupId, hostId, lastHourInMillis,
+                                                                                   None, None, None))
+    except ApiRequestError as e:
+        logging.debug("Streaming slow query logs failed with %s", e)
     slowQueryLogs = getSlowQueryLogForTime(groupId, hostId, lastHourInMillis)
+    return cleanSlowQueryLogs(slowQueryLogs["slowQueries"])
+
+
+def cleanSlowQueryLogs(slowQueryLogs):
+    """
+    Clean Slow Query Logs
 
-    # Remove system collections
+    :param slowQueryLogs:   An iterable of slow query log documents
+    :return:                An array of the logs of non-system namespaces, with each log line decoded
+    """
     slowQueryLogsCleaned = []
-    for log in slowQueryLogs["slowQueries"]:
+    for log in slowQueryLogs:
         if isSystemNamespace(log["namespace"]):
             continue
         jsonLog = {
             "namespace": log["namespace"],
-            "line": json.loads(log["line"])
+            "line": loads(log["line"])
         }
         slowQueryLogsCleaned.append(jsonLog)
 
@@ -408,7 +416,7 @@ def summarizeLogs(slowQueryLogs):
     logging.debug("Summarizing logs")
     logsPerNamespace = {}
     for slowQueryLog in slowQueryLogs:
-        logging.debug("Got log {}".format(json.dumps(slowQueryLog, indent=4)))
+        logging.debug("Got log %s", LazyJson(slowQueryLog))
         logsForNS = logsPerNamespace.get(slowQueryLog["namespace"], [])
         logsForNS.append(slowQueryLog)
         logsPerNamespace[slowQueryLog["namespace"]] = logsForNS
@@ -451,7 +459,7 @@ def summarizeLogs(slowQueryLogs):
             "totalTimeWritingMicros": totalTimeWritingMicros,
             "avgTimeWritingMicros": totalTimeWritingMicros / len(logsForNS)
         }
-        logging.debug("Computed total for namespace {}: {}".format(namespace, json.dumps(totalsForNamespace, indent=4)))
+        logging.debug("Computed total for namespace %s: %s", namespace, LazyJson(totalsForNamespace))
     printLogSummaryTable(totalsForNamespace)
 
 def getTotalDurationFromLogEntry(logEntry):
@@ -658,7 +666,7 @@ def getHealthCheckData(hostName):
     """
     logging.info("Getting health check data")
     hostInfo = findHostData(hostName)
-    logging.debug("Found info for host {}".format(json.dumps(hostInfo, indent=4)))
+    logging.debug("Found info for host %s", LazyJson(hostInfo))
     measurementsData = getMeasurementsForHost(hostInfo["projectId"], hostInfo["hostId"])
 
 
@@ -682,14 +690,12 @@ def getHealthCheckData(hostName):
         },
         "measurements" : { }
     }
-    for measurement in measurementsData["measurements"]:
-        rawData = []
-        for dataValue in measurement["dataPoints"]:
-            if dataValue["value"] is not None:
-                rawData.append(dataValue["value"])          # TODO -- do we need to handle Null values?
-        measurementsMap["measurements"][measurement["name"]] = {
-            "data" : measurement["dataPoints"],
-            "rawData" : rawData
+    measurementSet = MeasurementSet(measurementsData)
+    for measurementName in measurementSet.names():
+        series = measurementSet[measurementName]
+        measurementsMap["measurements"][measurementName] = {
+            "data" : series.dataPoints,
+            "rawData" : series.nonNullValues
         }
 
     NOT_AVAILABLE = "N/A"
@@ -724,19 +730,19 @@ def getHealthCheckData(hostName):
     for measurement in measurementsMap["measurements"]:
 
         logging.debug("Creating measurement map for measurement {}".format(measurement))
-        data = measurementsMap["measurements"][measurement]["data"]
-        rawData = measurementsMap["measurements"][measurement]["rawData"]
+        series = measurementSet[measurement]
 
-        measurementsMap["measurements"][measurement]["current"] = rawData[len(rawData) - 1]
-        measurementsMap["measurements"][measurement]["avg"] = numpy.mean(rawData)       # TODO -- consider exponential moving avg
-        measurementsMap["measurements"][measurement]["stdev"] = numpy.std(rawData)
+        measurementsMap["measurements"][measurement]["current"] = series.current()
+        measurementsMap["measurements"][measurement]["avg"] = series.mean()       # TODO -- consider exponential moving avg
+        measurementsMap["measurements"][measurement]["stdev"] = series.std()
 
         measurementThreshold = measurementThresholdsOfConcern[measurement]
         if NOT_AVAILABLE == measurementThreshold:
             measurementsMap["measurements"][measurement]["pctAbove80"] = NOT_AVAILABLE
         else:
-            measurementsMap["measurements"][measurement]["pctAbove80"] = getPercentOfDataAboveThreshold(rawData, measurementThreshold)
-        measurementsMap["measurements"][measurement]["pctGrowth"] = getDataGrowth(rawData)  # TODO -- consider checking growth (max / over start, like candlestick chart)
+            logging.info("Getting percentage of data above threshold {}".format(measurementThreshold))
+            measurementsMap["measurements"][measurement]["pctAbove80"] = series.percentAboveThreshold(measurementThreshold)
+        measurementsMap["measurements"][measurement]["pctGrowth"] = series.growth()  # TODO -- consider checking growth (max / over start, like candlestick chart)
 
     slowQueryLogs = getSlowQueryLogsForLastHour(hostInfo["projectId"], hostInfo["hostId"])
     collscans = [ logEntry for logEntry in slowQueryLogs if isCollScan(logEntry) ]
@@ -763,40 +769,6 @@ def isCollScan(jsonLogLine):
         return False
 
 
-def getDataGrowth(data):
-    """
-    Get Data Growth
-
-    :param data:
-    :return:
-    """
-    if data is None:
-        return None
-    if len(data) == 0:
-        return None
-    if data[0] == 0 and data[len(data)-1] == 0:
-        return 0
-    elif data[0] == 0:
-        data[0] = 1
-    growthPercent = 100*(float(data[len(data)-1]) / float(data[0]) - 1.0)
-    return growthPercent
-
-def getPercentOfDataAboveThreshold(data, threshold):
-    """
-    Get Percent of Data Above Threshold
-
-    :param data:
-    :param threshold:
-    :return:
-    """
-    logging.info("Getting percentage of data above threshold {}".format(threshold))
-    numDataPtsAboveThreshold = 0
-    for dataPt in data:
-        if dataPt > threshold:
-            numDataPtsAboveThreshold+=1
-    return 100*float(numDataPtsAboveThreshold)/float(len(data))
-
-
 def checkOsCompatibility():
     """
     Check OS Compatibility
@@ -826,8 +798,12 @@ def setupArgs():
     parser.add_argument('--sortCollScansByDuration',    required=False, action="store_true", dest='sortCollScansByDuration', default=False,           help='Include flag to sort collection scans by duration.')
     parser.add_argument('--logFilePath',                required=False, action="store", dest='logFilePath',             default=False,           help='Path to slow query log file')
     parser.add_argument('--loglevel',                   required=False, action="store", dest='logLevel',                default='info',                 help='Log level. Possible values are [none, info, debug]')
+    parser.add_argument('--cacheFile',                  required=False, action="store", dest='cacheFile',               default=None,                 help='Path of a file in which to cache slow changing ops manager metadata between runs; caching is off if not used')
+    parser.add_argument('--hostIndexFile',              required=False, action="store", dest='hostIndexFile',           default=None,                 help='Path of a file in which to keep the hostname to project index between runs')
+    parser.add_argument('--refresh',                    required=False, action="store_true", dest='refresh',            default=False,                help='Include flag to refetch all cached metadata')
+    parser.add_argument('--metricsFile',                required=False, action="store", dest='metricsFile',             default=None,                 help='Path of a file to which to write per endpoint API call metrics on exit; off if not used')
+    parser.add_argument('--metricsFormat',              required=False, action="store", dest='metricsFormat',           default='json',               help='Format of the API call metrics. One of [json, prometheus]')
 
-    # TODO Command line arg for update/refresh
     return parser.parse_args()
 
 def _configureLogger(logLevel):
@@ -888,11 +864,25 @@ def main():
     # checkOsCompatibility()
 
     # Get Ops Manager connection
+    responseCache = None
+    if args.cacheFile is not None:
+        responseCache = ResponseCache(args.cacheFile, refresh=args.refresh)
     global opsMgrConnector
-    opsMgrConnector = OpsMgrConnector(args.opsMgrUri, args.opsMgrApiUser, args.opsMgrApiKey)
+    opsMgrConnector = OpsMgrConnector(args.opsMgrUri, args.opsMgrApiUser, args.opsMgrApiKey, responseCache=responseCache)
+    if args.metricsFile is not None:
+        opsMgrConnector.getApiMetrics().dumpOnExit(args.metricsFile, args.metricsFormat)
+
+    global hostIndex
+    hostIndex = ProjectHostIndex(opsMgrConnector)
+
+    global hostnameIndex
+    hostnameIndex = HostnameIndex(opsMgrConnector, hostIndex, path=args.hostIndexFile)
 
     # TODO -- add temporary project API key with project owner access; add current server's IP addr to whitelist
     conductHealthCheck(args.hostName, args.showCollScans, args.sortCollScansByDuration, args.logFilePath)
+    if responseCache is not None:
+        logging.info("Response cache stats: {}".format(responseCache.getStats()))
+        responseCache.close()
     # TODO -- remove temporary API key
 
 #-------------------------------
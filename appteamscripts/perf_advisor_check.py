@@ -12,12 +12,12 @@ import os
 import logging
 import subprocess
 import argparse
-import json
 from datetime import datetime
 # import matplotlib.pyplot as plt
 import numpy as np
 
 from mdbaas.atlasutil import AtlasConnector
+from mdbaas.util import LazyJson, loads
 
 # Script metadata
 version         = "1.0.0"
@@ -378,7 +378,7 @@ def collect_perf_advisor_data_for_project(groupId, max_num_queries=1000):
 
     processes_in_project = atlasConnector.get_processes_for_project(groupId)
     for process in processes_in_project["results"]:
-        logging.debug("Getting performance advisor data for process: {}".format(json.dumps(process, indent=4)))
+        logging.debug("Getting performance advisor data for process: %s", LazyJson(process))
         for cluster in report_data["clusters"]:
             if process["userAlias"] in cluster["hosts"]:
                 cluster["slowQueries"].extend(get_slow_queries(groupId, process, None))
@@ -470,7 +470,7 @@ def get_cluster_info_for_all_clusters(group_id):
     clusterData = []
     clusters = atlasConnector.get_clusters_for_project(group_id)
     for cluster in clusters["results"]:
-        logging.debug("Getting info for cluster {}".format(json.dumps(cluster, indent=4)))
+        logging.debug("Getting info for cluster %s", LazyJson(cluster))
         clusterInfo = {
             "clusterName": cluster["name"],
             "mdbVersion": cluster["mongoDBVersion"],
@@ -510,7 +510,7 @@ def get_slow_queries(group_id, process, max_num_queries=1000):
         process_id_parts = process["id"].split(":")
         port = process_id_parts[1]
         slow_query["processName"] = "{}:{}".format(process["userAlias"], port)
-        slow_query["logData"] = json.loads(slow_query["line"])
+        slow_query["logData"] = loads(slow_query["line"])
 
     sorted_queries = sorted(slow_queries["slowQueries"], key=lambda x:x['logData']['attr']['durationMillis'], reverse=True)
     if max_num_queries is None:
@@ -1,3 +1,4 @@
 import sys
 sys.path.append('')
-from mdbaas.atlasutil.connector import AtlasConnector
\ No newline at end of file
+from mdbaas.atlasutil.connector import AtlasConnector
+from mdbaas.atlasutil.asyncconnector import AsyncAtlasConnector
\ No newline at end of file
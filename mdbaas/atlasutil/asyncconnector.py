@@ -0,0 +1,43 @@
+import sys
+sys.path.append('')
+from mdbaas.util.session import DEFAULT_MAX_RETRIES
+from mdbaas.util.singleflight import AsyncSingleFlight
+from mdbaas.util.asyncsession import AsyncPooledSession, AsyncRequestMethods, DEFAULT_ASYNC_POOL_MAXSIZE
+from mdbaas.atlasutil.connector import AtlasConnector, ATLAS_URL
+
+
+class AsyncAtlasConnector(AsyncRequestMethods, AtlasConnector):
+    """
+    AsyncAtlasConnector class
+
+    The asyncio twin of AtlasConnector, with the same methods; every API method returns a coroutine, e.g.
+    await connector.get_slow_queries(group_id, process_id). All requests share one httpx connection pool and one
+    digest auth state.
+    """
+    def __init__(self, apiUser, apiKey, poolMaxSize=DEFAULT_ASYNC_POOL_MAXSIZE, keepAlive=True, maxInFlight=None,
+                 maxRetries=DEFAULT_MAX_RETRIES, apiMetrics=None, coalesceGets=True,
+                 atlasUri=ATLAS_URL, compress=True):
+        """
+        Constructor to create an AsyncAtlasConnector object.
+
+        :param apiUser:         The api user with which we will authenticate to Atlas
+        :param apiKey:          The api key for the api user with which we will authenticate to Atlas
+        :param poolMaxSize:     The maximum number of connections to open to Atlas
+        :param keepAlive:       Whether or not to keep connections open between requests
+        :param maxInFlight:     The maximum number of requests outstanding against Atlas at once, or
+                                None for no cap; the cap shrinks while Atlas pushes back
+        :param maxRetries:      The number of times to resend a request that was throttled or failed with a 5xx
+        :param apiMetrics:      The ApiMetrics in which to record every request, by default the shared one
+        :param coalesceGets:    Whether or not to merge identical GET requests made at the same time into one request
+        :param atlasUri:        The uri of Atlas, e.g. that of an ApiSimulator for offline runs
+        :param compress:        Whether or not to ask for compressed responses
+        """
+        self.atlasUri = atlasUri
+        self.staticDataUrl = "{}/static/".format(self.atlasUri)
+        self.v1ApiURL = "{}/api/atlas/v1.0".format(self.atlasUri)
+        self.v2ApiURL = "{}/api/atlas/v2.0".format(self.atlasUri)
+        self.httpSession = AsyncPooledSession(apiUser, apiKey, poolMaxSize=poolMaxSize, keepAlive=keepAlive,
+                                              maxInFlight=maxInFlight, maxRetries=maxRetries, apiMetrics=apiMetrics,
+                                              compress=compress)
+        self.auth   = self.httpSession.auth
+        self.singleFlight = AsyncSingleFlight() if coalesceGets else None
@@ -1,10 +1,12 @@
 import sys
 sys.path.append('')
-import requests
 import logging
 import json
 import math
-from requests.auth import HTTPDigestAuth
+from mdbaas.util.session import PooledSession, DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE, DEFAULT_MAX_RETRIES
+from mdbaas.util.lazylog import LazyJson
+from mdbaas.util.singleflight import SingleFlight
+from mdbaas.util.jsondecode import loads
 
 # Other constants
 GROUPS_PER_PAGE = 100
@@ -14,29 +16,75 @@ MAX_GROUPS_PER_PAGE = 500
 
 EXTERNAL_OPS_MANAGER_URL = "https://opsmanager.mongodb.com"
 
+ATLAS_URL = "https://cloud.mongodb.com"
+
 class AtlasConnector:
     """
     AtlasConnector class
 
     A wrapper class that sends requests to Atlas
     """
-    def __init__(self, apiUser, apiKey):
+    def __init__(self, apiUser, apiKey, poolConnections=DEFAULT_POOL_CONNECTIONS, poolMaxSize=DEFAULT_POOL_MAXSIZE,
+                 keepAlive=True, maxInFlight=None, maxRetries=DEFAULT_MAX_RETRIES, apiMetrics=None,
+                 coalesceGets=True, atlasUri=ATLAS_URL, compress=True):
         """
         Constructor to create an OpsMgrConnector object.
 
-        :param opsMgrUri:   The uri to the target ops manager
-        :param apiUser:     The api user with which we will authenticate to the target ops manager
-        :param apiKey:      The api key for the api user with which we will authenticate to the target ops manager
+        :param opsMgrUri:       The uri to the target ops manager
+        :param apiUser:         The api user with which we will authenticate to the target ops manager
+        :param apiKey:          The api key for the api user with which we will authenticate to the target ops manager
+        :param poolConnections: The number of distinct hosts for which to keep a connection pool
+        :param poolMaxSize:     The maximum number of connections to keep alive to Atlas
+        :param keepAlive:       Whether or not to keep connections open between requests
+        :param maxInFlight:     The maximum number of requests outstanding against Atlas at once, or
+                                None for no cap; the cap shrinks while Atlas pushes back
+        :param maxRetries:      The number of times to resend a request that was throttled or failed with a 5xx
+        :param apiMetrics:      The ApiMetrics in which to record every request, by default the shared one
+        :param coalesceGets:    Whether or not to merge identical GET requests made at the same time into one request
+        :param atlasUri:        The uri of Atlas, e.g. that of an ApiSimulator for offline runs
+        :param compress:        Whether or not to ask for compressed responses
         """
-        self.atlasUri = "https://cloud.mongodb.com"
+        self.atlasUri = atlasUri
         self.staticDataUrl = "{}/static/".format(self.atlasUri)
         self.v1ApiURL = "{}/api/atlas/v1.0".format(self.atlasUri)
         self.v2ApiURL = "{}/api/atlas/v2.0".format(self.atlasUri)
-        self.auth   = HTTPDigestAuth(apiUser, apiKey)
+        self.httpSession = PooledSession(apiUser, apiKey, poolConnections=poolConnections, poolMaxSize=poolMaxSize,
+                                         keepAlive=keepAlive, maxInFlight=maxInFlight,
+                                         maxRetries=maxRetries, apiMetrics=apiMetrics, compress=compress)
+        self.auth   = self.httpSession.auth
+        self.singleFlight = SingleFlight() if coalesceGets else None
 
     def prettyPrint(self, payload):
         return json.dumps(payload, indent=4, sort_keys=True)
 
+    def getConnectionStats(self):
+        """
+        Get Connection Stats
+
+        :return:    A document with the number of requests sent, connections opened versus reused and GET requests
+                    merged into identical ones in flight
+        """
+        stats = self.httpSession.getConnectionStats()
+        if self.singleFlight is not None:
+            stats["coalescedGets"] = self.singleFlight.getMergedCount()
+        return stats
+
+    def getApiMetrics(self):
+        """
+        Get Api Metrics
+
+        :return:    The ApiMetrics in which the requests of this connector are recorded
+        """
+        return self.httpSession.apiMetrics
+
+    def close(self):
+        """
+        Close
+
+        Closes all pooled connections to Atlas
+        """
+        self.httpSession.close()
+
     ############################################################################
     # Base HTTP Request Methods
     ############################################################################
@@ -52,12 +100,12 @@ class AtlasConnector:
 
         :return:            The response from the request
         """
-        logging.debug("Sending a POST request to {} with payload:\n {}".format(url, self.prettyPrint(payload)))
-        result = requests.post(url, json=payload, auth=self.auth, verify=verifyBool).json()
+        logging.debug("Sending a POST request to %s with payload:\n %s", url, LazyJson(payload, sortKeys=True))
+        result = loads(self.httpSession.request("POST", url, verifyBool=verifyBool, json=payload).content)
         if "error" in result:
-            logging.debug("Encountered an error: {} ".format(self.prettyPrint(result)))  #TODO more sophisticated error handling
+            logging.debug("Encountered an error: %s ", LazyJson(result, sortKeys=True))  #TODO more sophisticated error handling
         else:
-            logging.debug("Received response: {}".format(self.prettyPrint(result)))
+            logging.debug("Received response: %s", LazyJson(result, sortKeys=True))
         return result
 
     def put(self, url, payload, verifyBool=True):
@@ -71,13 +119,13 @@ class AtlasConnector:
 
         :return:            The response from the request
         """
-        logging.debug("Sending a PUT request to {} with payload:\n {}".format(url, self.prettyPrint(payload)))
-        result = requests.put(url, json=payload, auth=self.auth, verify=verifyBool)
-        result = result.json()
+        logging.debug("Sending a PUT request to %s with payload:\n %s", url, LazyJson(payload, sortKeys=True))
+        result = self.httpSession.request("PUT", url, verifyBool=verifyBool, json=payload)
+        result = loads(result.content)
         if "error" in result:
-            logging.debug("Encountered an error {}: ".format(self.prettyPrint(result)))  #TODO more sophisticated error handling
+            logging.debug("Encountered an error %s: ", LazyJson(result, sortKeys=True))  #TODO more sophisticated error handling
         else:
-            logging.debug("Received response: {}".format(self.prettyPrint(result)))
+            logging.debug("Received response: %s", LazyJson(result, sortKeys=True))
         return result
 
     def patch(self, url, payload, verifyBool=True):
@@ -91,30 +139,45 @@ class AtlasConnector:
 
         :return:            The response from the request
         """
-        logging.debug("Sending a PATCH request to {} with payload:\n {}".format(url, self.prettyPrint(payload)))
-        result = requests.patch(url, json=payload, auth=self.auth, verify=verifyBool).json()
+        logging.debug("Sending a PATCH request to %s with payload:\n %s", url, LazyJson(payload, sortKeys=True))
+        result = loads(self.httpSession.request("PATCH", url, verifyBool=verifyBool, json=payload).content)
         if "error" in result:
-            logging.debug("Encountered an error: {}".format(self.prettyPrint(result)))  #TODO more sophisticated error handling
+            logging.debug("Encountered an error: %s", LazyJson(result, sortKeys=True))  #TODO more sophisticated error handling
         else:
-            logging.debug("Received response: {}".format(json.dumps(result)))
+            logging.debug("Received response: %s", LazyJson(result, indent=None))
         return result
 
     def get(self, url, verifyBool=True):
         """
         Get
 
-        Sends an HTTP get request to the target url
+        Sends an HTTP get request to the target url. Identical requests made by other threads while it is in flight
+        are merged into it and share its response.
+
+        :param url:         A String representing the url to which the request shall go
+
+        :return:            The response from the request
+        """
+        if self.singleFlight is None:
+            return self.sendGet(url, verifyBool=verifyBool)
+        return self.singleFlight.do((url, verifyBool), lambda: self.sendGet(url, verifyBool=verifyBool))
+
+    def sendGet(self, url, verifyBool=True):
+        """
+        Send Get
+
+        Sends an HTTP get request to the target url without merging it with identical requests in flight
 
         :param url:         A String representing the url to which the request shall go
 
         :return:            The response from the request
         """
-        logging.debug("Sending a GET request to {}".format(url))
-        result = requests.get(url, auth=self.auth, verify=verifyBool).json()
+        logging.debug("Sending a GET request to %s", url)
+        result = loads(self.httpSession.request("GET", url, verifyBool=verifyBool).content)
         if "error" in result:
-            logging.debug("Encountered an error: {}".format(self.prettyPrint(result)))  #TODO more sophisticated error handling
+            logging.debug("Encountered an error: %s", LazyJson(result, sortKeys=True))  #TODO more sophisticated error handling
         else:
-            logging.debug("Received response: {}".format(self.prettyPrint(result)))
+            logging.debug("Received response: %s", LazyJson(result, sortKeys=True))
         return result
 
     def delete(self, url, verifyBool=True):
@@ -127,15 +190,15 @@ class AtlasConnector:
 
         :return:            The response from the request
         """
-        logging.debug("Sending a DELETE request to {}".format(url))
-        result = requests.delete(url, auth=self.auth, verify=verifyBool)
+        logging.debug("Sending a DELETE request to %s", url)
+        result = self.httpSession.request("DELETE", url, verifyBool=verifyBool)
         if result.status_code == 204:
             return result
-        result = result.json()
+        result = loads(result.content)
         if "error" in result:
-            logging.debug("Encountered an error: {} ".format(self.prettyPrint(result)))  #TODO more sophisticated error handling
+            logging.debug("Encountered an error: %s ", LazyJson(result, sortKeys=True))  #TODO more sophisticated error handling
         else:
-            logging.debug("Received response: {} ".format(self.prettyPrint(result)))
+            logging.debug("Received response: %s ", LazyJson(result, sortKeys=True))
         return result
 
     def construct_query_params(self, params_dict):
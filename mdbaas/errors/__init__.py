@@ -3,4 +3,5 @@ sys.path.append('')
 from mdbaas.errors.omerrors import InvalidEnvironmentTypeError, InvalidDeploymentTopologyError, InvalidTshirtSizeError, InvalidChipsetError, \
     InvalidLocationError, ServerPoolsDisabledError, InsufficientServerPoolResourcesError, ErrorCodes, NoHostsToDeployToError, \
     NoHostsMatchingDeploymentTopologyError, NoMongoDbVersionSpecifiedError, ClusterNotFoundError, GroupNotFoundError, HostNotFoundError, \
-    NodeLaunchFailure, InvalidRoleError
+    NodeLaunchFailure, InvalidRoleError, RequestRetriesExhaustedError, ApiRequestError, \
+    AutomationConfigVersionConflictError
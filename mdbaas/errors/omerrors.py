@@ -90,6 +90,35 @@ class InvalidRoleError(ValueError):
     def __str__(self):
         return "InvalidRoleError: Role {} not a valid role!".format(self.role)
 
+class RequestRetriesExhaustedError(ValueError):
+    def __init__(self, method, url, attempts, statusCode):
+        self.method = method
+        self.url = url
+        self.attempts = attempts
+        self.statusCode = statusCode
+    def __str__(self):
+        return "RequestRetriesExhaustedError: {} {} still failed with status {} after {} attempts".format(
+            self.method, self.url, self.statusCode, self.attempts)
+
+class ApiRequestError(ValueError):
+    def __init__(self, url, statusCode, document):
+        self.url = url
+        self.statusCode = statusCode
+        self.document = document
+        self.errorCode = document.get("errorCode", None) if isinstance(document, dict) else None
+    def __str__(self):
+        return "ApiRequestError: {} failed with status {}: {}".format(self.url, self.statusCode, self.document)
+
+class AutomationConfigVersionConflictError(ValueError):
+    def __init__(self, groupId, expectedVersion, currentVersion=None):
+        self.groupId = groupId
+        self.expectedVersion = expectedVersion
+        self.currentVersion = currentVersion
+    def __str__(self):
+        return "AutomationConfigVersionConflictError: The automation config of group {} was modified since version {} " \
+               "was read (current version: {})".format(self.groupId, self.expectedVersion,
+                                                       "unknown" if self.currentVersion is None else self.currentVersion)
+
 class ErrorCodes():
     """
 
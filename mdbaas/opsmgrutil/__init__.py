@@ -1,6 +1,14 @@
 import sys
 sys.path.append('')
 from mdbaas.opsmgrutil.connector import OpsMgrConnector, MAX_GROUPS_PER_PAGE
+from mdbaas.opsmgrutil.asyncconnector import AsyncOpsMgrConnector
+from mdbaas.opsmgrutil.hostindex import ProjectHostIndex
+from mdbaas.opsmgrutil.hostnameindex import HostnameIndex
+from mdbaas.opsmgrutil.measurementplanner import MeasurementPlanner, MeasurementRequest
+from mdbaas.opsmgrutil.automationconfig import AutomationConfig
+from mdbaas.opsmgrutil.goalstate import GoalStateWaiter
+from mdbaas.opsmgrutil.bulkautomation import BulkAutomationUpdater, BulkUpdateStatus
+from mdbaas.opsmgrutil.topologyindex import TopologyIndex, getProcessHostAndPort
 from mdbaas.opsmgrutil.constants import MongoDTypeName, ServerPoolRequestStatusName, ServerPoolServerStatusName, ServerPoolRequestStatusName, AgentStatusName, AgentTypeName
 from mdbaas.opsmgrutil.serverpool import TShirtSizes, Chipset, EnvironmentType, Location, ServerPoolProperties, Tag
 from mdbaas.opsmgrutil.backupandrestore import BackupConfigStatusName, BackupConfigStorageEngineName
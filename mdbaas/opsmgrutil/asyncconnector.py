@@ -0,0 +1,158 @@
+import sys
+sys.path.append('')
+import asyncio
+import logging
+from collections import deque
+from mdbaas.util.session import DEFAULT_MAX_RETRIES
+from mdbaas.util.asyncsession import AsyncPooledSession, AsyncRequestMethods, DEFAULT_ASYNC_POOL_MAXSIZE
+from mdbaas.util.lazylog import LazyJson
+from mdbaas.util.singleflight import AsyncSingleFlight
+from mdbaas.util.jsondecode import loads, iterArrayItems
+from mdbaas.errors.omerrors import ApiRequestError
+from mdbaas.util.pagination import addPagingParams, DEFAULT_PAGE_WORKERS
+from mdbaas.opsmgrutil.connector import OpsMgrConnector, MAX_GROUPS_PER_PAGE
+
+
+class AsyncOpsMgrConnector(AsyncRequestMethods, OpsMgrConnector):
+    """
+    AsyncOpsMgrConnector class
+
+    The asyncio twin of OpsMgrConnector, with the same methods. Every API method returns a coroutine, e.g.
+    await connector.getHosts(groupId), and every iter method returns an async generator, e.g.
+    async for group in connector.iterGroups(). All requests share one httpx connection pool and one digest auth
+    state, so thousands of requests can be in flight on a single event loop.
+    """
+    def __init__(self, opsMgrUri, apiUser, apiKey, poolMaxSize=DEFAULT_ASYNC_POOL_MAXSIZE, keepAlive=True,
+                 maxInFlight=None, pageWorkers=DEFAULT_PAGE_WORKERS, responseCache=None, maxRetries=DEFAULT_MAX_RETRIES,
+                 apiMetrics=None, coalesceGets=True, compress=True):
+        """
+        Constructor to create an AsyncOpsMgrConnector object.
+
+        :param opsMgrUri:       The uri to the target ops manager
+        :param apiUser:         The api user with which we will authenticate to the target ops manager
+        :param apiKey:          The api key for the api user with which we will authenticate to the target ops manager
+        :param poolMaxSize:     The maximum number of connections to open to the target ops manager
+        :param keepAlive:       Whether or not to keep connections open between requests
+        :param maxInFlight:     The maximum number of requests outstanding against the target ops manager at once, or
+                                None for no cap; the cap shrinks while ops manager pushes back
+        :param pageWorkers:     The maximum number of pages of a list endpoint to fetch at the same time
+        :param responseCache:   An optional ResponseCache in which to keep GET responses of slow changing metadata
+                                between runs
+        :param maxRetries:      The number of times to resend a request that was throttled or failed with a 5xx
+        :param apiMetrics:      The ApiMetrics in which to record every request, by default the shared one
+        :param coalesceGets:    Whether or not to merge identical GET requests made at the same time into one request
+        :param compress:        Whether or not to ask for compressed responses
+        """
+        self.opsMgrUri = opsMgrUri
+        self.staticDataUrl = "{}/static/".format(opsMgrUri)
+        self.apiURL = "{}/api/public/v1.0".format(opsMgrUri)
+        self.httpSession = AsyncPooledSession(apiUser, apiKey, poolMaxSize=poolMaxSize, keepAlive=keepAlive,
+                                              maxInFlight=maxInFlight, maxRetries=maxRetries, apiMetrics=apiMetrics,
+                                              compress=compress)
+        self.auth   = self.httpSession.auth
+        self.pageWorkers = pageWorkers
+        self.responseCache = responseCache
+        self.singleFlight = AsyncSingleFlight() if coalesceGets else None
+
+    ############################################################################
+    # Base HTTP Request Methods
+    ############################################################################
+
+    async def sendGet(self, url, verifyBool=True):
+        if self.responseCache is not None and self.responseCache.isCacheable(url):
+            return await self.getCached(url, verifyBool=verifyBool)
+        return await self.getUncached(url, verifyBool=verifyBool)
+
+    async def getUncached(self, url, verifyBool=True):
+        return await AsyncRequestMethods.sendGet(self, url, verifyBool=verifyBool)
+
+    async def getCached(self, url, verifyBool=True):
+        entry = self.responseCache.lookup(url)
+        if entry is not None and entry.isFresh():
+            logging.debug("Serving GET request to %s from cache", url)
+            return entry.getDocument()
+
+        headers = {}
+        if entry is not None and entry.etag is not None:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.lastModified is not None:
+            headers["If-Modified-Since"] = entry.lastModified
+
+        logging.debug("Sending a GET request to %s", url)
+        response = await self.httpSession.request("GET", url, verifyBool=verifyBool, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            logging.debug("Cached response for %s is still valid", url)
+            self.responseCache.touch(url)
+            return entry.getDocument()
+
+        result = loads(response.content)
+        if "error" in result:
+            logging.debug("Encountered an error: %s", LazyJson(result, sortKeys=True))  #TODO more sophisticated error handling
+        else:
+            logging.debug("Received response: %s", LazyJson(result, sortKeys=True))
+            if response.status_code == 200:
+                self.responseCache.store(url, result, etag=response.headers.get("ETag"),
+                                         lastModified=response.headers.get("Last-Modified"))
+        return result
+
+    async def iterResponseItems(self, url, arrayKey="results", verifyBool=True):
+        """
+        Iterate Response Items
+
+        The async counterpart of OpsMgrConnector.iterResponseItems. The raw response is read in full, but the items
+        of the array are still decoded one at a time, so the decoded response is never held in memory at once.
+        """
+        logging.debug("Sending a GET request to %s", url)
+        response = await self.httpSession.request("GET", url, verifyBool=verifyBool)
+        if response.status_code >= 400:
+            raise ApiRequestError(url, response.status_code, loads(response.content))
+        for item in iterArrayItems([ response.content ], arrayKey):
+            yield item
+
+    ############################################################################
+    # Pagination Methods
+    ############################################################################
+
+    async def iterPages(self, url, itemsPerPage=MAX_GROUPS_PER_PAGE, verifyBool=True):
+        """
+        Iterate Pages
+
+        Lazily yields every page of a paginated list endpoint, in page order. The first page is only fetched once
+        and up to pageWorkers of the remaining pages are fetched concurrently once totalCount is known.
+
+        :param url:             A String representing the url of the list endpoint
+        :param itemsPerPage:    The number of items per page, by default the largest page size allowed
+
+        :return:                An async generator of page documents
+        """
+        firstPage = await self.get(addPagingParams(url, 1, itemsPerPage), verifyBool=verifyBool)
+        yield firstPage
+
+        totalCount = firstPage.get("totalCount", 0) if isinstance(firstPage, dict) else 0
+        numPages = -(-totalCount // itemsPerPage)
+        pending = deque()
+        nextPageNum = 2
+        try:
+            while nextPageNum <= numPages or pending:
+                while nextPageNum <= numPages and len(pending) < max(1, self.pageWorkers):
+                    pending.append(asyncio.ensure_future(
+                        self.get(addPagingParams(url, nextPageNum, itemsPerPage), verifyBool=verifyBool)))
+                    nextPageNum += 1
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def getAllPages(self, url, itemsPerPage=MAX_GROUPS_PER_PAGE, verifyBool=True):
+        doc             = {}
+        doc["results"]  = []
+        doc["totalCount"] = 0
+        async for page in self.iterPages(url, itemsPerPage=itemsPerPage, verifyBool=verifyBool):
+            doc["results"].extend(page.get("results", []))
+            doc["totalCount"] = page.get("totalCount", doc["totalCount"])
+        return doc
+
+    async def iterResults(self, url, itemsPerPage=MAX_GROUPS_PER_PAGE, verifyBool=True):
+        async for page in self.iterPages(url, itemsPerPage=itemsPerPage, verifyBool=verifyBool):
+            for result in page.get("results", []):
+                yield result
@@ -0,0 +1,266 @@
+import sys
+sys.path.append('')
+import logging
+from mdbaas.util.lazylog import LazyJson
+from mdbaas.errors.omerrors import ApiRequestError, AutomationConfigVersionConflictError
+
+# Top level sections of the automation config tracked for modification
+PROCESSES_SECTION       = "processes"
+REPLICA_SETS_SECTION    = "replicaSets"
+SHARDING_SECTION        = "sharding"
+AUTH_SECTION            = "auth"
+
+VERSION_CONFLICT_ERROR_CODES = [ "AUTOMATION_CONFIG_VERSION_CONFLICT", "CONFLICTING_AUTOMATION_CONFIG_VERSION" ]
+
+
+class AutomationConfig:
+    """
+    AutomationConfig class
+
+    A wrapper around the automation config document of a project that indexes its processes, replica sets, sharded
+    clusters and users by key, so a script can look up and modify any of them without scanning the whole document.
+    Modifications mark the sections they touch as dirty. save() sends nothing when no section is dirty, and refuses
+    to write the document back when the config was modified since it was read, instead of silently overwriting that
+    modification.
+    """
+    def __init__(self, document, groupId=None):
+        """
+        Constructor to create an AutomationConfig object.
+
+        :param document:    The automation config document as returned by ops manager
+        :param groupId:     The id of the group the automation config belongs to
+        """
+        self.document   = document
+        self.groupId    = groupId
+        self.dirty      = set()
+        self.reindex()
+
+    @classmethod
+    def load(cls, opsMgrConnector, groupId, verifyBool=True):
+        """
+        Load
+
+        Reads the current automation config of a group, bypassing any response cache
+
+        :param opsMgrConnector: The OpsMgrConnector used to read the automation config
+        :param groupId:         The id of the group whose automation config we wish to modify
+        :return:                An AutomationConfig
+        """
+        document = opsMgrConnector.getAutomationConfig(groupId, verifyBool=verifyBool, fresh=True)
+        if "error" in document:
+            raise ApiRequestError("automationConfig of group {}".format(groupId), document.get("error"), document)
+        return cls(document, groupId=groupId)
+
+    def reindex(self):
+        """
+        Reindex
+
+        Rebuilds the indexes from the document, needed only after the document was modified without going through
+        this class
+        """
+        self.processesByName = { process["name"] : process for process in self.document.get("processes", []) }
+        self.replicaSetsById = { replicaSet["_id"] : replicaSet for replicaSet in self.document.get("replicaSets", []) }
+        self.shardedClustersByName = { cluster["name"] : cluster for cluster in self.document.get("sharding", []) }
+        self.usersByKey = { (user["user"], user["db"]) : user for user in self.getAuth().get("usersWanted", []) }
+
+    ############################################################################
+    # Lookup Methods
+    ############################################################################
+
+    def getVersion(self):
+        return self.document.get("version", None)
+
+    def getAuth(self):
+        return self.document.get("auth", {})
+
+    def getProcess(self, processName):
+        """
+        Get Process
+
+        :param processName: The name of the process
+        :return:            The process document, or None if the config has no process with that name
+        """
+        return self.processesByName.get(processName, None)
+
+    def getReplicaSet(self, replicaSetId):
+        """
+        Get Replica Set
+
+        :param replicaSetId:    The _id of the replica set
+        :return:                The replica set document, or None if the config has no replica set with that _id
+        """
+        return self.replicaSetsById.get(replicaSetId, None)
+
+    def getReplicaSetProcesses(self, replicaSetId):
+        """
+        Get Replica Set Processes
+
+        :param replicaSetId:    The _id of the replica set
+        :return:                An array of the process documents of the members of the replica set
+        """
+        replicaSet = self.getReplicaSet(replicaSetId)
+        if replicaSet is None:
+            return []
+        processes = [ self.getProcess(member["host"]) for member in replicaSet.get("members", []) ]
+        return [ process for process in processes if process is not None ]
+
+    def getShardedCluster(self, clusterName):
+        """
+        Get Sharded Cluster
+
+        :param clusterName: The name of the sharded cluster
+        :return:            The sharding document of the cluster, or None if the config has no such cluster
+        """
+        return self.shardedClustersByName.get(clusterName, None)
+
+    def getUser(self, userName, dbName):
+        """
+        Get User
+
+        :param userName:    The name of the user
+        :param dbName:      The authentication database of the user
+        :return:            The user document from auth.usersWanted, or None if the config has no such user
+        """
+        return self.usersByKey.get((userName, dbName), None)
+
+    ############################################################################
+    # Modification Methods
+    ############################################################################
+
+    def markDirty(self, section):
+        """
+        Mark Dirty
+
+        Marks a section as modified, for callers that modify a document returned by this class directly
+
+        :param section: The top level key of the modified section, e.g. PROCESSES_SECTION
+        """
+        self.dirty.add(section)
+
+    def isDirty(self):
+        return len(self.dirty) > 0
+
+    def getDirtySections(self):
+        return sorted(self.dirty)
+
+    def setUserPassword(self, userName, dbName, newPass):
+        """
+        Set User Password
+
+        :param userName:    The name of the user
+        :param dbName:      The authentication database of the user
+        :param newPass:     The new password of the user
+        :return:            True if the user was found and changed, False otherwise
+        """
+        user = self.getUser(userName, dbName)
+        if user is None:
+            return False
+        user["initPwd"] = newPass
+        self.markDirty(AUTH_SECTION)
+        return True
+
+    def setAutomationAgentPassword(self, newPass):
+        """
+        Set Automation Agent Password
+
+        :param newPass: The new password of the automation agent user
+        :return:        True if the password was changed, False if it already was newPass
+        """
+        auth = self.document.setdefault("auth", {})
+        if auth.get("newAutoPwd", auth.get("autoPwd", None)) == newPass:
+            return False
+        auth["newAutoPwd"] = newPass
+        self.markDirty(AUTH_SECTION)
+        return True
+
+    def removeUsers(self, userKeys):
+        """
+        Remove Users
+
+        Removes users from auth.usersWanted and adds them to auth.usersDeleted, so the automation agent drops them
+        from the deployment. The users are removed in a single pass over usersWanted however many there are.
+
+        :param userKeys:    An iterable of (userName, dbName) tuples
+        :return:            An array of the (userName, dbName) tuples that were found and removed
+        """
+        removed = [ key for key in dict.fromkeys(userKeys) if key in self.usersByKey ]
+        if not removed:
+            return removed
+        removedKeys = set(removed)
+        auth = self.document.setdefault("auth", {})
+        auth["usersWanted"] = [ user for user in auth.get("usersWanted", [])
+                                if (user["user"], user["db"]) not in removedKeys ]
+
+        deletedByUser = { deleted["user"] : deleted for deleted in auth.setdefault("usersDeleted", []) }
+        for userName, dbName in removed:
+            del self.usersByKey[(userName, dbName)]
+            deleted = deletedByUser.get(userName, None)
+            if deleted is None:
+                deleted = { "user" : userName, "dbs" : [] }
+                deletedByUser[userName] = deleted
+                auth["usersDeleted"].append(deleted)
+            if dbName not in deleted["dbs"]:
+                deleted["dbs"].append(dbName)
+        self.markDirty(AUTH_SECTION)
+        return removed
+
+    def removeUser(self, userName, dbName):
+        """
+        Remove User
+
+        :param userName:    The name of the user
+        :param dbName:      The authentication database of the user
+        :return:            True if the user was found and removed, False otherwise
+        """
+        return len(self.removeUsers([ (userName, dbName) ])) > 0
+
+    ############################################################################
+    # Write Methods
+    ############################################################################
+
+    def checkVersion(self, opsMgrConnector, verifyBool=True):
+        """
+        Check Version
+
+        Confirms the automation config has not been modified since it was read, using the goal version reported by
+        the automation status, which is far smaller than the config itself
+
+        :param opsMgrConnector: The OpsMgrConnector used to read the automation status
+        """
+        status = opsMgrConnector.getAutomationStatus(self.groupId, verifyBool=verifyBool)
+        currentVersion = status.get("goalVersion", None)
+        if currentVersion is not None and self.getVersion() is not None and currentVersion != self.getVersion():
+            raise AutomationConfigVersionConflictError(self.groupId, self.getVersion(), currentVersion)
+
+    def save(self, opsMgrConnector, verifyBool=True, checkVersion=True):
+        """
+        Save
+
+        Writes the automation config back to ops manager if any section was modified. Ops manager only accepts the
+        whole document, so the whole document is sent.
+
+        :param opsMgrConnector: The OpsMgrConnector used to write the automation config
+        :param checkVersion:    Whether or not to confirm the config is unchanged on the server before writing it
+        :return:                The response from the request, or None if nothing was modified
+        """
+        if not self.isDirty():
+            logging.debug("Automation config of group {} is unchanged; not saving it".format(self.groupId))
+            return None
+        if checkVersion:
+            self.checkVersion(opsMgrConnector, verifyBool=verifyBool)
+
+        logging.debug("Saving automation config of group {} with modified sections {}".format(
+            self.groupId, self.getDirtySections()))
+        resp = opsMgrConnector.putAutomationConfig(self.groupId, self.document, verifyBool=verifyBool)
+        if isinstance(resp, dict) and "error" in resp:
+            if resp.get("error") == 409 or resp.get("errorCode", None) in VERSION_CONFLICT_ERROR_CODES:
+                raise AutomationConfigVersionConflictError(self.groupId, self.getVersion())
+            raise ApiRequestError("automationConfig of group {}".format(self.groupId), resp.get("error"), resp)
+        logging.debug("Saved automation config: %s", LazyJson(resp))
+
+        if isinstance(resp, dict) and "version" in resp:
+            self.document["version"] = resp["version"]
+        elif self.getVersion() is not None:
+            self.document["version"] = self.getVersion() + 1
+        self.dirty.clear()
+        return resp
@@ -0,0 +1,201 @@
+import sys
+sys.path.append('')
+import time
+import random
+import logging
+from prettytable import PrettyTable
+from mdbaas.util.crawler import FleetCrawler, DEFAULT_CRAWL_WORKERS
+from mdbaas.errors.omerrors import AutomationConfigVersionConflictError
+from mdbaas.opsmgrutil.automationconfig import AutomationConfig
+from mdbaas.opsmgrutil.goalstate import GoalStateWaiter, DEFAULT_GOAL_STATE_TIMEOUT, DEFAULT_MAX_POLL_INTERVAL
+
+# Bulk update defaults
+DEFAULT_CONFLICT_RETRIES    = 3
+
+
+class BulkUpdateStatus:
+    """
+    The outcome of a bulk automation config update for a single project
+    """
+    CONVERGED   = "CONVERGED"       # Written, and every process reached the new goal version
+    APPLIED     = "APPLIED"         # Written, convergence not tracked
+    TIMED_OUT   = "TIMED_OUT"       # Written, but not every process reached the new goal version in time
+    UNCHANGED   = "UNCHANGED"       # The change was already in place, nothing was written
+    SKIPPED     = "SKIPPED"         # The change did not apply to the project, e.g. the user does not exist there
+    CONFLICT    = "CONFLICT"        # The config kept being modified concurrently until the retries ran out
+    FAILED      = "FAILED"          # Any other error
+
+    VALUES = [ CONVERGED, APPLIED, TIMED_OUT, UNCHANGED, SKIPPED, CONFLICT, FAILED ]
+    SUCCESSFUL = [ CONVERGED, APPLIED, UNCHANGED, SKIPPED ]
+
+
+def resolveGroupIds(opsMgrConnector, groupIds=None, groupIdsFile=None, orgId=None, verifyBool=True):
+    """
+    Resolve Group Ids
+
+    Collects the ids of the projects a bulk update applies to, without duplicates and in the order given
+
+    :param opsMgrConnector: The OpsMgrConnector used to list the projects of an organization
+    :param groupIds:        An array of project ids
+    :param groupIdsFile:    The path of a file with one project id per line; blank lines and lines starting with #
+                            are ignored
+    :param orgId:           The id of an organization, all of whose projects are included
+    :return:                An array of project ids
+    """
+    resolved = list(groupIds or [])
+    if groupIdsFile is not None:
+        with open(groupIdsFile) as file:
+            resolved.extend(line.strip() for line in file if line.strip() and not line.strip().startswith("#"))
+    if orgId is not None:
+        resolved.extend(group["id"] for group in opsMgrConnector.iterGroupsInOrg(orgId, verifyBool=verifyBool))
+    return list(dict.fromkeys(resolved))
+
+
+class BulkAutomationUpdater:
+    """
+    BulkAutomationUpdater class
+
+    Applies the same automation config change to many projects at once, e.g. to rotate a credential across the
+    fleet. At most maxInFlight projects are updated at the same time. A project whose config is modified by someone
+    else between read and write is read again and the change re-applied, up to maxConflictRetries times. Every
+    project is handed to a single GoalStateWaiter as soon as its change is written, and the outcome of every project,
+    including the lag of any process still behind, is returned in one summary.
+    """
+    def __init__(self, opsMgrConnector, maxInFlight=DEFAULT_CRAWL_WORKERS, maxConflictRetries=DEFAULT_CONFLICT_RETRIES,
+                 waitForGoalState=True, goalStateTimeout=DEFAULT_GOAL_STATE_TIMEOUT,
+                 maxPollInterval=DEFAULT_MAX_POLL_INTERVAL, verifyBool=True):
+        """
+        Constructor to create a BulkAutomationUpdater object.
+
+        :param opsMgrConnector:     The OpsMgrConnector used to read and write the automation configs
+        :param maxInFlight:         The maximum number of projects to update, and to poll, at the same time
+        :param maxConflictRetries:  The number of times to re-apply the change to a project after a version conflict
+        :param waitForGoalState:    Whether or not to wait for the changed projects to reach their new goal version
+        :param goalStateTimeout:    The number of seconds to wait for a changed project to reach the goal version
+        :param maxPollInterval:     The largest number of seconds between two polls of the automation status of a
+                                    project
+        :param verifyBool:          Whether or not to verify TLS certificates
+        """
+        self.opsMgrConnector    = opsMgrConnector
+        self.maxInFlight        = max(1, int(maxInFlight))
+        self.maxConflictRetries = maxConflictRetries
+        self.waitForGoalState   = waitForGoalState
+        self.goalStateTimeout   = goalStateTimeout
+        self.maxPollInterval    = maxPollInterval
+        self.verifyBool         = verifyBool
+
+    def run(self, groupIds, modify):
+        """
+        Run
+
+        :param groupIds:    An array of the ids of the projects to update
+        :param modify:      A function taking the AutomationConfig of a project and modifying it through its methods.
+                            It may return False to skip a project the change does not apply to.
+        :return:            A summary document with the number of projects per BulkUpdateStatus and an array with
+                            the result of every project, in the order of groupIds
+        """
+        started = time.time()
+        waiter = None
+        if self.waitForGoalState:
+            waiter = GoalStateWaiter(self.opsMgrConnector, maxInterval=self.maxPollInterval,
+                                     maxInFlight=self.maxInFlight, verifyBool=self.verifyBool)
+        try:
+            with FleetCrawler(self.maxInFlight) as crawler:
+                results = crawler.map(lambda groupId: self.updateGroup(groupId, modify, waiter), groupIds)
+            if waiter is not None:
+                logging.info("Waiting for {} projects to reach their goal state".format(waiter.getPending()))
+                for result in results:
+                    if result.get("goalState", None) is not None:
+                        self.setGoalStateResult(result, result.pop("goalState").result())
+        finally:
+            if waiter is not None:
+                waiter.close()
+
+        counts = { status : 0 for status in BulkUpdateStatus.VALUES }
+        for result in results:
+            counts[result["status"]] += 1
+        return {
+            "total"     : len(results),
+            "counts"    : counts,
+            "failed"    : len([ result for result in results if result["status"] not in BulkUpdateStatus.SUCCESSFUL ]),
+            "elapsed"   : time.time() - started,
+            "results"   : results
+        }
+
+    def updateGroup(self, groupId, modify, waiter=None):
+        """
+        Update Group
+
+        Applies the change to a single project, re-applying it to a fresh copy of the config after a version conflict
+
+        :param groupId: The id of the project
+        :param modify:  The function applying the change, see run()
+        :param waiter:  The GoalStateWaiter to hand the project to once the change is written, if any
+        :return:        The result document of the project
+        """
+        result = { "groupId" : groupId, "status" : None, "attempts" : 0, "version" : None, "laggingProcesses" : [],
+                   "error" : None }
+        while True:
+            result["attempts"] += 1
+            try:
+                automationConfig = AutomationConfig.load(self.opsMgrConnector, groupId, verifyBool=self.verifyBool)
+                if modify(automationConfig) is False:
+                    result["status"] = BulkUpdateStatus.SKIPPED
+                    return result
+                if automationConfig.save(self.opsMgrConnector, verifyBool=self.verifyBool) is None:
+                    result["status"] = BulkUpdateStatus.UNCHANGED
+                    return result
+                result["version"] = automationConfig.getVersion()
+                result["status"] = BulkUpdateStatus.APPLIED
+                logging.debug("Updated automation config of group {} to version {}".format(groupId, result["version"]))
+                if waiter is not None:
+                    result["goalState"] = waiter.watch(groupId, version=result["version"], timeout=self.goalStateTimeout)
+                return result
+            except AutomationConfigVersionConflictError as e:
+                if result["attempts"] > self.maxConflictRetries:
+                    result["status"] = BulkUpdateStatus.CONFLICT
+                    result["error"] = str(e)
+                    return result
+                logging.debug("Retrying update of group {} after a version conflict: {}".format(groupId, e))
+                # Back off a little so concurrent writers to the same project do not collide again straight away
+                time.sleep(random.uniform(0, 0.5 * result["attempts"]))
+            except Exception as e:
+                logging.debug("Update of group {} failed".format(groupId), exc_info=True)
+                result["status"] = BulkUpdateStatus.FAILED
+                # The errors of this package already start with their name
+                result["error"] = str(e) if str(e).startswith(type(e).__name__) else "{}: {}".format(type(e).__name__, e)
+                return result
+
+    def setGoalStateResult(self, result, goalState):
+        """
+        Set Goal State Result
+
+        :param result:      The result document of a project whose change was written
+        :param goalState:   The result document of the GoalStateWaiter for the project
+        """
+        result["laggingProcesses"] = [ "{} ({} behind)".format(name, goalState["processes"][name]["lag"])
+                                       for name in goalState["laggingProcesses"] ]
+        result["error"] = goalState["error"]
+        result["status"] = BulkUpdateStatus.CONVERGED if goalState["converged"] else BulkUpdateStatus.TIMED_OUT
+
+
+def formatSummary(summary):
+    """
+    Format Summary
+
+    :param summary: The summary document returned by BulkAutomationUpdater.run
+    :return:        A String with a table of the projects that did not succeed followed by the counts per status
+    """
+    lines = []
+    problems = [ result for result in summary["results"] if result["status"] not in BulkUpdateStatus.SUCCESSFUL ]
+    if problems:
+        table = PrettyTable()
+        table.field_names = [ "Project", "Status", "Attempts", "Lagging processes", "Error" ]
+        table.align = "l"
+        for result in problems:
+            table.add_row([ result["groupId"], result["status"], result["attempts"],
+                            ", ".join(result["laggingProcesses"]), result["error"] or "" ])
+        lines.append(table.get_string())
+    lines.append("{} projects in {:.1f}s: {}".format(summary["total"], summary["elapsed"], ", ".join(
+        "{} {}".format(count, status) for status, count in summary["counts"].items() if count > 0)))
+    return "\n".join(lines)
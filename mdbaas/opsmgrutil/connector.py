@@ -1,17 +1,20 @@
 import sys
 sys.path.append('')
-import requests
 import logging
 import json
-import math
-from requests.auth import HTTPDigestAuth
+from mdbaas.util.session import PooledSession, DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE, DEFAULT_MAX_RETRIES
+from mdbaas.util.lazylog import LazyJson
+from mdbaas.util.singleflight import SingleFlight
+from mdbaas.util.jsondecode import loads, iterArrayItems, DEFAULT_CHUNK_SIZE
+from mdbaas.errors.omerrors import ApiRequestError
+from mdbaas.util.pagination import addPagingParams, iterPages, getAllPages, DEFAULT_PAGE_WORKERS
 from mdbaas.opsmgrutil.constants import ServerPoolServerStatusName
 from mdbaas.opsmgrutil.omusers import OpsManagerOrgRole, OpsManagerGroupRole
 
 # Other constants
 GROUPS_PER_PAGE = 100
 
-# TODO -- ADD
+# Largest itemsPerPage accepted by the list endpoints
 MAX_GROUPS_PER_PAGE = 500
 
 EXTERNAL_OPS_MANAGER_URL = "https://opsmanager.mongodb.com"
@@ -22,22 +25,71 @@ class OpsMgrConnector:
 
     A wrapper class that sends requests to the specified ops manager
     """
-    def __init__(self, opsMgrUri, apiUser, apiKey):
+    def __init__(self, opsMgrUri, apiUser, apiKey, poolConnections=DEFAULT_POOL_CONNECTIONS,
+                 poolMaxSize=DEFAULT_POOL_MAXSIZE, keepAlive=True, maxInFlight=None, pageWorkers=DEFAULT_PAGE_WORKERS,
+                 responseCache=None, maxRetries=DEFAULT_MAX_RETRIES, apiMetrics=None, coalesceGets=True,
+                 compress=True):
         """
         Constructor to create an OpsMgrConnector object.
 
-        :param opsMgrUri:   The uri to the target ops manager
-        :param apiUser:     The api user with which we will authenticate to the target ops manager
-        :param apiKey:      The api key for the api user with which we will authenticate to the target ops manager
+        :param opsMgrUri:       The uri to the target ops manager
+        :param apiUser:         The api user with which we will authenticate to the target ops manager
+        :param apiKey:          The api key for the api user with which we will authenticate to the target ops manager
+        :param poolConnections: The number of distinct hosts for which to keep a connection pool
+        :param poolMaxSize:     The maximum number of connections to keep alive to the target ops manager
+        :param keepAlive:       Whether or not to keep connections open between requests
+        :param maxInFlight:     The maximum number of requests outstanding against the target ops manager at once, or
+                                None for no cap; the cap shrinks while ops manager pushes back
+        :param pageWorkers:     The maximum number of pages of a list endpoint to fetch at the same time
+        :param responseCache:   An optional ResponseCache in which to keep GET responses of slow changing metadata
+                                between runs
+        :param maxRetries:      The number of times to resend a request that was throttled or failed with a 5xx
+        :param apiMetrics:      The ApiMetrics in which to record every request, by default the shared one
+        :param coalesceGets:    Whether or not to merge identical GET requests made at the same time into one request
+        :param compress:        Whether or not to ask for compressed responses
         """
         self.opsMgrUri = opsMgrUri
         self.staticDataUrl = "{}/static/".format(opsMgrUri)
         self.apiURL = "{}/api/public/v1.0".format(opsMgrUri)
-        self.auth   = HTTPDigestAuth(apiUser, apiKey)
+        self.httpSession = PooledSession(apiUser, apiKey, poolConnections=poolConnections, poolMaxSize=poolMaxSize,
+                                         keepAlive=keepAlive, maxInFlight=maxInFlight,
+                                         maxRetries=maxRetries, apiMetrics=apiMetrics, compress=compress)
+        self.auth   = self.httpSession.auth
+        self.pageWorkers = pageWorkers
+        self.responseCache = responseCache
+        self.singleFlight = SingleFlight() if coalesceGets else None
 
     def prettyPrint(self, payload):
         return json.dumps(payload, indent=4, sort_keys=True)
 
+    def getConnectionStats(self):
+        """
+        Get Connection Stats
+
+        :return:    A document with the number of requests sent, connections opened versus reused and GET requests
+                    merged into identical ones in flight
+        """
+        stats = self.httpSession.getConnectionStats()
+        if self.singleFlight is not None:
+            stats["coalescedGets"] = self.singleFlight.getMergedCount()
+        return stats
+
+    def getApiMetrics(self):
+        """
+        Get Api Metrics
+
+        :return:    The ApiMetrics in which the requests of this connector are recorded
+        """
+        return self.httpSession.apiMetrics
+
+    def close(self):
+        """
+        Close
+
+        Closes all pooled connections to the target ops manager
+        """
+        self.httpSession.close()
+
     ############################################################################
     # Base HTTP Request Methods
     ############################################################################
@@ -53,12 +105,12 @@ class OpsMgrConnector:
 
         :return:            The response from the request
         """
-        logging.debug("Sending a POST request to {} with payload:\n {}".format(url, self.prettyPrint(payload)))
-        result = requests.post(url, json=payload, auth=self.auth, verify=verifyBool).json()
+        logging.debug("Sending a POST request to %s with payload:\n %s", url, LazyJson(payload, sortKeys=True))
+        result = loads(self.httpSession.request("POST", url, verifyBool=verifyBool, json=payload).content)
         if "error" in result:
-            logging.debug("Encountered an error: {} ".format(self.prettyPrint(result)))  #TODO more sophisticated error handling
+            logging.debug("Encountered an error: %s ", LazyJson(result, sortKeys=True))  #TODO more sophisticated error handling
         else:
-            logging.debug("Received response: {}".format(self.prettyPrint(result)))
+            logging.debug("Received response: %s", LazyJson(result, sortKeys=True))
         return result
 
     def put(self, url, payload, verifyBool=True):
@@ -72,13 +124,13 @@ class OpsMgrConnector:
 
         :return:            The response from the request
         """
-        logging.debug("Sending a PUT request to {} with payload:\n {}".format(url, self.prettyPrint(payload)))
-        result = requests.put(url, json=payload, auth=self.auth, verify=verifyBool)
-        result = result.json()
+        logging.debug("Sending a PUT request to %s with payload:\n %s", url, LazyJson(payload, sortKeys=True))
+        result = self.httpSession.request("PUT", url, verifyBool=verifyBool, json=payload)
+        result = loads(result.content)
         if "error" in result:
-            logging.debug("Encountered an error {}: ".format(self.prettyPrint(result)))  #TODO more sophisticated error handling
+            logging.debug("Encountered an error %s: ", LazyJson(result, sortKeys=True))  #TODO more sophisticated error handling
         else:
-            logging.debug("Received response: {}".format(self.prettyPrint(result)))
+            logging.debug("Received response: %s", LazyJson(result, sortKeys=True))
         return result
 
     def patch(self, url, payload, verifyBool=True):
@@ -92,30 +144,100 @@ class OpsMgrConnector:
 
         :return:            The response from the request
         """
-        logging.debug("Sending a PATCH request to {} with payload:\n {}".format(url, self.prettyPrint(payload)))
-        result = requests.patch(url, json=payload, auth=self.auth, verify=verifyBool).json()
+        logging.debug("Sending a PATCH request to %s with payload:\n %s", url, LazyJson(payload, sortKeys=True))
+        result = loads(self.httpSession.request("PATCH", url, verifyBool=verifyBool, json=payload).content)
         if "error" in result:
-            logging.debug("Encountered an error: {}".format(self.prettyPrint(result)))  #TODO more sophisticated error handling
+            logging.debug("Encountered an error: %s", LazyJson(result, sortKeys=True))  #TODO more sophisticated error handling
         else:
-            logging.debug("Received response: {}".format(json.dumps(result)))
+            logging.debug("Received response: %s", LazyJson(result, indent=None))
         return result
 
     def get(self, url, verifyBool=True):
         """
         Get
 
-        Sends an HTTP get request to the target url
+        Sends an HTTP get request to the target url. Identical requests made by other threads while it is in flight
+        are merged into it and share its response.
+
+        :param url:         A String representing the url to which the request shall go
+
+        :return:            The response from the request
+        """
+        if self.singleFlight is None:
+            return self.sendGet(url, verifyBool=verifyBool)
+        return self.singleFlight.do((url, verifyBool), lambda: self.sendGet(url, verifyBool=verifyBool))
+
+    def sendGet(self, url, verifyBool=True):
+        """
+        Send Get
+
+        Sends an HTTP get request to the target url without merging it with identical requests in flight
+
+        :param url:         A String representing the url to which the request shall go
+
+        :return:            The response from the request
+        """
+        if self.responseCache is not None and self.responseCache.isCacheable(url):
+            return self.getCached(url, verifyBool=verifyBool)
+        return self.getUncached(url, verifyBool=verifyBool)
+
+    def getUncached(self, url, verifyBool=True):
+        """
+        Get Uncached
+
+        Sends an HTTP get request to the target url, bypassing the response cache and the merging of identical
+        requests in flight, for callers that must see the current state of a resource, e.g. before writing it back
+
+        :param url:         A String representing the url to which the request shall go
+
+        :return:            The response from the request
+        """
+        logging.debug("Sending a GET request to %s", url)
+        result = loads(self.httpSession.request("GET", url, verifyBool=verifyBool).content)
+        if "error" in result:
+            logging.debug("Encountered an error: %s", LazyJson(result, sortKeys=True))  #TODO more sophisticated error handling
+        else:
+            logging.debug("Received response: %s", LazyJson(result, sortKeys=True))
+        return result
+
+    def getCached(self, url, verifyBool=True):
+        """
+        Get Cached
+
+        Serves a GET request from the response cache while the cached response is fresh. Once it has expired the
+        request is sent with the ETag or Last-Modified value of the cached response, so the server can confirm it
+        is unchanged instead of sending it again.
 
         :param url:         A String representing the url to which the request shall go
 
         :return:            The response from the request
         """
-        logging.debug("Sending a GET request to {}".format(url))
-        result = requests.get(url, auth=self.auth, verify=verifyBool).json()
+        entry = self.responseCache.lookup(url)
+        if entry is not None and entry.isFresh():
+            logging.debug("Serving GET request to %s from cache", url)
+            return entry.getDocument()
+
+        headers = {}
+        if entry is not None and entry.etag is not None:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.lastModified is not None:
+            headers["If-Modified-Since"] = entry.lastModified
+
+        logging.debug("Sending a GET request to %s", url)
+        response = self.httpSession.request("GET", url, verifyBool=verifyBool, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            logging.debug("Cached response for %s is still valid", url)
+            self.responseCache.touch(url)
+            return entry.getDocument()
+
+        result = loads(response.content)
         if "error" in result:
-            logging.debug("Encountered an error: {}".format(self.prettyPrint(result)))  #TODO more sophisticated error handling
+            logging.debug("Encountered an error: %s", LazyJson(result, sortKeys=True))  #TODO more sophisticated error handling
         else:
-            logging.debug("Received response: {}".format(self.prettyPrint(result)))
+            logging.debug("Received response: %s", LazyJson(result, sortKeys=True))
+            if response.status_code == 200:
+                self.responseCache.store(url, result, etag=response.headers.get("ETag"),
+                                         lastModified=response.headers.get("Last-Modified"))
         return result
 
     def delete(self, url, verifyBool=True):
@@ -128,17 +250,91 @@ class OpsMgrConnector:
 
         :return:            The response from the request
         """
-        logging.debug("Sending a DELETE request to {}".format(url))
-        result = requests.delete(url, auth=self.auth, verify=verifyBool)
+        logging.debug("Sending a DELETE request to %s", url)
+        result = self.httpSession.request("DELETE", url, verifyBool=verifyBool)
         if result.status_code == 204:
             return result
-        result = result.json()
+        result = loads(result.content)
         if "error" in result:
-            logging.debug("Encountered an error: {} ".format(self.prettyPrint(result)))  #TODO more sophisticated error handling
+            logging.debug("Encountered an error: %s ", LazyJson(result, sortKeys=True))  #TODO more sophisticated error handling
         else:
-            logging.debug("Received response: {} ".format(self.prettyPrint(result)))
+            logging.debug("Received response: %s ", LazyJson(result, sortKeys=True))
         return result
 
+    def iterResponseItems(self, url, arrayKey="results", verifyBool=True):
+        """
+        Iterate Response Items
+
+        Sends an HTTP get request to the target url and decodes the items of one array of the response as they are
+        read from the socket, so that a response of many megabytes never has to be held in memory at once
+
+        :param url:         A String representing the url to which the request shall go
+        :param arrayKey:    The name of the top level member of the response holding the array, e.g. slowQueries
+
+        :return:            A generator of the items of the array
+        :raises ApiRequestError: If the request fails
+        """
+        logging.debug("Streaming a GET request to %s", url)
+        response = self.httpSession.request("GET", url, verifyBool=verifyBool, stream=True)
+        try:
+            if response.status_code >= 400:
+                raise ApiRequestError(url, response.status_code, loads(response.content))
+            for item in iterArrayItems(self.httpSession.iterContent(response, DEFAULT_CHUNK_SIZE), arrayKey):
+                yield item
+        finally:
+            response.close()
+
+    ############################################################################
+    # Pagination Methods
+    ############################################################################
+
+    def iterPages(self, url, itemsPerPage=MAX_GROUPS_PER_PAGE, verifyBool=True):
+        """
+        Iterate Pages
+
+        Lazily yields every page of a paginated list endpoint. The first page is only fetched once and the
+        remaining pages are fetched concurrently once totalCount is known.
+
+        :param url:             A String representing the url of the list endpoint
+        :param itemsPerPage:    The number of items per page, by default the largest page size allowed
+
+        :return:                A generator of page documents, in page order
+        """
+        def fetchPage(pageNum, pageSize):
+            return self.get(addPagingParams(url, pageNum, pageSize), verifyBool=verifyBool)
+        return iterPages(fetchPage, itemsPerPage, maxWorkers=self.pageWorkers)
+
+    def getAllPages(self, url, itemsPerPage=MAX_GROUPS_PER_PAGE, verifyBool=True):
+        """
+        Get All Pages
+
+        Gets every page of a paginated list endpoint and merges their results
+
+        :param url:             A String representing the url of the list endpoint
+        :param itemsPerPage:    The number of items per page, by default the largest page size allowed
+
+        :return:                A document with the results of every page and the totalCount
+        """
+        def fetchPage(pageNum, pageSize):
+            return self.get(addPagingParams(url, pageNum, pageSize), verifyBool=verifyBool)
+        return getAllPages(fetchPage, itemsPerPage, maxWorkers=self.pageWorkers)
+
+    def iterResults(self, url, itemsPerPage=MAX_GROUPS_PER_PAGE, verifyBool=True):
+        """
+        Iterate Results
+
+        Lazily yields every item of a paginated list endpoint, page by page. Only the pages currently being
+        fetched are held in memory, so memory use does not grow with the number of items.
+
+        :param url:             A String representing the url of the list endpoint
+        :param itemsPerPage:    The number of items per page, by default the largest page size allowed
+
+        :return:                A generator of the items in the results array of every page, in order
+        """
+        for page in self.iterPages(url, itemsPerPage=itemsPerPage, verifyBool=verifyBool):
+            for result in page.get("results", []):
+                yield result
+
     ###########################################################################
     # Misc Non API Methods
     ###########################################################################
@@ -191,7 +387,7 @@ class OpsMgrConnector:
     # Automation Config Methods
     ############################################################################
 
-    def getAutomationConfig(self, groupId, verifyBool=True):
+    def getAutomationConfig(self, groupId, verifyBool=True, fresh=False):
         """
         Get Automation Config
 
@@ -201,10 +397,14 @@ class OpsMgrConnector:
         GET /groups/GROUP-ID/automationConfig
 
         :param groupId:    The id of the group whose automation configuration we are retrieving
+        :param fresh:      Whether or not to bypass the response cache, as needed before modifying the configuration
 
         :return:           The response from the request
         """
-        return self.get("{}/groups/{}/automationConfig".format(self.apiURL, groupId), verifyBool)
+        url = "{}/groups/{}/automationConfig".format(self.apiURL, groupId)
+        if fresh:
+            return self.getUncached(url, verifyBool)
+        return self.get(url, verifyBool)
 
     def putAutomationConfig(self, groupId, newAutomationConfig, verifyBool=True):
         """
@@ -219,7 +419,10 @@ class OpsMgrConnector:
 
         :return:                        The response from the request
         """
-        return self.put("{}/groups/{}/automationConfig".format(self.apiURL, groupId), newAutomationConfig, verifyBool)
+        url = "{}/groups/{}/automationConfig".format(self.apiURL, groupId)
+        if self.responseCache is not None:
+            self.responseCache.invalidate(url)
+        return self.put(url, newAutomationConfig, verifyBool)
 
     def getAutomationStatus(self, groupId, verifyBool=True):
         """
@@ -252,6 +455,19 @@ class OpsMgrConnector:
         """
         return self.get("{}/orgs".format(self.apiURL), verifyBool=verifyBool)
 
+    def iterOrganizations(self, verifyBool=True):
+        """
+        Iterate Organizations
+
+        Lazily yields every organization of the target ops manager instance via the
+        following API endpoint:
+
+        GET	/orgs
+
+        :return:    A generator of organization documents
+        """
+        return self.iterResults("{}/orgs".format(self.apiURL), verifyBool=verifyBool)
+
     def getOrganizationById(self, orgId, verifyBool=True):
         """
         Get Organization By Id
@@ -298,17 +514,22 @@ class OpsMgrConnector:
         :param verify:
         :return:
         """
-        data = self.getGroupsWithinOrganization(orgId, verify=verify)
-        totalCount = data["totalCount"]
-        numPages = int(math.ceil(float(totalCount) / float(GROUPS_PER_PAGE)))
+        return self.getAllPages("{}/orgs/{}/groups".format(self.apiURL, orgId), verifyBool=verify)
+
+    def iterGroupsInOrg(self, orgId, verifyBool=True):
+        """
+        Iterate Groups In Org
 
-        doc = {}
-        doc["results"] = []
-        for i in range(1, numPages + 1):
-            groupDoc = self.getGroupsWithinOrganization(orgId, pageNum=i, itemsPerPage=GROUPS_PER_PAGE, verify=verify)
-            doc["results"].extend(groupDoc["results"])
+        Lazily yields every group within a target organization via the following
+        API endpoint:
+
+        GET	/orgs/{ORG-ID}/groups
 
-        return doc
+        :param  orgId:      The organization Id whose groups we are retrieving
+
+        :return:            A generator of group documents
+        """
+        return self.iterResults("{}/orgs/{}/groups".format(self.apiURL, orgId), verifyBool=verifyBool)
 
     def getUsersWithinOrganization(self, orgId, verifyBool=True):
         """
@@ -372,6 +593,20 @@ class OpsMgrConnector:
         """
         return self.get("{}/groups/{}/hosts".format(self.apiURL, groupId), verifyBool=verifyBool)
 
+    def iterHosts(self, groupId, verifyBool=True):
+        """
+        Iterate Hosts
+
+        Lazily yields every host within a particular group via the following API endpoint:
+
+        GET	/groups/{GROUP-ID}/hosts
+
+        :param groupId:     The id of the group whose hosts we wish to fetch
+
+        :return:            A generator of host documents
+        """
+        return self.iterResults("{}/groups/{}/hosts".format(self.apiURL, groupId), verifyBool=verifyBool)
+
     def getHostById(self, groupId, hostId, verifyBool=True):
         """
         Get Hosts by Id
@@ -549,7 +784,8 @@ class OpsMgrConnector:
         return self.get("{}/groups/{}/hosts/{}/disks/".format(self.apiURL, groupId, hostId), verifyBool=verifyBool)
 
 
-    def getDiskPartitionMeasurementOverIntervalForHost(self, groupId, hostId, diskPartitionName, granularity, intervalStart, intervalEnd, verifyBool=True):
+    def getDiskPartitionMeasurementOverIntervalForHost(self, groupId, hostId, diskPartitionName, granularity, intervalStart, intervalEnd,
+                                                       measurementTypes=None, verifyBool=True):
         """
         Get Disk Partition Measurement For Host
 
@@ -561,12 +797,13 @@ class OpsMgrConnector:
         :param hostId:
         :param diskPartitionName:
         :param granularity:
-        :param intervalStart:
-        :param intervalEnd:
+        :param intervalStart:       An ISO-8601 UTC timestamp String for the start of the interval
+        :param intervalEnd:         An ISO-8601 UTC timestamp String for the end of the interval
+        :param measurementTypes:    An optional array of measurement types; all types if not specified
         :return:
         """
-        # TODO fill this out--remember to include URI query params
-        return {}
+        url = "{}/groups/{}/hosts/{}/disks/{}/measurements".format(self.apiURL, groupId, hostId, diskPartitionName)
+        return self.getMeasurementsOverInterval(url, granularity, intervalStart, intervalEnd, measurementTypes, verifyBool=verifyBool)
 
     def getCputMeasurementOverPeriodForHost(self, groupId, hostId,granularity, period, verifyBool=True):
         """
@@ -606,6 +843,86 @@ class OpsMgrConnector:
                                                                                              granularity, period)
         return self.get(url, verifyBool=verifyBool)
 
+    def getMeasurementsOverIntervalForHost(self, groupId, hostId, granularity, intervalStart, intervalEnd, measurementTypes=None,
+                                           verifyBool=True):
+        """
+        Get Measurements over interval for host
+
+        GET /groups/{GROUP-ID}/hosts/{HOST-ID}/measurements
+
+        :param groupId:             A string representing the group id whose host to retrieve measurements for
+        :param hostId:              A string representing the host id whose measurements to retrieve
+        :param granularity:
+        :param intervalStart:       An ISO-8601 UTC timestamp String for the start of the interval
+        :param intervalEnd:         An ISO-8601 UTC timestamp String for the end of the interval
+        :param measurementTypes:    An optional array of measurement types; all types if not specified
+        :return:
+        """
+        url = "{}/groups/{}/hosts/{}/measurements".format(self.apiURL, groupId, hostId)
+        return self.getMeasurementsOverInterval(url, granularity, intervalStart, intervalEnd, measurementTypes, verifyBool=verifyBool)
+
+    def getDatabaseMeasurementsOverPeriodForHost(self, groupId, hostId, databaseName, granularity, period, measurementTypes=None,
+                                                 verifyBool=True):
+        """
+        Get Database Measurements over period for host
+
+        GET /groups/{GROUP-ID}/hosts/{HOST-ID}/databases/{DATABASE-NAME}/measurements
+
+        :param groupId:             A string representing the group id whose host to retrieve measurements for
+        :param hostId:              A string representing the host id whose measurements to retrieve
+        :param databaseName:        The name of the database whose measurements to retrieve
+        :param granularity:
+        :param period:
+        :param measurementTypes:    An optional array of measurement types; all types if not specified
+        :return:
+        """
+        measurementTypeStr = ""
+        for measurementType in (measurementTypes or []):
+            measurementTypeStr += "m={}&".format(measurementType)
+        url = "{}/groups/{}/hosts/{}/databases/{}/measurements?{}granularity={}&period={}".format(self.apiURL, groupId, hostId,
+                                                                                                databaseName, measurementTypeStr,
+                                                                                                granularity, period)
+        return self.get(url, verifyBool=verifyBool)
+
+    def getDatabaseMeasurementsOverIntervalForHost(self, groupId, hostId, databaseName, granularity, intervalStart, intervalEnd,
+                                                   measurementTypes=None, verifyBool=True):
+        """
+        Get Database Measurements over interval for host
+
+        GET /groups/{GROUP-ID}/hosts/{HOST-ID}/databases/{DATABASE-NAME}/measurements
+
+        :param groupId:             A string representing the group id whose host to retrieve measurements for
+        :param hostId:              A string representing the host id whose measurements to retrieve
+        :param databaseName:        The name of the database whose measurements to retrieve
+        :param granularity:
+        :param intervalStart:       An ISO-8601 UTC timestamp String for the start of the interval
+        :param intervalEnd:         An ISO-8601 UTC timestamp String for the end of the interval
+        :param measurementTypes:    An optional array of measurement types; all types if not specified
+        :return:
+        """
+        url = "{}/groups/{}/hosts/{}/databases/{}/measurements".format(self.apiURL, groupId, hostId, databaseName)
+        return self.getMeasurementsOverInterval(url, granularity, intervalStart, intervalEnd, measurementTypes, verifyBool=verifyBool)
+
+    def getMeasurementsOverInterval(self, url, granularity, intervalStart, intervalEnd, measurementTypes=None, verifyBool=True):
+        """
+        Get Measurements over interval
+
+        Gets the measurements of any measurements endpoint between two points in time rather than over a period
+        ending now
+
+        :param url:                 A String representing the url of the measurements endpoint
+        :param granularity:
+        :param intervalStart:       An ISO-8601 UTC timestamp String for the start of the interval
+        :param intervalEnd:         An ISO-8601 UTC timestamp String for the end of the interval
+        :param measurementTypes:    An optional array of measurement types; all types if not specified
+        :return:
+        """
+        measurementTypeStr = ""
+        for measurementType in (measurementTypes or []):
+            measurementTypeStr += "m={}&".format(measurementType)
+        return self.get("{}?{}granularity={}&start={}&end={}".format(url, measurementTypeStr, granularity, intervalStart, intervalEnd),
+                        verifyBool=verifyBool)
+
     ############################################################################
     # Performance Advisor Methods
     ############################################################################
@@ -622,6 +939,28 @@ class OpsMgrConnector:
         :param namespaces:          An array of strings representing namespaces to capture
         :return:
         """
+        url = self.getSlowQueryLogsUrl(groupId, hostId, since, duration, nLogs, namespaces)
+        return self.get(url, verifyBool=verifyBool)
+
+    def iterSlowQueryLogsForGroupAndHost(self, groupId, hostId, since, duration, nLogs, namespaces, verifyBool=True):
+        """
+        Iterate Slow Query Logs for Group and Host
+
+        Lazily yields every slow query log of a host, decoding them one at a time as the response is read
+
+        :param groupId:             A string representing the group id of the host
+        :param hostId:              A string representing the host id whose slow query logs to retrieve
+        :param since:
+        :param duration:
+        :param nLogs:
+        :param namespaces:          An array of strings representing namespaces to capture
+        :return:                    A generator of slow query log documents
+        :raises ApiRequestError:    If the request fails
+        """
+        url = self.getSlowQueryLogsUrl(groupId, hostId, since, duration, nLogs, namespaces)
+        return self.iterResponseItems(url, arrayKey="slowQueries", verifyBool=verifyBool)
+
+    def getSlowQueryLogsUrl(self, groupId, hostId, since, duration, nLogs, namespaces):
         queryParamStr = ""
         if nLogs is not None:
             queryParamStr += "&nLogs={}".format(nLogs)
@@ -634,8 +973,7 @@ class OpsMgrConnector:
                 queryParamStr += "&namespace={}".format(namespace)
         if queryParamStr != "":
             queryParamStr = "?" + queryParamStr[1:]
-        url = "{}/groups/{}/hosts/{}/performanceAdvisor/slowQueryLogs{}".format(self.apiURL, groupId, hostId, queryParamStr)
-        return self.get(url, verifyBool=verifyBool)
+        return "{}/groups/{}/hosts/{}/performanceAdvisor/slowQueryLogs{}".format(self.apiURL, groupId, hostId, queryParamStr)
 
 
     ############################################################################
@@ -656,6 +994,20 @@ class OpsMgrConnector:
         """
         return self.get("{}/groups/{}/clusters".format(self.apiURL, groupId), verifyBool=verifyBool)
 
+    def iterClustersForGroup(self, groupId, verifyBool=True):
+        """
+        Iterate Clusters for Group
+
+        Lazily yields every cluster within a particular group via the following API endpoint:
+
+        GET /groups/{GROUP-ID}/clusters
+
+        :param  groupId:    The id of the group whose clusters we want to fetch
+
+        :return:            A generator of cluster documents
+        """
+        return self.iterResults("{}/groups/{}/clusters".format(self.apiURL, groupId), verifyBool=verifyBool)
+
     def getClusterById(self, groupId, clusterId, verifyBool=True):
         """
         Get Cluster by ID
@@ -703,16 +1055,20 @@ class OpsMgrConnector:
 
         GET	/groups
         """
-        data        = self.getGroups(verifyBool=verifyBool)
-        totalCount  = data["totalCount"]
-        numPages    = int(math.ceil(float(totalCount)/float(GROUPS_PER_PAGE)))
+        return self.getAllPages("{}/groups".format(self.apiURL), verifyBool=verifyBool)
 
-        doc             = {}
-        doc["results"]  = []
-        for i in range(1, numPages+1):
-            groupDoc = self.getGroups(pageNum=i, verifyBool=verifyBool)
-            doc["results"].extend(groupDoc["results"])
-        return doc
+    def iterGroups(self, verifyBool=True):
+        """
+        Iterate Groups
+
+        Lazily yields every group of the target ops manager instance via the
+        following API endpoint:
+
+        GET	/groups
+
+        :return:    A generator of group documents
+        """
+        return self.iterResults("{}/groups".format(self.apiURL), verifyBool=verifyBool)
 
     def getGroups(self, pageNum=None, itemsPerPage=None, verifyBool=True):
         """
@@ -788,6 +1144,20 @@ class OpsMgrConnector:
         """
         return self.get("{}/groups/{}/users".format(self.apiURL, groupId), verifyBool=verifyBool)
 
+    def iterUsersInGroup(self, groupId, verifyBool=True):
+        """
+        Iterate Users in Group
+
+        Lazily yields every user in a target ops manager group via the following API endpoint:
+
+        GET	/groups/{GROUP-ID}/users
+
+        :param  groupId:        The id of the group whose users we want to fetch
+
+        :return:                A generator of user documents
+        """
+        return self.iterResults("{}/groups/{}/users".format(self.apiURL, groupId), verifyBool=verifyBool)
+
     def getTeamsInGroup(self, groupId, verifyBool=True):
         """
         Get Teanms in Group
@@ -1516,5 +1886,19 @@ class OpsMgrConnector:
         """
         return self.get("{}/groups/{}/hosts/{}/databases?page={}".format(self.apiURL, groupId, hostId, pageNum), verifyBool=verifyBool)
 
+    def iterDatabasesForHost(self, groupId, hostId, verifyBool=True):
+        """
+        Iterate Databases For Host
+
+        Lazily yields every database on a host via the following API endpoint:
+
+        GET /groups/{GROUP-ID}/hosts/{HOST-ID}/databases
+
+        :param groupId:     The id of the group that contains the host
+        :param hostId:      The id of the host whose databases we want to fetch
+        :return:            A generator of database documents
+        """
+        return self.iterResults("{}/groups/{}/hosts/{}/databases".format(self.apiURL, groupId, hostId), verifyBool=verifyBool)
+
     # def getCollectionsInDB(self, groupId, clusterId, pageNum):
 
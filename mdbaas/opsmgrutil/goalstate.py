@@ -0,0 +1,290 @@
+import sys
+sys.path.append('')
+import time
+import heapq
+import logging
+import itertools
+import threading
+from concurrent.futures import Future, wait
+from mdbaas.util.crawler import FleetCrawler, DEFAULT_CRAWL_WORKERS
+
+# Goal state polling defaults: poll every DEFAULT_MIN_POLL_INTERVAL seconds at first, then back off by
+# DEFAULT_POLL_BACKOFF after every poll without progress, up to DEFAULT_MAX_POLL_INTERVAL seconds
+DEFAULT_MIN_POLL_INTERVAL   = 1.0
+DEFAULT_MAX_POLL_INTERVAL   = 30.0
+DEFAULT_POLL_BACKOFF        = 2.0
+DEFAULT_GOAL_STATE_TIMEOUT  = 30*60
+
+
+class _GoalStateWatch:
+    """
+    The state of a single project being waited on
+    """
+    def __init__(self, groupId, version, deadline, interval):
+        self.groupId        = groupId
+        self.version        = version
+        self.deadline       = deadline
+        self.interval       = interval
+        self.started        = time.time()
+        self.future         = Future()
+        self.polls          = 0
+        self.goalVersion    = None
+        self.processes      = {}
+        self.progressed     = False
+        self.error          = None
+
+    def isConverged(self):
+        return self.version is not None and self.polls > 0 and self.error is None and \
+               all(process["lag"] == 0 for process in self.processes.values())
+
+    def getResult(self, timedOut=False):
+        return {
+            "groupId"           : self.groupId,
+            "version"           : self.version,
+            "goalVersion"       : self.goalVersion,
+            "converged"         : self.isConverged(),
+            "timedOut"          : timedOut,
+            "polls"             : self.polls,
+            "elapsed"           : time.time() - self.started,
+            "processes"         : self.processes,
+            "laggingProcesses"  : sorted(name for name, process in self.processes.items() if process["lag"] != 0),
+            "error"             : self.error
+        }
+
+
+class GoalStateWaiter:
+    """
+    GoalStateWaiter class
+
+    Waits for any number of projects to reach the goal version of their automation config from a single poller
+    thread. Each project is polled fast at first and less often the longer it takes, and immediately polled fast
+    again whenever one of its processes catches up. The polls due at the same time are sent together, at most
+    maxInFlight at once, so waiting on hundreds of projects takes neither hundreds of threads nor hundreds of
+    sequential requests per round.
+
+    waiter.watch(groupId, version) returns a concurrent.futures.Future of the outcome for the project, which a caller
+    can block on, pass to waitAll, or await with asyncio.wrap_future.
+    """
+    def __init__(self, opsMgrConnector, minInterval=DEFAULT_MIN_POLL_INTERVAL, maxInterval=DEFAULT_MAX_POLL_INTERVAL,
+                 backoff=DEFAULT_POLL_BACKOFF, maxInFlight=DEFAULT_CRAWL_WORKERS, verifyBool=True):
+        """
+        Constructor to create a GoalStateWaiter object.
+
+        :param opsMgrConnector: The OpsMgrConnector used to read the automation status of the projects
+        :param minInterval:     The number of seconds between the first polls of a project
+        :param maxInterval:     The largest number of seconds between two polls of a project
+        :param backoff:         The factor the interval grows by after every poll without progress
+        :param maxInFlight:     The maximum number of projects to poll at the same time
+        :param verifyBool:      Whether or not to verify TLS certificates
+        """
+        self.opsMgrConnector    = opsMgrConnector
+        self.minInterval        = minInterval
+        self.maxInterval        = max(minInterval, maxInterval)
+        self.backoff            = max(1.0, backoff)
+        self.maxInFlight        = maxInFlight
+        self.verifyBool         = verifyBool
+        self.condition          = threading.Condition()
+        self.schedule           = []
+        self.sequence           = itertools.count()
+        self.closed             = False
+        self.thread             = None
+
+    def watch(self, groupId, version=None, timeout=DEFAULT_GOAL_STATE_TIMEOUT):
+        """
+        Watch
+
+        Starts waiting for the processes of a project to reach an automation config version
+
+        :param groupId: The id of the project
+        :param version: The automation config version to wait for, by default the goalVersion of the first poll
+        :param timeout: The number of seconds after which to stop waiting
+        :return:        A Future of the result document of the project: whether it converged or timed out, the
+                        goalVersion reported last, and every process with its lastGoalVersionAchieved and its lag
+                        behind the version waited for
+        """
+        watch = _GoalStateWatch(groupId, version, time.time() + timeout, self.minInterval)
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("GoalStateWaiter is closed")
+            self._schedule(watch, time.time())
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="GoalStateWaiter", daemon=True)
+                self.thread.start()
+            self.condition.notify()
+        return watch.future
+
+    def waitAll(self, futures, timeout=None):
+        """
+        Wait All
+
+        :param futures: An array of Futures returned by watch
+        :param timeout: The largest number of seconds to wait, by default until each watch converged or timed out
+        :return:        An array of the result documents, in the order of futures, with None for the watches still
+                        outstanding
+        """
+        wait(futures, timeout=timeout)
+        return [ future.result() if future.done() else None for future in futures ]
+
+    def getPending(self):
+        with self.condition:
+            return len(self.schedule)
+
+    def close(self):
+        """
+        Close
+
+        Stops the poller. Watches still outstanding are resolved with their state as of the last poll.
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+        for _, _, watch in self.schedule:
+            watch.future.set_result(watch.getResult(timedOut=True))
+        self.schedule = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    ############################################################################
+    # Poller Methods
+    ############################################################################
+
+    def _schedule(self, watch, at):
+        heapq.heappush(self.schedule, (at, next(self.sequence), watch))
+
+    def _takeDue(self):
+        """
+        Take Due
+
+        Blocks until at least one watch is due to be polled or the waiter is closed
+
+        :return:    An array of the watches due, empty once the waiter is closed
+        """
+        with self.condition:
+            while not self.closed:
+                now = time.time()
+                if self.schedule and self.schedule[0][0] <= now:
+                    due = []
+                    while self.schedule and self.schedule[0][0] <= now:
+                        due.append(heapq.heappop(self.schedule)[2])
+                    return due
+                self.condition.wait(timeout=self.schedule[0][0] - now if self.schedule else None)
+            return []
+
+    def _run(self):
+        due = []
+        try:
+            with FleetCrawler(self.maxInFlight) as crawler:
+                while True:
+                    due = self._takeDue()
+                    if not due:
+                        return
+                    crawler.map(self._poll, due)
+                    self._resolve(due)
+        except BaseException as e:
+            # Never leave a caller blocked on a watch the poller will not resolve any more
+            logging.exception("Goal state poller failed")
+            with self.condition:
+                self.closed = True
+                for watch in due + [ watch for _, _, watch in self.schedule ]:
+                    if not watch.future.done():
+                        watch.future.set_exception(e)
+                self.schedule = []
+
+    def _resolve(self, due):
+        """
+        Resolve
+
+        Resolves the watches that converged or ran out of time and schedules the next poll of the others
+
+        :param due: An array of the watches just polled
+        """
+        now = time.time()
+        with self.condition:
+            for watch in due:
+                if watch.isConverged():
+                    logging.debug("Group {} reached goal version {} after {} polls".format(
+                        watch.groupId, watch.version, watch.polls))
+                    watch.future.set_result(watch.getResult())
+                elif now >= watch.deadline or self.closed:
+                    watch.future.set_result(watch.getResult(timedOut=True))
+                else:
+                    # Poll fast again as soon as a process caught up, back off while nothing happens
+                    if watch.progressed:
+                        watch.interval = self.minInterval
+                    else:
+                        watch.interval = min(self.maxInterval, watch.interval * self.backoff)
+                    self._schedule(watch, min(now + watch.interval, watch.deadline))
+
+    def _poll(self, watch):
+        """
+        Poll
+
+        Reads the automation status of a project and updates its watch with the lag of every process. A status that
+        cannot be understood is recorded as the error of the watch, like a failed request, and polled again.
+
+        :param watch:   The _GoalStateWatch of the project
+        """
+        try:
+            self._readStatus(watch)
+        except Exception as e:
+            logging.debug("Unable to read the automation status of group {}".format(watch.groupId), exc_info=True)
+            watch.error = "Unable to read the automation status: {}: {}".format(type(e).__name__, e)
+            watch.progressed = False
+
+    def _readStatus(self, watch):
+        watch.polls += 1
+        try:
+            status = self.opsMgrConnector.getAutomationStatus(watch.groupId, verifyBool=self.verifyBool)
+        except Exception as e:
+            logging.debug("Unable to poll the automation status of group {}: {}".format(watch.groupId, e))
+            watch.error = "{}: {}".format(type(e).__name__, e)
+            watch.progressed = False
+            return
+        if "error" in status:
+            watch.error = "Unable to get the automation status: {}".format(status.get("detail", status["error"]))
+            watch.progressed = False
+            return
+
+        watch.error = None
+        watch.goalVersion = status.get("goalVersion", None)
+        if watch.version is None:
+            watch.version = watch.goalVersion
+        processes = {}
+        progressed = False
+        for process in status.get("processes", []):
+            achieved = process.get("lastGoalVersionAchieved", None)
+            if achieved is None:
+                achieved = -1
+            previous = watch.processes.get(process["name"], None)
+            if previous is not None and achieved > previous["lastGoalVersionAchieved"]:
+                progressed = True
+            processes[process["name"]] = {
+                "hostname"                  : process.get("hostname", None),
+                "lastGoalVersionAchieved"   : achieved,
+                "lag"                       : max(0, watch.version - achieved) if watch.version is not None else None,
+                "plan"                      : process.get("plan", [])
+            }
+        watch.processes = processes
+        watch.progressed = progressed
+
+
+def waitForGoalState(opsMgrConnector, groupId, version=None, timeout=DEFAULT_GOAL_STATE_TIMEOUT, verifyBool=True):
+    """
+    Wait For Goal State
+
+    Blocks until the processes of a single project reach an automation config version
+
+    :param opsMgrConnector: The OpsMgrConnector used to read the automation status of the project
+    :param groupId:         The id of the project
+    :param version:         The automation config version to wait for, by default the current goalVersion
+    :param timeout:         The number of seconds after which to stop waiting
+    :return:                The result document of the project, see GoalStateWaiter.watch
+    """
+    with GoalStateWaiter(opsMgrConnector, maxInFlight=1, verifyBool=verifyBool) as waiter:
+        return waiter.watch(groupId, version=version, timeout=timeout).result()
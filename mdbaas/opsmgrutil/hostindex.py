@@ -0,0 +1,116 @@
+import sys
+sys.path.append('')
+import logging
+import threading
+
+
+class ProjectHostIndex:
+    """
+    ProjectHostIndex class
+
+    A per-run index of the hosts in each project, keyed by groupId and then clusterId. The host list of a project is
+    fetched from ops manager the first time any caller asks for it and served from memory afterwards, so a script
+    never lists the hosts of the same project more than once. Safe to share between threads; concurrent callers
+    asking for the same project wait for a single fetch. Listeners added with addListener are told about every host
+    list fetched, e.g. to keep a HostnameIndex up to date.
+    """
+    def __init__(self, opsMgrConnector, verifyBool=True):
+        """
+        Constructor to create a ProjectHostIndex object.
+
+        :param opsMgrConnector: The OpsMgrConnector used to fetch the hosts of a project
+        :param verifyBool:      Whether or not to verify TLS certificates
+        """
+        self.opsMgrConnector    = opsMgrConnector
+        self.verifyBool         = verifyBool
+        self.lock               = threading.Lock()
+        self.groupLocks         = {}
+        self.hostsByGroup       = {}
+        self.hostsByCluster     = {}
+        self.listeners          = []
+
+    def addListener(self, listener):
+        """
+        Add Listener
+
+        :param listener:    A function taking a groupId and the array of its host documents, called every time the
+                            hosts of a project are fetched
+        """
+        with self.lock:
+            self.listeners.append(listener)
+
+    def _getGroupLock(self, groupId):
+        with self.lock:
+            if groupId not in self.groupLocks:
+                self.groupLocks[groupId] = threading.Lock()
+            return self.groupLocks[groupId]
+
+    def _indexGroup(self, groupId):
+        """
+        Index Group
+
+        Fetches and indexes the hosts of a project if they are not already indexed
+
+        :param groupId: The id of the group whose hosts we wish to index
+        """
+        if groupId in self.hostsByGroup:
+            return
+        with self._getGroupLock(groupId):
+            if groupId in self.hostsByGroup:
+                return
+            logging.debug("Indexing hosts for group {}".format(groupId))
+            hosts = list(self.opsMgrConnector.iterHosts(groupId, verifyBool=self.verifyBool))
+            hostsByCluster = {}
+            for host in hosts:
+                hostsByCluster.setdefault(host.get("clusterId", None), []).append(host)
+            self.hostsByCluster[groupId] = hostsByCluster
+            self.hostsByGroup[groupId] = hosts
+            with self.lock:
+                listeners = list(self.listeners)
+            for listener in listeners:
+                listener(groupId, hosts)
+
+    def getHostsForGroup(self, groupId):
+        """
+        Get Hosts for Group
+
+        :param groupId: The id of the group whose hosts we wish to fetch
+        :return:        An array of host documents, in the order returned by ops manager
+        """
+        self._indexGroup(groupId)
+        return self.hostsByGroup[groupId]
+
+    def getHostsForCluster(self, groupId, clusterId):
+        """
+        Get Hosts for Cluster
+
+        :param groupId:     The id of the group that contains the cluster
+        :param clusterId:   The id of the cluster whose hosts we wish to fetch
+        :return:            An array of host documents, in the order returned by ops manager
+        """
+        self._indexGroup(groupId)
+        return self.hostsByCluster[groupId].get(clusterId, [])
+
+    def getHostsByHostname(self, groupId, hostname):
+        """
+        Get Hosts by Hostname
+
+        :param groupId:     The id of the group whose hosts we wish to search
+        :param hostname:    The hostname of the server
+        :return:            An array of the host documents of every process running on the server
+        """
+        return [ host for host in self.getHostsForGroup(groupId) if host["hostname"] == hostname ]
+
+    def getHostByHostnameAndPort(self, groupId, hostname, port):
+        """
+        Get Host by Hostname and Port
+
+        :param groupId:     The id of the group whose hosts we wish to search
+        :param hostname:    The hostname of the server
+        :param port:        The port on which the mongod process is running
+        :return:            The host document, or None if the group has no such host
+        """
+        for host in self.getHostsByHostname(groupId, hostname):
+            if int(host["port"]) == int(port):
+                return host
+        return None
@@ -0,0 +1,202 @@
+import sys
+sys.path.append('')
+import os
+import json
+import time
+import logging
+import threading
+from mdbaas.util.crawler import FleetCrawler, DEFAULT_CRAWL_WORKERS
+
+# Version of the on-disk index format
+HOSTNAME_INDEX_VERSION = 1
+
+
+class HostnameIndex:
+    """
+    HostnameIndex class
+
+    A persistent index from hostname to the (groupId, hostId, clusterId) of every process running on that host.
+    Lookups are a dictionary access. The index is rebuilt incrementally: it listens to the shared ProjectHostIndex,
+    so every time the hosts of a project are fetched through it, by this index or by any other caller, the entries
+    for that project are replaced. If a hostname is not in the index, every project is scanned in parallel and the
+    scan stops as soon as the host is found.
+    """
+    def __init__(self, opsMgrConnector, hostIndex, path=None, maxWorkers=DEFAULT_CRAWL_WORKERS, verifyBool=True):
+        """
+        Constructor to create a HostnameIndex object.
+
+        :param opsMgrConnector: The OpsMgrConnector used to list the groups to scan on a miss
+        :param hostIndex:       The ProjectHostIndex used to list the hosts of a project
+        :param path:            The path of the JSON file in which to keep the index between runs, or None to only
+                                keep it for this run
+        :param maxWorkers:      The maximum number of projects to scan at the same time on a miss
+        :param verifyBool:      Whether or not to verify TLS certificates
+        """
+        self.opsMgrConnector    = opsMgrConnector
+        self.hostIndex          = hostIndex
+        self.path               = path
+        self.maxWorkers         = maxWorkers
+        self.verifyBool         = verifyBool
+        self.lock               = threading.Lock()
+        self.hostsByName        = {}
+        # The reverse of hostsByName, so re-indexing a group only touches the hostnames of that group
+        self.hostnamesByGroup   = {}
+        self.indexedGroups      = {}
+        # The groups whose entries were replaced with hosts fetched during this run
+        self.refreshedGroups    = set()
+        self.dirty              = False
+        self.load()
+        hostIndex.addListener(self.indexHosts)
+
+    def load(self):
+        """
+        Load
+
+        Reads the index from its file, if there is one
+        """
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as indexFile:
+                doc = json.load(indexFile)
+        except (IOError, ValueError) as e:
+            logging.warning("Ignoring unreadable hostname index {}: {}".format(self.path, e))
+            return
+        if doc.get("version") != HOSTNAME_INDEX_VERSION:
+            logging.info("Ignoring hostname index {} written by another version".format(self.path))
+            return
+        with self.lock:
+            self.hostsByName    = doc.get("hosts", {})
+            self.indexedGroups  = doc.get("groups", {})
+            self.hostnamesByGroup = {}
+            for hostname, entries in self.hostsByName.items():
+                for entry in entries:
+                    self.hostnamesByGroup.setdefault(entry["groupId"], set()).add(hostname)
+        logging.debug("Loaded {} hostnames from {}".format(len(self.hostsByName), self.path))
+
+    def save(self):
+        """
+        Save
+
+        Writes the index to its file if it changed since it was loaded. The file is replaced atomically so an
+        interrupted run never leaves a truncated index behind.
+        """
+        if self.path is None:
+            return
+        with self.lock:
+            if not self.dirty:
+                return
+            doc = {
+                "version"   : HOSTNAME_INDEX_VERSION,
+                "hosts"     : self.hostsByName,
+                "groups"    : self.indexedGroups
+            }
+            tmpPath = "{}.tmp".format(self.path)
+            with open(tmpPath, "w") as indexFile:
+                json.dump(doc, indexFile)
+            os.replace(tmpPath, self.path)
+            self.dirty = False
+
+    def indexGroup(self, groupId):
+        """
+        Index Group
+
+        Replaces the entries of a project with its current hosts
+
+        :param groupId: The id of the group to index
+        :return:        The array of host documents of the group
+        """
+        hosts = self.hostIndex.getHostsForGroup(groupId)
+        with self.lock:
+            refreshed = groupId in self.refreshedGroups
+        if not refreshed:
+            # Hosts fetched before this index listened to the ProjectHostIndex
+            self.indexHosts(groupId, hosts)
+        return hosts
+
+    def indexHosts(self, groupId, hosts):
+        """
+        Index Hosts
+
+        Replaces the entries of a project with the hosts just fetched for it
+
+        :param groupId: The id of the group
+        :param hosts:   The array of host documents of the group
+        """
+        with self.lock:
+            for hostname in self.hostnamesByGroup.pop(groupId, set()):
+                entries = [ entry for entry in self.hostsByName.get(hostname, []) if entry["groupId"] != groupId ]
+                if entries:
+                    self.hostsByName[hostname] = entries
+                else:
+                    self.hostsByName.pop(hostname, None)
+            hostnames = set()
+            for host in hosts:
+                hostnames.add(host["hostname"])
+                self.hostsByName.setdefault(host["hostname"], []).append({
+                    "groupId"   : groupId,
+                    "hostId"    : host.get("id", None),
+                    "clusterId" : host.get("clusterId", None),
+                    "port"      : host.get("port", None),
+                    "typeName"  : host.get("typeName", None)
+                })
+            self.hostnamesByGroup[groupId] = hostnames
+            self.indexedGroups[groupId] = time.time()
+            self.refreshedGroups.add(groupId)
+            self.dirty = True
+
+    def lookup(self, hostnames):
+        """
+        Lookup
+
+        :param hostnames:   An array of names the host may be known by, e.g. its FQDN and short name
+        :return:            An array of (groupId, hostId, clusterId) entries for the first name in the index, or an
+                            empty array if none of the names are indexed
+        """
+        with self.lock:
+            for hostname in hostnames:
+                if hostname in self.hostsByName:
+                    return list(self.hostsByName[hostname])
+        return []
+
+    def findGroupId(self, hostnames):
+        """
+        Find Group Id
+
+        Finds the group that contains a host. An indexed group is confirmed by re-listing its hosts, which the
+        caller's ProjectHostIndex then reuses; if the host has moved, or was never indexed, all projects are
+        scanned in parallel.
+
+        :param hostnames:   An array of names the host may be known by, e.g. its FQDN and short name
+        :return:            The id of the group that contains the host, or None if no group does
+        """
+        for entry in self.lookup(hostnames):
+            hosts = self.indexGroup(entry["groupId"])
+            if any(host["hostname"] in hostnames for host in hosts):
+                logging.debug("Found hostname {} in the hostname index".format(hostnames))
+                self.save()
+                return entry["groupId"]
+
+        logging.info("Hostname {} is not indexed; scanning all groups".format(hostnames))
+        groupId = self.scan(hostnames)
+        self.save()
+        return groupId
+
+    def scan(self, hostnames):
+        """
+        Scan
+
+        Indexes every group in parallel until one containing the host is found
+
+        :param hostnames:   An array of names the host may be known by
+        :return:            The id of the group that contains the host, or None if no group does
+        """
+        def scanGroup(group):
+            hosts = self.indexGroup(group["id"])
+            if any(host["hostname"] in hostnames for host in hosts):
+                return group["id"]
+            return None
+
+        groups = self.opsMgrConnector.iterGroups(verifyBool=self.verifyBool)
+        with FleetCrawler(self.maxWorkers) as crawler:
+            return crawler.findFirst(scanGroup, groups)
@@ -0,0 +1,238 @@
+import sys
+sys.path.append('')
+import logging
+import threading
+from mdbaas.util.crawler import FleetCrawler
+from mdbaas.util.timeseries import parseIsoDuration, toEpochSeconds, toTimestamp
+
+# Measurement endpoints a request may target
+HOST_MEASUREMENTS       = "hosts"
+DISK_MEASUREMENTS       = "disks"
+DATABASE_MEASUREMENTS   = "databases"
+
+
+class MeasurementRequest:
+    """
+    MeasurementRequest class
+
+    A request for some measurements of one host, disk partition or database, at one granularity, over a period
+    ending now. Its result is set once the planner it was added to has executed.
+    """
+    def __init__(self, kind, groupId, hostId, name, measurementTypes, granularity, period):
+        """
+        Constructor to create a MeasurementRequest object.
+
+        :param kind:                One of HOST_MEASUREMENTS, DISK_MEASUREMENTS or DATABASE_MEASUREMENTS
+        :param groupId:             The id of the group of the host
+        :param hostId:              The id of the host
+        :param name:                The partition name or database name, or None for host measurements
+        :param measurementTypes:    An array of measurement types, or None for all of them
+        :param granularity:         The ISO-8601 duration between samples, e.g. PT1H
+        :param period:              The ISO-8601 duration of the window, e.g. P30D
+        """
+        self.kind               = kind
+        self.groupId            = groupId
+        self.hostId             = hostId
+        self.name               = name
+        self.measurementTypes   = None if measurementTypes is None else list(measurementTypes)
+        self.granularity        = granularity
+        self.period             = period
+        self.result             = None
+        self.done               = False
+
+    def getCallKey(self):
+        # Requests with the same key can be served by a single call
+        return (self.kind, self.groupId, self.hostId, self.name, self.granularity)
+
+    def getResult(self):
+        """
+        Get Result
+
+        :return:    The measurements API response restricted to the requested measurement types and period
+        """
+        if not self.done:
+            raise ValueError("Measurement request for host {} has not been executed".format(self.hostId))
+        return self.result
+
+
+class MeasurementPlanner:
+    """
+    MeasurementPlanner class
+
+    Collects measurement requests from any number of callers and executes them as the fewest measurements API
+    calls: all requests for the same host, disk partition or database at the same granularity are merged into a
+    single call for the union of their measurement types over the longest of their periods. Each request then gets
+    back the response restricted to its own measurement types and period. The merged calls run in parallel.
+
+    Given an end, every call asks for the interval from the start of its period to that end instead of for a period
+    ending whenever ops manager answers, so the windows of all calls line up with a caller's own clock, e.g. with the
+    last sample of a TimeSeriesStore.
+    """
+    def __init__(self, opsMgrConnector, maxWorkers=1, verifyBool=True, end=None, crawler=None):
+        """
+        Constructor to create a MeasurementPlanner object.
+
+        :param opsMgrConnector: The OpsMgrConnector with which to fetch the measurements
+        :param maxWorkers:      The maximum number of merged calls to send at the same time
+        :param verifyBool:      Whether or not to verify TLS certificates
+        :param end:             The epoch timestamp the periods of all requests end at, or None for when each call
+                                is answered
+        :param crawler:         A FleetCrawler to send the merged calls with instead of a pool of maxWorkers threads
+                                started per execute, e.g. the one a script crawls the fleet with. execute must then
+                                not be called from one of its own tasks.
+        """
+        self.opsMgrConnector    = opsMgrConnector
+        self.maxWorkers         = maxWorkers
+        self.verifyBool         = verifyBool
+        self.end                = end
+        self.crawler            = crawler
+        self.lock               = threading.Lock()
+        self.pending            = []
+        self.numRequests        = 0
+        self.numCalls           = 0
+
+    def addHostRequest(self, groupId, hostId, measurementTypes, granularity, period):
+        return self.add(MeasurementRequest(HOST_MEASUREMENTS, groupId, hostId, None, measurementTypes, granularity, period))
+
+    def addDiskRequest(self, groupId, hostId, partitionName, measurementTypes, granularity, period):
+        return self.add(MeasurementRequest(DISK_MEASUREMENTS, groupId, hostId, partitionName, measurementTypes, granularity,
+                                           period))
+
+    def addDatabaseRequest(self, groupId, hostId, databaseName, measurementTypes, granularity, period):
+        return self.add(MeasurementRequest(DATABASE_MEASUREMENTS, groupId, hostId, databaseName, measurementTypes,
+                                           granularity, period))
+
+    def add(self, request):
+        """
+        Add
+
+        :param request: A MeasurementRequest
+        :return:        The request, whose result is available once execute has been called
+        """
+        with self.lock:
+            self.pending.append(request)
+        return request
+
+    def plan(self, requests):
+        """
+        Plan
+
+        :param requests:    An array of MeasurementRequests
+        :return:            A document mapping each call key to the merged call: the requests it serves, the union
+                            of their measurement types, or None for all types, and the longest of their periods
+        """
+        calls = {}
+        for request in requests:
+            call = calls.setdefault(request.getCallKey(), { "requests" : [], "measurementTypes" : [], "period" : None })
+            call["requests"].append(request)
+            if request.measurementTypes is None or call["measurementTypes"] is None:
+                call["measurementTypes"] = None
+            else:
+                for measurementType in request.measurementTypes:
+                    if measurementType not in call["measurementTypes"]:
+                        call["measurementTypes"].append(measurementType)
+            if call["period"] is None or parseIsoDuration(request.period) > parseIsoDuration(call["period"]):
+                call["period"] = request.period
+        return calls
+
+    def execute(self):
+        """
+        Execute
+
+        Sends the merged calls for every request added since the last execute and sets the result of each request
+        """
+        with self.lock:
+            requests = self.pending
+            self.pending = []
+        calls = self.plan(requests)
+        logging.debug("Serving {} measurement requests with {} calls".format(len(requests), len(calls)))
+
+        def executeCall(item):
+            callKey, call = item
+            response = self.fetch(callKey, call["measurementTypes"], call["period"])
+            for request in call["requests"]:
+                request.result = splitResponse(response, request.measurementTypes,
+                                               None if request.period == call["period"] else request.period)
+                request.done = True
+
+        if self.crawler is not None:
+            self.crawler.map(executeCall, calls.items())
+        else:
+            with FleetCrawler(self.maxWorkers) as crawler:
+                crawler.map(executeCall, calls.items())
+        with self.lock:
+            self.numRequests += len(requests)
+            self.numCalls += len(calls)
+
+    def fetch(self, callKey, measurementTypes, period):
+        kind, groupId, hostId, name, granularity = callKey
+        if self.end is not None:
+            return self.fetchInterval(callKey, measurementTypes, toTimestamp(self.end - parseIsoDuration(period)),
+                                      toTimestamp(self.end))
+        if kind == HOST_MEASUREMENTS:
+            return self.opsMgrConnector.getMeasurementsOverPeriodForHost(groupId, hostId, granularity, period,
+                                                                         measurementTypes or [], verifyBool=self.verifyBool)
+        if kind == DISK_MEASUREMENTS:
+            return self.opsMgrConnector.getDiskPartitionMeasurementOverPeriodForHost(groupId, hostId, name, granularity, period,
+                                                                                     measurementTypes=measurementTypes,
+                                                                                     verifyBool=self.verifyBool)
+        return self.opsMgrConnector.getDatabaseMeasurementsOverPeriodForHost(groupId, hostId, name, granularity, period,
+                                                                             measurementTypes=measurementTypes,
+                                                                             verifyBool=self.verifyBool)
+
+    def fetchInterval(self, callKey, measurementTypes, intervalStart, intervalEnd):
+        kind, groupId, hostId, name, granularity = callKey
+        if kind == HOST_MEASUREMENTS:
+            return self.opsMgrConnector.getMeasurementsOverIntervalForHost(groupId, hostId, granularity, intervalStart,
+                                                                           intervalEnd, measurementTypes=measurementTypes,
+                                                                           verifyBool=self.verifyBool)
+        if kind == DISK_MEASUREMENTS:
+            return self.opsMgrConnector.getDiskPartitionMeasurementOverIntervalForHost(groupId, hostId, name, granularity,
+                                                                                       intervalStart, intervalEnd,
+                                                                                       measurementTypes=measurementTypes,
+                                                                                       verifyBool=self.verifyBool)
+        return self.opsMgrConnector.getDatabaseMeasurementsOverIntervalForHost(groupId, hostId, name, granularity,
+                                                                               intervalStart, intervalEnd,
+                                                                               measurementTypes=measurementTypes,
+                                                                               verifyBool=self.verifyBool)
+
+    def getStats(self):
+        """
+        Get Stats
+
+        :return:    A document with the number of requests served and the number of calls sent to serve them
+        """
+        with self.lock:
+            return { "requests" : self.numRequests, "calls" : self.numCalls }
+
+
+def splitResponse(response, measurementTypes, period):
+    """
+    Split Response
+
+    :param response:            The response of a merged measurements call
+    :param measurementTypes:    The measurement types to keep, or None for all of them
+    :param period:              The ISO-8601 duration of the window to keep, ending at the end of the response, or
+                                None to keep the whole response
+    :return:                    A copy of the response with only those measurements and data points
+    """
+    if "measurements" not in response:
+        return response
+    cutoff = None
+    if period is not None and response.get("end", None) is not None:
+        cutoff = toEpochSeconds(response["end"]) - parseIsoDuration(period)
+
+    result = { key : value for key, value in response.items() if key != "measurements" }
+    if cutoff is not None:
+        result["start"] = toTimestamp(cutoff)
+    result["measurements"] = []
+    for measurement in response["measurements"]:
+        if measurementTypes is not None and measurement["name"] not in measurementTypes:
+            continue
+        dataPoints = measurement["dataPoints"]
+        if cutoff is not None:
+            dataPoints = [ dataPoint for dataPoint in dataPoints if toEpochSeconds(dataPoint["timestamp"]) >= cutoff ]
+        splitMeasurement = dict(measurement)
+        splitMeasurement["dataPoints"] = list(dataPoints)
+        result["measurements"].append(splitMeasurement)
+    return result
@@ -0,0 +1,161 @@
+import sys
+sys.path.append('')
+import logging
+
+DEFAULT_MONGODB_PORT = 27017
+
+# typeName of the cluster ops manager lists for a sharded cluster as a whole
+SHARDED_CLUSTER_TYPE_NAME = "SHARDED_REPLICA_SET"
+
+
+def getProcessHostAndPort(process):
+    """
+    Get Process Host And Port
+
+    :param process: A process document from the automation config
+    :return:        A (hostname, port) tuple
+    """
+    return (process["hostname"], process.get("args2_6", {}).get("net", {}).get("port", DEFAULT_MONGODB_PORT))
+
+
+class TopologyIndex:
+    """
+    TopologyIndex class
+
+    A read only index of the deployment described by an automation config, built once per config on top of the
+    indexes of its AutomationConfig: processes by (hostname, port), processes to their replica set or sharded
+    cluster, and sharded clusters to their shards, config server replica set and mongos processes. Every lookup is a
+    dictionary lookup, so resolving the processes of all clusters of a project costs time linear in the size of the
+    config instead of quadratic.
+    """
+    def __init__(self, automationConfig):
+        """
+        Constructor to create a TopologyIndex object.
+
+        :param automationConfig:    The AutomationConfig of a project
+        """
+        self.automationConfig       = automationConfig
+        self.processesByHostAndPort = {}
+        self.replicaSetByProcess    = {}
+        self.shardedClusters        = {}
+        self.shardedClusterByReplicaSet = {}
+        self.shardedClusterByProcess    = {}
+
+        for process in automationConfig.processesByName.values():
+            self.processesByHostAndPort[getProcessHostAndPort(process)] = process
+
+        for replicaSetId in automationConfig.replicaSetsById:
+            for process in automationConfig.getReplicaSetProcesses(replicaSetId):
+                self.replicaSetByProcess[process["name"]] = replicaSetId
+
+        for cluster in automationConfig.shardedClustersByName.values():
+            shardedCluster = {
+                "name"                  : cluster["name"],
+                "shards"                : { shard["_id"] : shard["rs"] for shard in cluster.get("shards", []) },
+                "configServerReplicaSet": cluster.get("configServerReplica", None),
+                "mongos"                : []
+            }
+            self.shardedClusters[cluster["name"]] = shardedCluster
+            replicaSetIds = list(shardedCluster["shards"].values())
+            if shardedCluster["configServerReplicaSet"] is not None:
+                replicaSetIds.append(shardedCluster["configServerReplicaSet"])
+            for replicaSetId in replicaSetIds:
+                self.shardedClusterByReplicaSet[replicaSetId] = cluster["name"]
+                for process in automationConfig.getReplicaSetProcesses(replicaSetId):
+                    self.shardedClusterByProcess[process["name"]] = cluster["name"]
+
+        for process in automationConfig.processesByName.values():
+            if process.get("processType", None) == "mongos" and process.get("cluster", None) in self.shardedClusters:
+                self.shardedClusters[process["cluster"]]["mongos"].append(process["name"])
+                self.shardedClusterByProcess[process["name"]] = process["cluster"]
+
+        logging.debug("Indexed {} processes in {} replica sets and {} sharded clusters".format(
+            len(automationConfig.processesByName), len(automationConfig.replicaSetsById), len(self.shardedClusters)))
+
+    ############################################################################
+    # Process Methods
+    ############################################################################
+
+    def getProcess(self, processName):
+        return self.automationConfig.getProcess(processName)
+
+    def getProcessByHostAndPort(self, hostname, port):
+        """
+        Get Process By Host And Port
+
+        :param hostname:    The hostname of the process
+        :param port:        The port of the process
+        :return:            The process document, or None if the config has no process on that host and port
+        """
+        return self.processesByHostAndPort.get((hostname, port), None)
+
+    def getReplicaSetForProcess(self, processName):
+        return self.replicaSetByProcess.get(processName, None)
+
+    def getShardedClusterForProcess(self, processName):
+        return self.shardedClusterByProcess.get(processName, None)
+
+    def getClusterNameForProcess(self, processName):
+        """
+        Get Cluster Name For Process
+
+        :param processName: The name of the process
+        :return:            The replica set of the process, or for a mongos the name of its sharded cluster, or None
+        """
+        return self.getReplicaSetForProcess(processName) or self.getShardedClusterForProcess(processName)
+
+    ############################################################################
+    # Cluster Methods
+    ############################################################################
+
+    def getReplicaSetProcesses(self, replicaSetId):
+        """
+        Get Replica Set Processes
+
+        :param replicaSetId:    The _id of the replica set
+        :return:                An array of the process documents of its members, empty for an unknown replica set
+        """
+        return self.automationConfig.getReplicaSetProcesses(replicaSetId)
+
+    def getShardedCluster(self, clusterName):
+        """
+        Get Sharded Cluster
+
+        :param clusterName: The name of the sharded cluster
+        :return:            A document with the name of the cluster, its shards mapped to their replica sets, its
+                            config server replica set and the names of its mongos processes, or None
+        """
+        return self.shardedClusters.get(clusterName, None)
+
+    def getShardedClusterProcesses(self, clusterName):
+        """
+        Get Sharded Cluster Processes
+
+        :param clusterName: The name of the sharded cluster
+        :return:            An array of the process documents of its shards, then its config servers, then its mongos
+        """
+        shardedCluster = self.getShardedCluster(clusterName)
+        if shardedCluster is None:
+            return []
+        processes = []
+        for replicaSetId in shardedCluster["shards"].values():
+            processes.extend(self.getReplicaSetProcesses(replicaSetId))
+        if shardedCluster["configServerReplicaSet"] is not None:
+            processes.extend(self.getReplicaSetProcesses(shardedCluster["configServerReplicaSet"]))
+        processes.extend(self.getProcess(processName) for processName in shardedCluster["mongos"])
+        return processes
+
+    def getProcessesForCluster(self, cluster):
+        """
+        Get Processes For Cluster
+
+        :param cluster: A cluster document as returned by ops manager for GET /groups/GROUP-ID/clusters
+        :return:        An array of the process documents of the cluster: every process of a sharded cluster, or the
+                        members of a replica set, shard or config server replica set
+        """
+        if cluster.get("typeName", None) == SHARDED_CLUSTER_TYPE_NAME or \
+                ("replicaSetName" not in cluster and cluster.get("clusterName", None) in self.shardedClusters):
+            return self.getShardedClusterProcesses(cluster["clusterName"])
+        if "replicaSetName" in cluster:
+            return self.getReplicaSetProcesses(cluster["replicaSetName"])
+        return []
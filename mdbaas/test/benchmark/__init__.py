@@ -0,0 +1,5 @@
+import sys
+sys.path.append('')
+from mdbaas.test.benchmark.phases import PhaseRecorder, getPeakRss, resetPeakRss, getApiCallCount
+from mdbaas.test.benchmark.cases import BENCHMARK_CASES, getInstallationForHosts
+from mdbaas.test.benchmark.baseline import compareResults, loadResults, saveResults, DEFAULT_THRESHOLDS
@@ -0,0 +1,93 @@
+import sys
+sys.path.append('')
+import json
+
+# Largest relative increase over the baseline tolerated for each metric before it is flagged as a regression
+DEFAULT_THRESHOLDS = {
+    "wallTime"  : 0.20,
+    "cpuTime"   : 0.20,
+    "peakRss"   : 0.10,
+    "apiCalls"  : 0.0
+}
+
+# Absolute increases below these are noise on a small run and never flagged
+MIN_DELTAS = {
+    "wallTime"  : 0.05,
+    "cpuTime"   : 0.05,
+    "peakRss"   : 5*1024*1024,
+    "apiCalls"  : 0
+}
+
+
+def loadResults(path):
+    with open(path) as resultsFile:
+        return json.load(resultsFile)
+
+
+def saveResults(path, results):
+    with open(path, "w") as resultsFile:
+        json.dump(results, resultsFile, indent=4)
+
+
+def _indexPhases(results):
+    index = {}
+    for run in results.get("runs", []):
+        for phase in run.get("phases", []):
+            index[(run["script"], run["hosts"], phase["phase"])] = phase
+    return index
+
+
+def compareResults(results, baseline, thresholds=None):
+    """
+    Compare Results
+
+    :param results:     The document written by a benchmark run
+    :param baseline:    The document of an earlier run to compare against
+    :param thresholds:  A document mapping each metric to the largest relative increase tolerated, by default
+                        DEFAULT_THRESHOLDS
+    :return:            An array of regressions, one document per script, size, phase and metric that got worse
+                        than its threshold, and one per phase of the baseline that a script benchmarked at the same
+                        size no longer recorded. Scripts and sizes not benchmarked by both runs are not compared.
+    """
+    thresholds = thresholds or DEFAULT_THRESHOLDS
+    baselinePhases = _indexPhases(baseline)
+    phases = _indexPhases(results)
+    benchmarked = set((run["script"], run["hosts"]) for run in results.get("runs", []))
+    regressions = []
+    for key in sorted(set(baselinePhases) - set(phases)):
+        script, hosts, phaseName = key
+        if (script, hosts) not in benchmarked:
+            continue
+        regressions.append({
+            "script"    : script,
+            "hosts"     : hosts,
+            "phase"     : phaseName,
+            "metric"    : "phase",
+            "baseline"  : "recorded",
+            "current"   : "missing",
+            "change"    : None
+        })
+    for key, phase in sorted(phases.items()):
+        baselinePhase = baselinePhases.get(key, None)
+        if baselinePhase is None:
+            continue
+        script, hosts, phaseName = key
+        for metric, threshold in thresholds.items():
+            if metric not in phase or metric not in baselinePhase:
+                continue
+            current, previous = phase[metric], baselinePhase[metric]
+            delta = current - previous
+            if delta <= MIN_DELTAS.get(metric, 0):
+                continue
+            if previous > 0 and delta / float(previous) <= threshold:
+                continue
+            regressions.append({
+                "script"    : script,
+                "hosts"     : hosts,
+                "phase"     : phaseName,
+                "metric"    : metric,
+                "baseline"  : previous,
+                "current"   : current,
+                "change"    : delta / float(previous) if previous > 0 else None
+            })
+    return regressions
@@ -0,0 +1,136 @@
+import sys
+sys.path.append('')
+import os
+from mdbaas.opsmgrutil import OpsMgrConnector, ProjectHostIndex, HostnameIndex
+from mdbaas.atlasutil import AtlasConnector
+from mdbaas.util import FleetCrawler, DEFAULT_CRAWL_WORKERS
+from mdbaas.test.simulator import SyntheticInstallation
+
+# Shape of the synthetic installations: replica sets of HOSTS_PER_CLUSTER hosts, CLUSTERS_PER_PROJECT per project
+HOSTS_PER_CLUSTER       = 5
+CLUSTERS_PER_PROJECT    = 2
+MAX_PROJECTS_PER_ORG    = 100
+
+# Slow query log lines per host and hour served to the benchmarks, lower than the simulator default to keep the
+# largest installations tractable
+BENCHMARK_SLOW_QUERIES_PER_HOUR = 5
+
+# Number of hosts, spread over the installation, the health check is run for
+HEALTHCHECK_SAMPLE_HOSTS = 10
+
+
+def getInstallationForHosts(numHosts, seed=0):
+    """
+    Get Installation For Hosts
+
+    :param numHosts:    The number of hosts the installation should have, rounded to whole projects
+    :param seed:        The seed of the installation
+    :return:            A SyntheticInstallation of about numHosts hosts
+    """
+    numProjects = max(1, numHosts // (HOSTS_PER_CLUSTER * CLUSTERS_PER_PROJECT))
+    numOrgs = max(1, (numProjects + MAX_PROJECTS_PER_ORG - 1) // MAX_PROJECTS_PER_ORG)
+    return SyntheticInstallation(numOrgs=numOrgs, projectsPerOrg=numProjects // numOrgs,
+                                 clustersPerProject=CLUSTERS_PER_PROJECT, hostsPerCluster=HOSTS_PER_CLUSTER, seed=seed,
+                                 slowQueriesPerHour=BENCHMARK_SLOW_QUERIES_PER_HOUR)
+
+
+def runStorageData(uri, apiUser, apiKey, installation, recorder, workDir):
+    """
+    Run Storage Data
+
+    Benchmarks get_storage_data.collect_storage_data over the whole installation
+    """
+    with recorder.phase("setup"):
+        from scripts import get_storage_data
+        opsMgrConnector = OpsMgrConnector(uri, apiUser, apiKey, poolMaxSize=DEFAULT_CRAWL_WORKERS,
+                                          maxInFlight=DEFAULT_CRAWL_WORKERS)
+        get_storage_data.opsMgrConnector = opsMgrConnector
+        get_storage_data.verifyCerts = True
+        get_storage_data.timeSeriesStore = None
+        get_storage_data.hostIndex = ProjectHostIndex(opsMgrConnector)
+
+    with recorder.phase("run"):
+        with FleetCrawler(DEFAULT_CRAWL_WORKERS) as crawler:
+            get_storage_data.crawler = crawler
+            get_storage_data.collect_storage_data(os.path.join(workDir, "storage_data.txt"))
+    opsMgrConnector.close()
+
+
+def runAuditData(uri, apiUser, apiKey, installation, recorder, workDir):
+    """
+    Run Audit Data
+
+    Benchmarks collectauditdata.collectAuditData over every project of the installation
+    """
+    with recorder.phase("setup"):
+        from scripts import collectauditdata
+        opsMgrConnector = OpsMgrConnector(uri, apiUser, apiKey)
+        collectauditdata.opsMgrConnector = opsMgrConnector
+        collectauditdata.hostIndex = ProjectHostIndex(opsMgrConnector)
+
+    with recorder.phase("run"):
+        collectauditdata.collectAuditData({
+            "projectAppEnv"  : None,
+            "projectAppName" : None,
+            "projectId"      : None,
+            "projectName"    : None
+        })
+    opsMgrConnector.close()
+
+
+def runHealthCheck(uri, apiUser, apiKey, installation, recorder, workDir):
+    """
+    Run Health Check
+
+    Benchmarks healthcheck.getHealthCheckData for HEALTHCHECK_SAMPLE_HOSTS hosts spread over the installation. The
+    first host pays for building the hostname index, so it is measured as a phase of its own.
+    """
+    hosts = [ host for group in installation.groups for host in installation.hosts[group["id"]] ]
+    step = max(1, len(hosts) // HEALTHCHECK_SAMPLE_HOSTS)
+    sampleHosts = hosts[::step][:HEALTHCHECK_SAMPLE_HOSTS]
+
+    with recorder.phase("setup"):
+        from appteamscripts import healthcheck
+        opsMgrConnector = OpsMgrConnector(uri, apiUser, apiKey)
+        healthcheck.opsMgrConnector = opsMgrConnector
+        healthcheck.hostIndex = ProjectHostIndex(opsMgrConnector)
+        healthcheck.hostnameIndex = HostnameIndex(opsMgrConnector, healthcheck.hostIndex)
+
+    with recorder.phase("firstHost"):
+        healthcheck.getHealthCheckData(sampleHosts[0]["hostname"])
+
+    with recorder.phase("run"):
+        for host in sampleHosts[1:]:
+            healthcheck.getHealthCheckData(host["hostname"])
+    opsMgrConnector.close()
+
+
+def runPerfAdvisor(uri, apiUser, apiKey, installation, recorder, workDir):
+    """
+    Run Perf Advisor
+
+    Benchmarks perf_advisor_check.collect_perf_advisor_data_for_project for every project of the installation
+    """
+    with recorder.phase("setup"):
+        from appteamscripts import perf_advisor_check
+        atlasConnector = AtlasConnector(apiUser, apiKey, atlasUri=uri)
+        perf_advisor_check.atlasConnector = atlasConnector
+
+    with recorder.phase("run"):
+        # The slow query logs are written relative to the working directory
+        cwd = os.getcwd()
+        os.chdir(workDir)
+        try:
+            for group in installation.groups:
+                perf_advisor_check.collect_perf_advisor_data_for_project(group["id"])
+        finally:
+            os.chdir(cwd)
+    atlasConnector.close()
+
+
+BENCHMARK_CASES = {
+    "get_storage_data"      : runStorageData,
+    "collectauditdata"      : runAuditData,
+    "healthcheck"           : runHealthCheck,
+    "perf_advisor_check"    : runPerfAdvisor
+}
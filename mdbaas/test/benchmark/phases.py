@@ -0,0 +1,93 @@
+import sys
+sys.path.append('')
+import time
+import logging
+import resource
+from contextlib import contextmanager
+from mdbaas.util.apimetrics import getApiMetrics
+
+
+def resetPeakRss():
+    """
+    Reset Peak RSS
+
+    Resets the peak resident set size of this process to its current size, so the peak of the next phase can be
+    measured on its own. Only supported on linux; elsewhere the peak keeps covering the whole process.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as clearRefs:
+            clearRefs.write("5")
+    except OSError:
+        pass
+
+
+def getPeakRss():
+    """
+    Get Peak RSS
+
+    :return:    The peak resident set size of this process in bytes since it started or was last reset
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on linux but in bytes on macos
+    return maxRss if sys.platform == "darwin" else maxRss * 1024
+
+
+def getApiCallCount():
+    """
+    Get Api Call Count
+
+    :return:    The number of requests recorded in the shared ApiMetrics so far, over all endpoints
+    """
+    return getApiMetrics().getTransferTotals()["requests"]
+
+
+class PhaseRecorder:
+    """
+    PhaseRecorder class
+
+    Measures the phases of a benchmark run one after the other: wall time, CPU time, API calls sent, response
+    bytes received over the wire and once decompressed, and peak RSS of each phase.
+    """
+    def __init__(self):
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Phase
+
+        A context manager measuring the code run inside it as the phase with the given name
+
+        :param name:    The name of the phase, e.g. setup or run
+        """
+        resetPeakRss()
+        transfer = getApiMetrics().getTransferTotals()
+        cpuTime = time.process_time()
+        wallTime = time.perf_counter()
+        try:
+            yield
+        finally:
+            wallTime = time.perf_counter() - wallTime
+            cpuTime = time.process_time() - cpuTime
+            totals = getApiMetrics().getTransferTotals()
+            result = {
+                "phase"         : name,
+                "wallTime"      : wallTime,
+                "cpuTime"       : cpuTime,
+                "apiCalls"      : totals["requests"] - transfer["requests"],
+                "bytesIn"       : totals["bytesIn"] - transfer["bytesIn"],
+                "bytesInDecoded": totals["bytesInDecoded"] - transfer["bytesInDecoded"],
+                "peakRss"       : getPeakRss()
+            }
+            self.phases.append(result)
+            logging.debug("Benchmark phase {} took {:.3f}s".format(name, result["wallTime"]))
+
+    def getPhases(self):
+        return list(self.phases)
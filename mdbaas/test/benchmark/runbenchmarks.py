@@ -0,0 +1,192 @@
+#!/usr/bin/python
+import sys
+
+sys.path.append('.')
+import io
+import os
+import json
+import logging
+import platform
+import argparse
+import tempfile
+import traceback
+import subprocess
+import contextlib
+from datetime import datetime, timezone
+
+from mdbaas.util import getJsonBackend
+from mdbaas.test.simulator import ApiSimulator
+from mdbaas.test.benchmark.phases import PhaseRecorder
+from mdbaas.test.benchmark.cases import BENCHMARK_CASES, getInstallationForHosts
+from mdbaas.test.benchmark.baseline import loadResults, saveResults, compareResults
+
+# Script metadata
+version = "1.0.0"
+revdate = "10-18-2026"
+scriptName = "runbenchmarks"
+scriptNameFull = scriptName + ".py"
+
+DEFAULT_SIZES = [ 10, 100, 1000, 10000 ]
+
+API_USER = "benchmark"
+API_KEY  = "benchmark"
+
+
+########################################################################################################################
+# Main Substantive Methods
+########################################################################################################################
+def runCase(script, uri, numHosts, seed, resultFile):
+    """
+    Run Case
+
+    Runs a single benchmark case in this process and writes its phases to resultFile. Each case runs in a process
+    of its own so that its peak RSS and CPU time are not mixed up with the simulator or other cases.
+
+    :param script:      The name of the script to benchmark, one of BENCHMARK_CASES
+    :param uri:         The uri of the running simulator
+    :param numHosts:    The number of hosts of the installation the simulator serves
+    :param seed:        The seed of that installation
+    :param resultFile:  The path of the JSON file to write the result to
+    """
+    installation = getInstallationForHosts(numHosts, seed)
+    recorder = PhaseRecorder()
+    error = None
+    with tempfile.TemporaryDirectory() as workDir:
+        try:
+            # The scripts print their reports; only the measurements are of interest here
+            with contextlib.redirect_stdout(io.StringIO()):
+                BENCHMARK_CASES[script](uri, API_USER, API_KEY, installation, recorder, workDir)
+        except Exception as e:
+            logging.debug(traceback.format_exc())
+            error = "{}: {}".format(type(e).__name__, e)
+    saveResults(resultFile, { "script" : script, "hosts" : numHosts, "phases" : recorder.getPhases(), "error" : error })
+
+
+def runBenchmarks(scripts, sizes, seed, latency, latencyJitter):
+    """
+    Run Benchmarks
+
+    :param scripts:         The names of the scripts to benchmark
+    :param sizes:           The numbers of hosts to benchmark each script at
+    :param seed:            The seed of the synthetic installations
+    :param latency:         The number of seconds the simulator delays every response by
+    :param latencyJitter:   The largest number of seconds randomly added to the latency
+    :return:                A document with the environment and one run per script and size
+    """
+    runs = []
+    for numHosts in sizes:
+        installation = getInstallationForHosts(numHosts, seed)
+        with ApiSimulator(installation, apiUser=API_USER, apiKey=API_KEY, latency=latency,
+                          latencyJitter=latencyJitter, seed=seed) as simulator:
+            for script in scripts:
+                logging.info("Benchmarking {} at {} hosts".format(script, numHosts))
+                with tempfile.NamedTemporaryFile(suffix=".json") as resultFile:
+                    command = [ sys.executable, "-m", "mdbaas.test.benchmark.runbenchmarks", "--case", script,
+                                "--uri", simulator.getUri(), "--hosts", str(numHosts), "--seed", str(seed),
+                                "--resultFile", resultFile.name ]
+                    completed = subprocess.run(command)
+                    if completed.returncode != 0:
+                        run = { "script" : script, "hosts" : numHosts, "phases" : [],
+                                "error" : "Exited with code {}".format(completed.returncode) }
+                    else:
+                        run = loadResults(resultFile.name)
+                for phase in run["phases"]:
+                    logging.info("  {phase}: {wallTime:.3f}s wall, {cpuTime:.3f}s cpu, {apiCalls} api calls, "
+                                 "{peakRss} bytes peak rss".format(**phase))
+                runs.append(run)
+    return {
+        "created"       : datetime.now(timezone.utc).isoformat(),
+        "python"        : platform.python_version(),
+        "platform"      : platform.platform(),
+        "jsonBackend"   : getJsonBackend(),
+        "latency"       : latency,
+        "latencyJitter" : latencyJitter,
+        "seed"          : seed,
+        "runs"          : runs
+    }
+
+
+def setupArgs():
+    """
+    Setup args
+    Parses all command line arguments to the script
+    """
+    parser = argparse.ArgumentParser(description='Benchmarks the reporting scripts against a simulated ops manager')
+    parser.add_argument('--scripts', required=False, action="store", dest='scripts', nargs="+",
+                        default=list(BENCHMARK_CASES.keys()), choices=list(BENCHMARK_CASES.keys()),
+                        help='The scripts to benchmark.')
+    parser.add_argument('--sizes', required=False, action="store", dest='sizes', nargs="+", type=int,
+                        default=DEFAULT_SIZES, help='The numbers of hosts to benchmark each script at.')
+    parser.add_argument('--seed', required=False, action="store", dest='seed', default=0, type=int,
+                        help='The seed of the synthetic installations.')
+    parser.add_argument('--latency', required=False, action="store", dest='latency', default=0.0, type=float,
+                        help='The number of seconds the simulator delays every response by.')
+    parser.add_argument('--latencyJitter', required=False, action="store", dest='latencyJitter', default=0.0, type=float,
+                        help='The largest number of seconds randomly added to the latency.')
+    parser.add_argument('--output', required=False, action="store", dest='output', default='benchmark_results.json',
+                        help='The JSON file to write the results to.')
+    parser.add_argument('--baseline', required=False, action="store", dest='baseline', default=None,
+                        help='A results file of an earlier run to flag regressions against.')
+    parser.add_argument('--saveBaseline', required=False, action="store_true", dest='saveBaseline', default=False,
+                        help='Also write the results to the baseline file, replacing it.')
+
+    # Used by the benchmark itself to run a single case in a process of its own
+    parser.add_argument('--case', required=False, action="store", dest='case', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--uri', required=False, action="store", dest='uri', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--hosts', required=False, action="store", dest='hosts', default=None, type=int,
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--resultFile', required=False, action="store", dest='resultFile', default=None,
+                        help=argparse.SUPPRESS)
+
+    parser.add_argument('--loglevel', required=False, action="store", dest='logLevel', default='info',
+                        help='Log level. Possible values are [none, info, verbose]')
+    return parser.parse_args()
+
+
+def _configureLogger(logLevel):
+    format = '%(message)s'
+    if logLevel != 'INFO':
+        format = '%(levelname)s: %(message)s'
+    logging.basicConfig(format=format, level=logLevel.upper())
+
+
+def main():
+    args = setupArgs()
+    if args.case is not None:
+        # The scripts log at info level for every host, which would dominate the measurements
+        _configureLogger("WARNING")
+        runCase(args.case, args.uri, args.hosts, args.seed, args.resultFile)
+        return
+
+    _configureLogger(args.logLevel.upper())
+    logging.info("Running {} v{} last modified {}".format(scriptName, version, revdate))
+    results = runBenchmarks(args.scripts, args.sizes, args.seed, args.latency, args.latencyJitter)
+    saveResults(args.output, results)
+    logging.info("Wrote benchmark results to {}".format(args.output))
+
+    failures = [ run for run in results["runs"] if run["error"] is not None ]
+    for run in failures:
+        logging.error("{} at {} hosts failed: {}".format(run["script"], run["hosts"], run["error"]))
+    if args.baseline is None:
+        if failures:
+            sys.exit(1)
+        return
+    regressions = []
+    if os.path.exists(args.baseline):
+        regressions = compareResults(results, loadResults(args.baseline))
+        for regression in regressions:
+            logging.warning("Regression in {script} at {hosts} hosts, phase {phase}: {metric} went from {baseline} to "
+                            "{current}".format(**regression))
+    if args.saveBaseline:
+        if failures:
+            # A failed case records fewer phases, which would hide the missing ones from every later comparison
+            logging.warning("Not saving results with failed cases as the new baseline {}".format(args.baseline))
+        else:
+            saveResults(args.baseline, results)
+            logging.info("Saved results as the new baseline {}".format(args.baseline))
+    if failures or regressions:
+        sys.exit(1)
+
+# -------------------------------
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import sys
+sys.path.append('')
+from mdbaas.test.simulator.installation import SyntheticInstallation
+from mdbaas.test.simulator.server import ApiSimulator
+from mdbaas.test.simulator.recorder import SessionRecorder, ReplayStore, getRequestPath
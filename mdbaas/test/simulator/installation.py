@@ -0,0 +1,454 @@
+import sys
+sys.path.append('')
+import json
+import time
+import zlib
+import random
+import threading
+from datetime import datetime, timezone
+from mdbaas.util.timeseries import parseIsoDuration, toEpochSeconds, toTimestamp
+
+# Measurements generated for every host, with the value each series starts around
+HOST_MEASUREMENT_BASES = {
+    "CONNECTIONS"                                   : 200.0,
+    "PROCESS_CPU_USER"                              : 20.0,
+    "SYSTEM_CPU_USER"                               : 25.0,
+    "PROCESS_NORMALIZED_CPU_USER"                   : 10.0,
+    "SYSTEM_MEMORY_USED"                            : 12*1024.0,
+    "SYSTEM_MEMORY_FREE"                            : 4*1024.0,
+    "SYSTEM_MEMORY_AVAILABLE"                       : 6*1024.0,
+    "SWAP_USAGE_USED"                               : 10.0,
+    "SWAP_USAGE_FREE"                               : 2*1024.0,
+    "OPLOG_RATE_GB_PER_HOUR"                        : 0.5,
+    "OPLOG_MASTER_TIME"                             : 24.0,
+    "QUERY_TARGETING_SCANNED_PER_RETURNED"          : 5.0,
+    "QUERY_TARGETING_SCANNED_OBJECTS_PER_RETURNED"  : 8.0,
+    "DB_DATA_SIZE_TOTAL"                            : 50*1024.0**3,
+    "DB_STORAGE_TOTAL"                              : 40*1024.0**3,
+    "DB_INDEX_SIZE_TOTAL"                           : 5*1024.0**3
+}
+
+DISK_MEASUREMENT_BASES = {
+    "DISK_PARTITION_SPACE_FREE"         : 200*1024.0**3,
+    "DISK_PARTITION_SPACE_PERCENT_FREE" : 60.0,
+    "DISK_PARTITION_SPACE_USED"         : 130*1024.0**3,
+    "DISK_PARTITION_SPACE_PERCENT_USED" : 40.0
+}
+
+DATABASE_MEASUREMENT_BASES = {
+    "DATABASE_DATA_SIZE"    : 5*1024.0**3,
+    "DATABASE_STORAGE_SIZE" : 4*1024.0**3,
+    "DATABASE_INDEX_SIZE"   : 512*1024.0**2,
+    "DATABASE_OBJECT_COUNT" : 1000000.0
+}
+
+# Databases and collections every synthetic host holds
+DATABASE_NAMES      = [ "admin", "config", "local", "app", "reporting" ]
+COLLECTION_NAMES    = [ "orders", "customers", "events" ]
+
+# Default number of slow query log lines generated per host and hour
+SLOW_QUERIES_PER_HOUR = 50
+
+# The largest number of generated data points kept for answering the same measurements request again
+MEASUREMENTS_CACHE_POINTS = 2000000
+
+
+def _stableFraction(*parts):
+    # A deterministic value in [0, 1) for the given parts, the same on every run and in every process
+    return (zlib.crc32("|".join(str(part) for part in parts).encode("utf-8")) & 0xffffffff) / 4294967296.0
+
+
+class SyntheticInstallation:
+    """
+    SyntheticInstallation class
+
+    A generated Ops Manager installation of numOrgs organizations, each with projectsPerOrg projects, each with
+    clustersPerProject clusters of hostsPerCluster hosts. Every shardedEvery-th cluster is a sharded cluster with
+    shardsPerCluster shards of hostsPerCluster hosts and a mongos. The same arguments always generate the same
+    installation. Measurements and slow query logs are computed on request from the host, metric and timestamp,
+    so they are consistent between requests without being stored; the most recently generated measurements are kept
+    up to a number of data points, so the many scripts asking for the same windows do not generate them again.
+    """
+    def __init__(self, numOrgs=1, projectsPerOrg=10, clustersPerProject=2, hostsPerCluster=3, shardedEvery=0,
+                 shardsPerCluster=2, seed=0, goalStateDelay=0.0, slowQueriesPerHour=SLOW_QUERIES_PER_HOUR,
+                 measurementsCachePoints=MEASUREMENTS_CACHE_POINTS):
+        """
+        Constructor to create a SyntheticInstallation object.
+
+        :param numOrgs:             The number of organizations
+        :param projectsPerOrg:      The number of projects in each organization
+        :param clustersPerProject:  The number of clusters in each project
+        :param hostsPerCluster:     The number of hosts in each replica set
+        :param shardedEvery:        Make every n-th cluster sharded, or 0 for replica sets only
+        :param shardsPerCluster:    The number of shards of each sharded cluster
+        :param seed:                The seed from which all ids and values are generated
+        :param goalStateDelay:      The number of seconds the hosts of a project take to reach a new automation
+                                    config version
+        :param slowQueriesPerHour:  The number of slow query log lines generated per host and hour
+        :param measurementsCachePoints: The largest number of generated data points to keep, so asking for the
+                                    measurements of the same owner and window again does not generate them again
+        """
+        self.random         = random.Random(seed)
+        self.seed           = seed
+        self.goalStateDelay = goalStateDelay
+        self.slowQueriesPerHour = slowQueriesPerHour
+        self.lock           = threading.Lock()
+        self.orgs           = []
+        self.groups         = []
+        self.groupsById     = {}
+        self.clusters       = {}
+        self.hosts          = {}
+        self.users          = {}
+        self.automation     = {}
+        self.measurementsCache          = {}
+        self.measurementsCachePoints    = 0
+        self.maxMeasurementsCachePoints = measurementsCachePoints
+
+        for orgNum in range(numOrgs):
+            org = { "id" : self.newId(), "name" : "org{}".format(orgNum), "isDeleted" : False }
+            self.orgs.append(org)
+            for projectNum in range(projectsPerOrg):
+                group = {
+                    "id"        : self.newId(),
+                    "name"      : "{}-project{}".format(org["name"], projectNum),
+                    "orgId"     : org["id"],
+                    "hostCounts": {}
+                }
+                self.groups.append(group)
+                self.groupsById[group["id"]] = group
+                self.clusters[group["id"]] = []
+                self.hosts[group["id"]] = []
+                for clusterNum in range(clustersPerProject):
+                    clusterName = "cluster{}".format(clusterNum)
+                    if shardedEvery > 0 and (clusterNum + 1) % shardedEvery == 0:
+                        self.addShardedCluster(group, clusterName, shardsPerCluster, hostsPerCluster)
+                    else:
+                        cluster = self.addCluster(group, clusterName, "REPLICA_SET", replicaSetName=clusterName)
+                        self.addReplicaSetHosts(group, cluster, clusterName, hostsPerCluster)
+                self.users[group["id"]] = [
+                    { "id" : self.newId(), "username" : "user{}@example.com".format(userNum), "roles" : [] }
+                    for userNum in range(3)
+                ]
+                self.automation[group["id"]] = self.newAutomationConfig(group)
+
+    ############################################################################
+    # Generation Methods
+    ############################################################################
+
+    def newId(self):
+        return "{:024x}".format(self.random.getrandbits(96))
+
+    def newHostId(self):
+        # Ops manager identifies hosts by 32 hex characters rather than by an ObjectId
+        return "{:032x}".format(self.random.getrandbits(128))
+
+    def addCluster(self, group, clusterName, typeName, replicaSetName=None, shardName=None):
+        cluster = { "id" : self.newId(), "groupId" : group["id"], "clusterName" : clusterName, "typeName" : typeName }
+        if replicaSetName is not None:
+            cluster["replicaSetName"] = replicaSetName
+        if shardName is not None:
+            cluster["shardName"] = shardName
+        self.clusters[group["id"]].append(cluster)
+        return cluster
+
+    def addHost(self, group, cluster, typeName, replicaSetName=None, shardName=None, parentClusterId=None):
+        hostNum = sum(len(hosts) for hosts in self.hosts.values())
+        host = {
+            "id"                : self.newHostId(),
+            "groupId"           : group["id"],
+            "clusterId"         : cluster["id"],
+            "hostname"          : "host{}.{}.example.com".format(hostNum, group["name"]),
+            "port"              : 27017,
+            "typeName"          : typeName,
+            "version"           : "7.0.12",
+            "deactivated"       : False,
+            "hostEnabled"       : True,
+            "lastPing"          : toTimestamp(int(time.time()))
+        }
+        if replicaSetName is not None:
+            host["replicaSetName"] = replicaSetName
+        if shardName is not None:
+            host["shardName"] = shardName
+        if parentClusterId is not None:
+            host["parentClusterId"] = parentClusterId
+        self.hosts[group["id"]].append(host)
+        return host
+
+    def addReplicaSetHosts(self, group, cluster, replicaSetName, numHosts, shardName=None, parentClusterId=None):
+        for hostNum in range(numHosts):
+            typeName = "REPLICA_PRIMARY" if hostNum == 0 else "REPLICA_SECONDARY"
+            self.addHost(group, cluster, typeName, replicaSetName=replicaSetName, shardName=shardName,
+                         parentClusterId=parentClusterId)
+
+    def addShardedCluster(self, group, clusterName, numShards, hostsPerShard):
+        parent = self.addCluster(group, clusterName, "SHARDED_REPLICA_SET")
+        for shardNum in range(numShards):
+            shardName = "{}-shard-{}".format(clusterName, shardNum)
+            shard = self.addCluster(group, clusterName, "SHARDED", replicaSetName=shardName, shardName=shardName)
+            self.addReplicaSetHosts(group, shard, shardName, hostsPerShard, shardName=shardName,
+                                    parentClusterId=parent["id"])
+        configName = "{}-config".format(clusterName)
+        config = self.addCluster(group, clusterName, "CONFIG_SERVER_REPLICA_SET", replicaSetName=configName)
+        self.addReplicaSetHosts(group, config, configName, hostsPerShard, parentClusterId=parent["id"])
+        self.addHost(group, parent, "SHARD_MONGOS", parentClusterId=parent["id"])
+
+    def newAutomationConfig(self, group):
+        processes = []
+        replicaSets = {}
+        clustersById = { cluster["id"] : cluster for cluster in self.clusters[group["id"]] }
+        for host in self.hosts[group["id"]]:
+            processName = host["hostname"].split(".")[0]
+            processes.append({
+                "name"          : processName,
+                "hostname"      : host["hostname"],
+                "processType"   : "mongos" if host["typeName"] == "SHARD_MONGOS" else "mongod",
+                "version"       : host["version"],
+                "args2_6"       : { "net" : { "port" : host["port"] } }
+            })
+            if "replicaSetName" in host:
+                replicaSet = replicaSets.setdefault(host["replicaSetName"], { "_id" : host["replicaSetName"], "members" : [] })
+                replicaSet["members"].append({ "_id" : len(replicaSet["members"]), "host" : processName })
+            if host["typeName"] == "SHARD_MONGOS":
+                processes[-1]["cluster"] = clustersById[host["clusterId"]]["clusterName"]
+
+        sharding = []
+        for cluster in self.clusters[group["id"]]:
+            if cluster["typeName"] != "SHARDED_REPLICA_SET":
+                continue
+            clusterName = cluster["clusterName"]
+            shardNames = [ shard["shardName"] for shard in self.clusters[group["id"]]
+                           if shard["clusterName"] == clusterName and shard["typeName"] == "SHARDED" ]
+            sharding.append({
+                "name"                  : clusterName,
+                "configServerReplica"   : "{}-config".format(clusterName),
+                "shards"                : [ { "_id" : shardName, "rs" : shardName, "tags" : [] } for shardName in shardNames ],
+                "collections"           : []
+            })
+        return {
+            "config"        : {
+                "version"       : 1,
+                "processes"     : processes,
+                "replicaSets"   : list(replicaSets.values()),
+                "sharding"      : sharding,
+                "auth"          : {
+                    "autoUser"      : "mms-automation",
+                    "autoPwd"       : "secret",
+                    "usersWanted"   : [
+                        { "user" : "app{}".format(userNum), "db" : "admin", "roles" : [ { "role" : "readWrite", "db" : "app" } ] }
+                        for userNum in range(3)
+                    ],
+                    "usersDeleted"  : []
+                }
+            },
+            "updated"       : time.time()
+        }
+
+    ############################################################################
+    # Lookup Methods
+    ############################################################################
+
+    def getGroup(self, groupId):
+        return self.groupsById.get(groupId, None)
+
+    def getGroupByName(self, name):
+        for group in self.groups:
+            if group["name"] == name:
+                return group
+        return None
+
+    def getGroupsInOrg(self, orgId):
+        return [ group for group in self.groups if group["orgId"] == orgId ]
+
+    def getHost(self, groupId, hostId):
+        for host in self.hosts.get(groupId, []):
+            if host["id"] == hostId:
+                return host
+        return None
+
+    def getHostByName(self, groupId, hostnameAndPort):
+        for host in self.hosts.get(groupId, []):
+            if "{}:{}".format(host["hostname"], host["port"]) == hostnameAndPort:
+                return host
+        return None
+
+    def getCluster(self, groupId, clusterId):
+        for cluster in self.clusters.get(groupId, []):
+            if cluster["id"] == clusterId:
+                return cluster
+        return None
+
+    def getDisks(self, host):
+        return [ { "partitionName" : "data" }, { "partitionName" : "root" } ]
+
+    def getDatabases(self, host):
+        return [ { "databaseName" : databaseName } for databaseName in DATABASE_NAMES ]
+
+    ############################################################################
+    # Automation Methods
+    ############################################################################
+
+    def getAutomationConfig(self, groupId):
+        with self.lock:
+            return json.loads(json.dumps(self.automation[groupId]["config"]))
+
+    def putAutomationConfig(self, groupId, config):
+        """
+        Put Automation Config
+
+        :param groupId: The id of the project
+        :param config:  The new automation config
+        :return:        The stored automation config, with its version incremented
+        """
+        with self.lock:
+            stored = self.automation[groupId]
+            config = json.loads(json.dumps(config))
+            config["version"] = stored["config"]["version"] + 1
+            stored["config"] = config
+            stored["updated"] = time.time()
+            return json.loads(json.dumps(config))
+
+    def getAutomationStatus(self, groupId):
+        with self.lock:
+            stored = self.automation[groupId]
+            goalVersion = stored["config"]["version"]
+            reached = time.time() - stored["updated"] >= self.goalStateDelay
+        return {
+            "goalVersion"   : goalVersion,
+            "processes"     : [
+                {
+                    "name"                          : process["name"],
+                    "hostname"                      : process["hostname"],
+                    "lastGoalVersionAchieved"       : goalVersion if reached else goalVersion - 1,
+                    "plan"                          : [] if reached else [ "ChangeVersion" ]
+                } for process in self.automation[groupId]["config"]["processes"]
+            ]
+        }
+
+    ############################################################################
+    # Measurement Methods
+    ############################################################################
+
+    def getMeasurements(self, ownerId, bases, measurementTypes, granularity, period=None, start=None, end=None):
+        """
+        Get Measurements
+
+        :param ownerId:             A String identifying the host, disk or database
+        :param bases:               A document mapping each measurement type to the value it starts around
+        :param measurementTypes:    An array of measurement types, or an empty array for all of them
+        :param granularity:         The ISO-8601 duration between samples
+        :param period:              The ISO-8601 duration of the window ending now, if start and end are not given
+        :param start:               An ISO-8601 timestamp String for the start of the window
+        :param end:                 An ISO-8601 timestamp String for the end of the window
+        :return:                    A document shaped like a measurements API response
+        """
+        step = parseIsoDuration(granularity)
+        endTimestamp = toEpochSeconds(end) if end is not None else int(time.time())
+        startTimestamp = toEpochSeconds(start) if start is not None else endTimestamp - parseIsoDuration(period or "PT1H")
+        names = measurementTypes if measurementTypes else list(bases.keys())
+        # The samples only depend on the owner, the metrics and the sample timestamps, not on the exact window
+        key = (ownerId, tuple((name, bases.get(name, 100.0)) for name in names), step, startTimestamp // step,
+               endTimestamp // step)
+        with self.lock:
+            cached = self.measurementsCache.get(key, None)
+        if cached is None:
+            cached = self.generateMeasurements(ownerId, bases, names, step, startTimestamp, endTimestamp)
+            self.cacheMeasurements(key, cached)
+        formattedTimestamps, valuesByName = cached
+        measurements = []
+        for name, values in valuesByName:
+            measurements.append({ "name" : name, "units" : "BYTES" if "SIZE" in name else "SCALAR", "dataPoints" : [
+                { "timestamp" : formattedTimestamp, "value" : value }
+                for formattedTimestamp, value in zip(formattedTimestamps, values) ] })
+        return {
+            "granularity"   : granularity,
+            "start"         : toTimestamp(startTimestamp),
+            "end"           : toTimestamp(endTimestamp),
+            "measurements"  : measurements
+        }
+
+    def generateMeasurements(self, ownerId, bases, names, step, startTimestamp, endTimestamp):
+        """
+        Generate Measurements
+
+        :param ownerId:         A String identifying the host, disk or database
+        :param bases:           A document mapping each measurement type to the value it starts around
+        :param names:           An array of measurement types
+        :param step:            The number of seconds between samples
+        :param startTimestamp:  The start of the window in seconds since the epoch
+        :param endTimestamp:    The end of the window in seconds since the epoch
+        :return:                A tuple of the formatted sample timestamps and an array of (name, values) tuples
+        """
+        firstSample = (startTimestamp // step + 1) * step
+        timestamps = range(firstSample, (endTimestamp // step) * step + 1, step)
+        valuesByName = []
+        for name in names:
+            base = bases.get(name, 100.0)
+            values = []
+            for timestamp in timestamps:
+                noise = _stableFraction(self.seed, ownerId, name, timestamp)
+                # The newest sample is often not complete yet, as in ops manager
+                if timestamp == timestamps[-1] and noise < 0.3:
+                    values.append(None)
+                else:
+                    growth = 1.0 + (timestamp % (30*86400)) / (30*86400.0) * 0.1
+                    values.append(round(base * growth * (0.9 + 0.2*noise), 2))
+            valuesByName.append((name, tuple(values)))
+        return (tuple(toTimestamp(timestamp) for timestamp in timestamps), valuesByName)
+
+    def cacheMeasurements(self, key, generated):
+        """
+        Cache Measurements
+
+        Keeps generated measurements, dropping the oldest ones once more than maxMeasurementsCachePoints data points
+        are kept
+
+        :param key:         The owner, metrics and sample range the measurements were generated for
+        :param generated:   The tuple returned by generateMeasurements
+        """
+        points = len(generated[0]) * len(generated[1])
+        if points > self.maxMeasurementsCachePoints:
+            return
+        with self.lock:
+            if key in self.measurementsCache:
+                return
+            while self.measurementsCache and self.measurementsCachePoints + points > self.maxMeasurementsCachePoints:
+                oldest = self.measurementsCache.pop(next(iter(self.measurementsCache)))
+                self.measurementsCachePoints -= len(oldest[0]) * len(oldest[1])
+            self.measurementsCache[key] = generated
+            self.measurementsCachePoints += points
+
+    def getSlowQueryLogs(self, host, since=None, duration=None, nLogs=None):
+        """
+        Get Slow Query Logs
+
+        :param host:        The host document
+        :param since:       The number of milliseconds back to return logs for
+        :param nLogs:       The maximum number of logs to return
+        :return:            An array of slow query log documents
+        """
+        windowMillis = int(since) if since is not None else 24*60*60*1000
+        count = int(self.slowQueriesPerHour * windowMillis / 3600000.0)
+        if nLogs is not None:
+            count = min(count, int(nLogs))
+        now = int(time.time())
+        logs = []
+        for logNum in range(count):
+            noise = _stableFraction(self.seed, host["id"], "slowQuery", logNum)
+            databaseName = DATABASE_NAMES[int(noise * len(DATABASE_NAMES))]
+            namespace = "{}.{}".format(databaseName, COLLECTION_NAMES[logNum % len(COLLECTION_NAMES)])
+            line = {
+                "t"     : { "$date" : datetime.fromtimestamp(now - logNum * 60, tz=timezone.utc).isoformat() },
+                "s"     : "I",
+                "c"     : "COMMAND",
+                "msg"   : "Slow query",
+                "attr"  : {
+                    "ns"                : namespace,
+                    "durationMillis"    : int(100 + noise * 5000),
+                    "planSummary"       : "COLLSCAN" if noise < 0.2 else "IXSCAN { _id: 1 }",
+                    "queryHash"         : "{:08X}".format(zlib.crc32("{}|{}".format(namespace, noise < 0.2).encode("utf-8"))),
+                    "docsExamined"      : int(noise * 100000),
+                    "nreturned"         : int(noise * 100)
+                }
+            }
+            logs.append({ "namespace" : namespace, "line" : json.dumps(line) })
+        return logs
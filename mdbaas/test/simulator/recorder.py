@@ -0,0 +1,136 @@
+import sys
+sys.path.append('')
+import json
+import logging
+import threading
+from urllib.parse import urlsplit
+
+# Response headers kept in a recording; the rest describe the original connection and are dropped
+RECORDED_HEADERS = [ "Content-Type", "Retry-After", "ETag", "Last-Modified" ]
+
+
+def getRequestPath(url):
+    """
+    Get Request Path
+
+    :param url: The full url of a request
+    :return:    The path and query of the url, which is what identifies a recorded response
+    """
+    parts = urlsplit(url)
+    return "{}?{}".format(parts.path, parts.query) if parts.query else parts.path
+
+
+class SessionRecorder:
+    """
+    SessionRecorder class
+
+    Records every response a connector receives from a real ops manager or Atlas to a JSON lines file, one
+    { method, path, status, headers, body } document per line, so that the session can later be replayed
+    offline by an ApiSimulator with a ReplayStore. Digest auth challenges are not recorded.
+    """
+    def __init__(self, path):
+        """
+        Constructor to create a SessionRecorder object.
+
+        :param path:    The path of the JSON lines file to write
+        """
+        self.path       = path
+        self.lock       = threading.Lock()
+        self.file       = open(path, "w")
+        self.numRecords = 0
+
+    def attach(self, connector):
+        """
+        Attach
+
+        :param connector:   An OpsMgrConnector or AtlasConnector whose responses to record from now on
+        :return:            The connector
+        """
+        connector.httpSession.session.hooks["response"].append(self.recordResponse)
+        return connector
+
+    def recordResponse(self, response, *args, **kwargs):
+        if response.status_code == 401 and "WWW-Authenticate" in response.headers:
+            return response
+        self.record(response.request.method, response.url, response.status_code, response.headers, response.text)
+        return response
+
+    def record(self, method, url, statusCode, headers, body):
+        """
+        Record
+
+        :param method:      The HTTP method of the request
+        :param url:         The url of the request
+        :param statusCode:  The status code of the response
+        :param headers:     The headers of the response
+        :param body:        The body of the response as a String
+        """
+        entry = {
+            "method"    : method,
+            "path"      : getRequestPath(url),
+            "status"    : statusCode,
+            "headers"   : { name : headers[name] for name in RECORDED_HEADERS if name in headers },
+            "body"      : body
+        }
+        line = json.dumps(entry)
+        with self.lock:
+            self.file.write(line + "\n")
+            self.numRecords += 1
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+        logging.info("Recorded {} responses to {}".format(self.numRecords, self.path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+
+class ReplayStore:
+    """
+    ReplayStore class
+
+    The responses of a recorded session, served back in the order they were recorded: the n-th request for a
+    method and path gets the n-th response recorded for it, and once those run out the last one is served again.
+    Replaying the same requests therefore always gets the same responses, whatever order the paths are visited in.
+    """
+    def __init__(self, path):
+        """
+        Constructor to create a ReplayStore object.
+
+        :param path:    The path of a JSON lines file written by a SessionRecorder
+        """
+        self.lock       = threading.Lock()
+        self.entries    = {}
+        self.served     = {}
+        with open(path) as recording:
+            for line in recording:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                self.entries.setdefault((entry["method"], entry["path"]), []).append(entry)
+
+    def lookup(self, method, path):
+        """
+        Lookup
+
+        :param method:  The HTTP method of the request
+        :param path:    The path and query of the request
+        :return:        The recorded { method, path, status, headers, body } document to serve, or None if the path
+                        was never recorded
+        """
+        key = (method, path)
+        entries = self.entries.get(key, None)
+        if not entries:
+            return None
+        with self.lock:
+            index = self.served.get(key, 0)
+            self.served[key] = index + 1
+        return entries[min(index, len(entries) - 1)]
+
+    def reset(self):
+        with self.lock:
+            self.served = {}
@@ -0,0 +1,148 @@
+#!/usr/bin/python
+import sys
+
+sys.path.append('.')
+import time
+import logging
+import argparse
+
+from mdbaas.opsmgrutil import OpsMgrConnector
+from mdbaas.test.simulator.installation import SyntheticInstallation
+from mdbaas.test.simulator.server import ApiSimulator
+from mdbaas.test.simulator.recorder import SessionRecorder, ReplayStore
+
+# Script metadata
+version = "1.0.0"
+revdate = "10-18-2026"
+scriptName = "runsimulator"
+scriptNameFull = scriptName + ".py"
+
+
+########################################################################################################################
+# Main Substantive Methods
+########################################################################################################################
+def recordSession(opsMgrUri, apiUser, apiKey, recordFile, granularity, period):
+    """
+    Record Session
+
+    Crawls a real ops manager the way the reporting scripts do, listing every group, its hosts and clusters and
+    the measurements of each host, and records every response to recordFile for later replay
+
+    :param opsMgrUri:   The uri of the ops manager to record
+    :param apiUser:     The api user for the ops manager
+    :param apiKey:      The api key for the ops manager
+    :param recordFile:  The path of the JSON lines file to write
+    :param granularity: The granularity of the host measurements to record
+    :param period:      The period of the host measurements to record
+    """
+    opsMgrConnector = OpsMgrConnector(opsMgrUri, apiUser, apiKey)
+    with SessionRecorder(recordFile) as recorder:
+        recorder.attach(opsMgrConnector)
+        for group in opsMgrConnector.iterGroups():
+            list(opsMgrConnector.iterClustersForGroup(group["id"]))
+            for host in opsMgrConnector.iterHosts(group["id"]):
+                opsMgrConnector.getMeasurementsOverPeriodForHost(group["id"], host["id"], granularity, period, [])
+    opsMgrConnector.close()
+
+
+def serve(simulator):
+    """
+    Serve
+
+    Serves until interrupted, logging the request counts of the simulator every minute
+
+    :param simulator:   The ApiSimulator to run
+    """
+    with simulator:
+        print("Serving the ops manager and Atlas APIs on {}".format(simulator.getUri()))
+        try:
+            while True:
+                time.sleep(60)
+                logging.info("Simulator stats: {}".format(simulator.getStats()))
+        except KeyboardInterrupt:
+            pass
+
+
+def setupArgs():
+    """
+    Setup args
+    Parses all command line arguments to the script
+    """
+    parser = argparse.ArgumentParser(description='Serves a simulated ops manager and Atlas API, or records a real one')
+    parser.add_argument('--port', required=False, action="store", dest='port', default=8080, type=int,
+                        help='The port to serve the simulated API on.')
+    parser.add_argument('--apiUser', required=False, action="store", dest='apiUser', default='simulator',
+                        help='The api user clients must authenticate with.')
+    parser.add_argument('--apiKey', required=False, action="store", dest='apiKey', default='simulator',
+                        help='The api key clients must authenticate with.')
+
+    parser.add_argument('--orgs', required=False, action="store", dest='numOrgs', default=1, type=int,
+                        help='The number of organizations of the synthetic installation.')
+    parser.add_argument('--projectsPerOrg', required=False, action="store", dest='projectsPerOrg', default=10, type=int,
+                        help='The number of projects in each organization.')
+    parser.add_argument('--clustersPerProject', required=False, action="store", dest='clustersPerProject', default=2,
+                        type=int, help='The number of clusters in each project.')
+    parser.add_argument('--hostsPerCluster', required=False, action="store", dest='hostsPerCluster', default=3, type=int,
+                        help='The number of hosts in each replica set.')
+    parser.add_argument('--shardedEvery', required=False, action="store", dest='shardedEvery', default=0, type=int,
+                        help='Make every n-th cluster of a project sharded; 0 for replica sets only.')
+    parser.add_argument('--seed', required=False, action="store", dest='seed', default=0, type=int,
+                        help='The seed from which the installation and injected errors are generated.')
+
+    parser.add_argument('--latency', required=False, action="store", dest='latency', default=0.0, type=float,
+                        help='The number of seconds every response is delayed by.')
+    parser.add_argument('--latencyJitter', required=False, action="store", dest='latencyJitter', default=0.0, type=float,
+                        help='The largest number of seconds randomly added to the latency.')
+    parser.add_argument('--errorRate', required=False, action="store", dest='errorRate', default=0.0, type=float,
+                        help='The fraction of requests answered with a 503.')
+    parser.add_argument('--throttleRate', required=False, action="store", dest='throttleRate', default=0.0, type=float,
+                        help='The fraction of requests answered with a 429.')
+
+    parser.add_argument('--replayFile', required=False, action="store", dest='replayFile', default=None,
+                        help='Serve the responses recorded in this file instead of a synthetic installation.')
+    parser.add_argument('--recordFrom', required=False, action="store", dest='recordFrom', default=None,
+                        help='Record a session against the ops manager at this uri instead of serving.')
+    parser.add_argument('--recordFile', required=False, action="store", dest='recordFile', default='session.jsonl',
+                        help='The file to record the session to.')
+    parser.add_argument('--granularity', required=False, action="store", dest='granularity', default='PT1H',
+                        help='The granularity of the host measurements to record.')
+    parser.add_argument('--period', required=False, action="store", dest='period', default='P1D',
+                        help='The period of the host measurements to record.')
+
+    parser.add_argument('--loglevel', required=False, action="store", dest='logLevel', default='info',
+                        help='Log level. Possible values are [none, info, verbose]')
+    return parser.parse_args()
+
+
+def _configureLogger(logLevel):
+    format = '%(message)s'
+    if logLevel != 'INFO':
+        format = '%(levelname)s: %(message)s'
+    logging.basicConfig(format=format, level=logLevel.upper())
+
+
+def main():
+    args = setupArgs()
+    _configureLogger(args.logLevel.upper())
+    logging.info("Running {} v{} last modified {}".format(scriptName, version, revdate))
+
+    if args.recordFrom is not None:
+        recordSession(args.recordFrom, args.apiUser, args.apiKey, args.recordFile, args.granularity, args.period)
+        return
+
+    installation = None
+    replayStore = None
+    if args.replayFile is not None:
+        replayStore = ReplayStore(args.replayFile)
+    else:
+        installation = SyntheticInstallation(numOrgs=args.numOrgs, projectsPerOrg=args.projectsPerOrg,
+                                             clustersPerProject=args.clustersPerProject,
+                                             hostsPerCluster=args.hostsPerCluster, shardedEvery=args.shardedEvery,
+                                             seed=args.seed)
+    serve(ApiSimulator(installation=installation, replayStore=replayStore, apiUser=args.apiUser, apiKey=args.apiKey,
+                       port=args.port, latency=args.latency, latencyJitter=args.latencyJitter,
+                       errorRate=args.errorRate, throttleRate=args.throttleRate, seed=args.seed))
+
+# -------------------------------
+if __name__ == "__main__":
+    main()
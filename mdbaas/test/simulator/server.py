@@ -0,0 +1,455 @@
+import sys
+sys.path.append('')
+import re
+import gzip
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from urllib.parse import urlsplit, parse_qs, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+# brotli is optional; without it responses are only gzip compressed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+from mdbaas.test.simulator.installation import HOST_MEASUREMENT_BASES, DISK_MEASUREMENT_BASES, \
+    DATABASE_MEASUREMENT_BASES
+
+# Realm of the digest auth challenge, as sent by ops manager
+DIGEST_REALM = "MMS Public API"
+
+# Default and largest page sizes of paginated resources
+DEFAULT_ITEMS_PER_PAGE  = 100
+MAX_ITEMS_PER_PAGE      = 500
+
+OPS_MANAGER_API_PREFIX  = "/api/public/v1.0"
+ATLAS_API_PREFIXES      = [ "/api/atlas/v1.0", "/api/atlas/v2.0" ]
+
+# Smallest response body worth compressing
+MIN_COMPRESS_BYTES      = 1024
+
+_ID = r"([^/]+)"
+
+
+class _SimulatorError(Exception):
+    def __init__(self, statusCode, errorCode, detail, headers=None):
+        super().__init__(detail)
+        self.statusCode = statusCode
+        self.errorCode  = errorCode
+        self.detail     = detail
+        self.headers    = headers or {}
+
+    def getDocument(self):
+        return { "error" : self.statusCode, "errorCode" : self.errorCode, "detail" : self.detail, "reason" : self.errorCode }
+
+
+def _notFound(resource, resourceId):
+    return _SimulatorError(404, "RESOURCE_NOT_FOUND", "Cannot find resource {} {}.".format(resource, resourceId))
+
+
+def _md5(text):
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+def _parseDigestHeader(header):
+    if not header or not header.startswith("Digest "):
+        return None
+    return { key : value.strip('"') for key, value in re.findall(r'(\w+)=("[^"]*"|[^,\s]*)', header[len("Digest "):]) }
+
+
+class _SimulatorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; with Nagle's algorithm every response would wait on a delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.simulator.handle(self, "GET")
+
+    def do_POST(self):
+        self.server.simulator.handle(self, "POST")
+
+    def do_PUT(self):
+        self.server.simulator.handle(self, "PUT")
+
+    def do_PATCH(self):
+        self.server.simulator.handle(self, "PATCH")
+
+    def do_DELETE(self):
+        self.server.simulator.handle(self, "DELETE")
+
+    def log_message(self, format, *args):
+        logging.debug("Simulator: " + format, *args)
+
+
+class ApiSimulator:
+    """
+    ApiSimulator class
+
+    A local HTTP server speaking enough of the Ops Manager and Atlas APIs for the connectors and scripts to run
+    against it offline: digest auth, pagination, hosts, clusters, disks, databases, measurements, slow query logs,
+    automation config and status, and users. Resources come from a SyntheticInstallation, or from a ReplayStore
+    when replaying a recorded session. Latency, throttling and server errors can be injected to benchmark the
+    connectors under realistic conditions; the injected errors are drawn from a seeded generator.
+    """
+    def __init__(self, installation=None, replayStore=None, apiUser="simulator", apiKey="simulator", host="127.0.0.1",
+                 port=0, latency=0.0, latencyJitter=0.0, errorRate=0.0, throttleRate=0.0, retryAfter=1, seed=0,
+                 compress=True):
+        """
+        Constructor to create an ApiSimulator object.
+
+        :param installation:    The SyntheticInstallation to serve
+        :param replayStore:     A ReplayStore to serve recorded responses from instead of an installation
+        :param apiUser:         The api user clients must authenticate with
+        :param apiKey:          The api key clients must authenticate with
+        :param host:            The address to listen on
+        :param port:            The port to listen on, or 0 for any free port
+        :param latency:         The number of seconds every response is delayed by
+        :param latencyJitter:   The largest number of seconds randomly added to the latency
+        :param errorRate:       The fraction of authenticated requests answered with a 503
+        :param throttleRate:    The fraction of authenticated requests answered with a 429
+        :param retryAfter:      The number of seconds sent in the Retry-After header of injected errors
+        :param seed:            The seed of the generator drawing the injected latency and errors
+        :param compress:        Whether or not to compress responses for clients that accept gzip or br
+        """
+        if installation is None and replayStore is None:
+            raise ValueError("An ApiSimulator needs an installation or a replay store to serve")
+        self.installation   = installation
+        self.replayStore    = replayStore
+        self.apiUser        = apiUser
+        self.apiKey         = apiKey
+        self.latency        = latency
+        self.latencyJitter  = latencyJitter
+        self.errorRate      = errorRate
+        self.throttleRate   = throttleRate
+        self.retryAfter     = retryAfter
+        self.compress       = compress
+        self.random         = random.Random(seed)
+        self.lock           = threading.Lock()
+        self.nonces         = set()
+        self.stats          = { "requests" : 0, "challenges" : 0, "injectedErrors" : 0, "injectedThrottles" : 0 }
+        self.server         = ThreadingHTTPServer((host, port), _SimulatorHandler)
+        self.server.daemon_threads = True
+        self.server.simulator = self
+        self.thread         = None
+        self.routes         = self.getRoutes()
+
+    ############################################################################
+    # Server Methods
+    ############################################################################
+
+    def start(self):
+        """
+        Start
+
+        Serves requests on a background thread until stop is called
+        """
+        self.thread = threading.Thread(target=self.server.serve_forever, name="ApiSimulator", daemon=True)
+        self.thread.start()
+        logging.info("API simulator listening on {}".format(self.getUri()))
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, excType, excValue, traceback):
+        self.stop()
+
+    def getUri(self):
+        """
+        Get Uri
+
+        :return:    The uri to pass to a connector as the ops manager or Atlas uri
+        """
+        host, port = self.server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def getStats(self):
+        with self.lock:
+            return dict(self.stats)
+
+    def increment(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    ############################################################################
+    # Request Handling
+    ############################################################################
+
+    def handle(self, handler, method):
+        contentLength = int(handler.headers.get("Content-Length", 0) or 0)
+        body = handler.rfile.read(contentLength) if contentLength > 0 else b""
+        self.increment("requests")
+
+        if not self.isAuthenticated(handler, method):
+            self.increment("challenges")
+            nonce = _md5("{}:{}".format(time.time(), self.random.random()))
+            with self.lock:
+                self.nonces.add(nonce)
+            self.sendJson(handler, 401, _SimulatorError(401, "UNAUTHORIZED", "You are not authorized for this resource.").getDocument(),
+                          { "WWW-Authenticate" : 'Digest realm="{}", domain="", nonce="{}", algorithm=MD5, qop="auth", stale=false'.format(DIGEST_REALM, nonce) })
+            return
+
+        with self.lock:
+            delay = self.latency + self.random.random() * self.latencyJitter
+            draw = self.random.random()
+        if delay > 0:
+            time.sleep(delay)
+        retryHeaders = { "Retry-After" : str(self.retryAfter) }
+        if draw < self.throttleRate:
+            self.increment("injectedThrottles")
+            self.sendJson(handler, 429, _SimulatorError(429, "RATE_LIMITED", "Too many requests.").getDocument(), retryHeaders)
+            return
+        if draw < self.throttleRate + self.errorRate:
+            self.increment("injectedErrors")
+            self.sendJson(handler, 503, _SimulatorError(503, "SERVICE_UNAVAILABLE", "Service unavailable.").getDocument(), retryHeaders)
+            return
+
+        if self.replayStore is not None:
+            entry = self.replayStore.lookup(method, handler.path)
+            if entry is None:
+                self.sendJson(handler, 404, _notFound("recording", handler.path).getDocument())
+                return
+            self.sendBody(handler, entry["status"], entry["body"].encode("utf-8"), entry.get("headers", {}))
+            return
+
+        parts = urlsplit(handler.path)
+        query = { key : values[-1] for key, values in parse_qs(parts.query).items() }
+        multiQuery = parse_qs(parts.query)
+        try:
+            payload = json.loads(body) if body else None
+            for routeMethod, pattern, routeHandler in self.routes:
+                if routeMethod != method:
+                    continue
+                match = pattern.fullmatch(parts.path.rstrip("/") or "/")
+                if match is not None:
+                    args = [ unquote(arg) for arg in match.groups() ]
+                    document = routeHandler(*args, query=query, multiQuery=multiQuery, payload=payload)
+                    self.sendJson(handler, 200, document)
+                    return
+            raise _notFound("path", parts.path)
+        except _SimulatorError as e:
+            self.sendJson(handler, e.statusCode, e.getDocument(), e.headers)
+
+    def isAuthenticated(self, handler, method):
+        fields = _parseDigestHeader(handler.headers.get("Authorization", None))
+        if fields is None or fields.get("username") != self.apiUser:
+            return False
+        with self.lock:
+            if fields.get("nonce") not in self.nonces:
+                return False
+        ha1 = _md5("{}:{}:{}".format(self.apiUser, DIGEST_REALM, self.apiKey))
+        ha2 = _md5("{}:{}".format(method, fields.get("uri", "")))
+        expected = _md5("{}:{}:{}:{}:{}:{}".format(ha1, fields.get("nonce"), fields.get("nc", ""), fields.get("cnonce", ""),
+                                                   fields.get("qop", ""), ha2))
+        return fields.get("response") == expected
+
+    def sendJson(self, handler, statusCode, document, headers=None):
+        self.sendBody(handler, statusCode, json.dumps(document).encode("utf-8"), headers)
+
+    def sendBody(self, handler, statusCode, body, headers=None):
+        contentEncoding = None
+        if self.compress and len(body) >= MIN_COMPRESS_BYTES:
+            acceptEncoding = handler.headers.get("Accept-Encoding", "")
+            if brotli is not None and "br" in acceptEncoding:
+                contentEncoding, body = "br", brotli.compress(body)
+            elif "gzip" in acceptEncoding:
+                contentEncoding, body = "gzip", gzip.compress(body, compresslevel=6)
+        handler.send_response(statusCode)
+        handler.send_header("Content-Type", "application/json")
+        if contentEncoding is not None:
+            handler.send_header("Content-Encoding", contentEncoding)
+        handler.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    ############################################################################
+    # Routes
+    ############################################################################
+
+    def getRoutes(self):
+        """
+        Get Routes
+
+        :return:    An array of (method, compiled path pattern, handler) tuples; each handler takes the path
+                    parameters followed by the query, multiQuery and payload keyword arguments
+        """
+        routes = []
+
+        def add(method, path, routeHandler):
+            prefixes = [ OPS_MANAGER_API_PREFIX ] + (ATLAS_API_PREFIXES if path.startswith("/groups/{}") else [])
+            for prefix in prefixes:
+                routes.append((method, re.compile(re.escape(prefix) + path.format(*([ _ID ] * path.count("{}")))), routeHandler))
+
+        def addAtlas(method, path, routeHandler):
+            for prefix in ATLAS_API_PREFIXES:
+                routes.append((method, re.compile(re.escape(prefix) + path.format(*([ _ID ] * path.count("{}")))), routeHandler))
+
+        # Atlas describes clusters differently, so its routes are matched before the shared ones
+        addAtlas("GET", "/groups/{}/clusters", lambda groupId, query, **kwargs: self.paginate(self.getAtlasClusters(groupId), query))
+
+        add("GET", "/orgs", lambda query, **kwargs: self.paginate(self.installation.orgs, query))
+        add("GET", "/orgs/{}", lambda orgId, **kwargs: self.getOrg(orgId))
+        add("GET", "/orgs/{}/groups", lambda orgId, query, **kwargs: self.paginate(self.installation.getGroupsInOrg(self.getOrg(orgId)["id"]), query))
+        add("GET", "/groups", lambda query, **kwargs: self.paginate(self.installation.groups, query))
+        add("GET", "/groups/byName/{}", lambda name, **kwargs: self.getGroupByName(name))
+        add("GET", "/groups/{}", lambda groupId, **kwargs: self.getGroup(groupId))
+        add("GET", "/groups/{}/hosts", lambda groupId, query, **kwargs: self.paginate(self.installation.hosts[self.getGroup(groupId)["id"]], query))
+        add("GET", "/groups/{}/hosts/byName/{}", lambda groupId, name, **kwargs: self.getHostByName(groupId, name))
+        add("GET", "/groups/{}/hosts/{}", lambda groupId, hostId, **kwargs: self.getHost(groupId, hostId))
+        add("GET", "/groups/{}/hosts/{}/disks", lambda groupId, hostId, query, **kwargs: self.paginate(self.installation.getDisks(self.getHost(groupId, hostId)), query))
+        add("GET", "/groups/{}/hosts/{}/databases", lambda groupId, hostId, query, **kwargs: self.paginate(self.installation.getDatabases(self.getHost(groupId, hostId)), query))
+        add("GET", "/groups/{}/hosts/{}/measurements", self.getHostMeasurements)
+        add("GET", "/groups/{}/hosts/{}/disks/{}/measurements", self.getDiskMeasurements)
+        add("GET", "/groups/{}/hosts/{}/databases/{}/measurements", self.getDatabaseMeasurements)
+        add("GET", "/groups/{}/hosts/{}/performanceAdvisor/slowQueryLogs", self.getSlowQueryLogs)
+        add("GET", "/groups/{}/clusters", lambda groupId, query, **kwargs: self.paginate(self.installation.clusters[self.getGroup(groupId)["id"]], query))
+        add("GET", "/groups/{}/clusters/{}", lambda groupId, clusterId, **kwargs: self.getCluster(groupId, clusterId))
+        add("GET", "/groups/{}/automationConfig", lambda groupId, **kwargs: self.installation.getAutomationConfig(self.getGroup(groupId)["id"]))
+        add("PUT", "/groups/{}/automationConfig", self.putAutomationConfig)
+        add("GET", "/groups/{}/automationStatus", lambda groupId, **kwargs: self.installation.getAutomationStatus(self.getGroup(groupId)["id"]))
+        add("GET", "/groups/{}/users", lambda groupId, query, **kwargs: self.paginate(self.installation.users[self.getGroup(groupId)["id"]], query))
+
+        # Atlas addresses hosts as processes named hostname:port
+        add("GET", "/groups/{}/processes", lambda groupId, query, **kwargs: self.paginate([ self.toProcess(host) for host in self.installation.hosts[self.getGroup(groupId)["id"]] ], query))
+        add("GET", "/groups/{}/processes/{}/measurements", lambda groupId, processId, **kwargs: self.getHostMeasurements(groupId, self.getHostByName(groupId, processId)["id"], **kwargs))
+        add("GET", "/groups/{}/processes/{}/performanceAdvisor/slowQueryLogs", lambda groupId, processId, **kwargs: self.getSlowQueryLogs(groupId, self.getHostByName(groupId, processId)["id"], **kwargs))
+        add("GET", "/groups/{}/processes/{}/performanceAdvisor/namespaces", lambda groupId, processId, **kwargs: self.getNamespaces(groupId, processId))
+        add("GET", "/groups/{}/processes/{}/performanceAdvisor/suggestedIndexes", lambda groupId, processId, **kwargs: { "suggestedIndexes" : [], "shapes" : [] })
+        return routes
+
+    def paginate(self, items, query):
+        """
+        Paginate
+
+        :param items:   The full array of items of the resource
+        :param query:   The query parameters of the request
+        :return:        The page document for the pageNum and itemsPerPage of the request
+        """
+        pageNum = int(query.get("pageNum", 1))
+        itemsPerPage = int(query.get("itemsPerPage", DEFAULT_ITEMS_PER_PAGE))
+        if itemsPerPage < 1 or itemsPerPage > MAX_ITEMS_PER_PAGE or pageNum < 1:
+            raise _SimulatorError(400, "INVALID_QUERY_PARAMETER", "Invalid pageNum {} or itemsPerPage {}.".format(pageNum, itemsPerPage))
+        start = (pageNum - 1) * itemsPerPage
+        return { "results" : items[start:start + itemsPerPage], "totalCount" : len(items), "links" : [] }
+
+    def getOrg(self, orgId):
+        for org in self.installation.orgs:
+            if org["id"] == orgId:
+                return org
+        raise _notFound("organization", orgId)
+
+    def getGroup(self, groupId):
+        group = self.installation.getGroup(groupId)
+        if group is None:
+            raise _notFound("group", groupId)
+        return group
+
+    def getGroupByName(self, name):
+        group = self.installation.getGroupByName(name)
+        if group is None:
+            raise _notFound("group", name)
+        return group
+
+    def getHost(self, groupId, hostId):
+        host = self.installation.getHost(self.getGroup(groupId)["id"], hostId)
+        if host is None:
+            raise _notFound("host", hostId)
+        return host
+
+    def getHostByName(self, groupId, name):
+        host = self.installation.getHostByName(self.getGroup(groupId)["id"], name)
+        if host is None:
+            raise _notFound("host", name)
+        return host
+
+    def getCluster(self, groupId, clusterId):
+        cluster = self.installation.getCluster(self.getGroup(groupId)["id"], clusterId)
+        if cluster is None:
+            raise _notFound("cluster", clusterId)
+        return cluster
+
+    def toProcess(self, host):
+        process = dict(host)
+        process["id"] = "{}:{}".format(host["hostname"], host["port"])
+        process["userAlias"] = host["hostname"]
+        return process
+
+    def getAtlasClusters(self, groupId):
+        groupId = self.getGroup(groupId)["id"]
+        atlasClusters = []
+        for cluster in self.installation.clusters[groupId]:
+            if cluster["typeName"] not in [ "REPLICA_SET", "SHARDED_REPLICA_SET" ]:
+                continue
+            # Clients connect to the members of a replica set, or to the mongos of a sharded cluster
+            hosts = [ host for host in self.installation.hosts[groupId]
+                      if host["clusterId"] == cluster["id"] ]
+            atlasClusters.append({
+                "id"                : cluster["id"],
+                "groupId"           : groupId,
+                "name"              : cluster["clusterName"],
+                "clusterType"       : "SHARDED" if cluster["typeName"] == "SHARDED_REPLICA_SET" else "REPLICASET",
+                "mongoDBVersion"    : hosts[0]["version"] if hosts else None,
+                "stateName"         : "IDLE",
+                "connectionStrings" : {
+                    "standard" : "mongodb://{}/?ssl=true".format(",".join("{}:{}".format(host["hostname"], host["port"]) for host in hosts))
+                }
+            })
+        return atlasClusters
+
+    def getMeasurements(self, ownerId, bases, multiQuery):
+        query = { key : values[-1] for key, values in multiQuery.items() }
+        if "granularity" not in query:
+            raise _SimulatorError(400, "MISSING_QUERY_PARAMETER", "Missing granularity.")
+        return self.installation.getMeasurements(ownerId, bases, multiQuery.get("m", []), query["granularity"],
+                                                 period=query.get("period", None), start=query.get("start", None),
+                                                 end=query.get("end", None))
+
+    def getHostMeasurements(self, groupId, hostId, multiQuery, **kwargs):
+        host = self.getHost(groupId, hostId)
+        document = self.getMeasurements(host["id"], HOST_MEASUREMENT_BASES, multiQuery)
+        document.update({ "groupId" : host["groupId"], "hostId" : host["id"], "processId" : "{}:{}".format(host["hostname"], host["port"]) })
+        return document
+
+    def getDiskMeasurements(self, groupId, hostId, partitionName, multiQuery, **kwargs):
+        host = self.getHost(groupId, hostId)
+        document = self.getMeasurements("{}/{}".format(host["id"], partitionName), DISK_MEASUREMENT_BASES, multiQuery)
+        document.update({ "groupId" : host["groupId"], "hostId" : host["id"], "partitionName" : partitionName })
+        return document
+
+    def getDatabaseMeasurements(self, groupId, hostId, databaseName, multiQuery, **kwargs):
+        host = self.getHost(groupId, hostId)
+        document = self.getMeasurements("{}/{}".format(host["id"], databaseName), DATABASE_MEASUREMENT_BASES, multiQuery)
+        document.update({ "groupId" : host["groupId"], "hostId" : host["id"], "databaseName" : databaseName })
+        return document
+
+    def getSlowQueryLogs(self, groupId, hostId, query, **kwargs):
+        host = self.getHost(groupId, hostId)
+        return { "slowQueries" : self.installation.getSlowQueryLogs(host, since=query.get("since", None),
+                                                                    nLogs=query.get("nLogs", None)) }
+
+    def getNamespaces(self, groupId, processId):
+        host = self.getHostByName(groupId, processId)
+        namespaces = sorted(set(log["namespace"] for log in self.installation.getSlowQueryLogs(host)))
+        return { "namespaces" : [ { "namespace" : namespace, "type" : "collection" } for namespace in namespaces ] }
+
+    def putAutomationConfig(self, groupId, payload, **kwargs):
+        groupId = self.getGroup(groupId)["id"]
+        if payload is None:
+            raise _SimulatorError(400, "INVALID_JSON", "Missing automation config.")
+        # Ops manager rejects a config edited from an older version than the current one
+        current = self.installation.getAutomationConfig(groupId)
+        if "version" in payload and payload["version"] != current["version"]:
+            raise _SimulatorError(409, "AUTOMATION_CONFIG_VERSION_CONFLICT",
+                                  "Automation config version {} is not the current version {}.".format(payload["version"], current["version"]))
+        return self.installation.putAutomationConfig(groupId, payload)
@@ -1 +1,14 @@
-from logging2 import LogLevel, Logger
+import sys
+sys.path.append('')
+from mdbaas.util.logging2 import LogLevel, Logger
+from mdbaas.util.lazylog import LazyJson, samplePayload
+from mdbaas.util.jsondecode import loads, iterArrayItems, getJsonBackend, setJsonBackend
+from mdbaas.util.apimetrics import ApiMetrics, getApiMetrics, getEndpointTemplate
+from mdbaas.util.session import PooledSession, ConnectionStats, AdaptiveLimiter, DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE, DEFAULT_MAX_RETRIES
+from mdbaas.util.asyncsession import AsyncPooledSession, AsyncRequestMethods, DEFAULT_ASYNC_POOL_MAXSIZE
+from mdbaas.util.singleflight import SingleFlight, AsyncSingleFlight
+from mdbaas.util.crawler import FleetCrawler, DEFAULT_CRAWL_WORKERS
+from mdbaas.util.pagination import iterPages, iterResults, getAllPages, DEFAULT_PAGE_WORKERS
+from mdbaas.util.responsecache import ResponseCache, DEFAULT_CACHE_TTLS, DEFAULT_CACHE_MAX_BYTES
+from mdbaas.util.measurements import MeasurementSeries, MeasurementSet
+from mdbaas.util.timeseries import TimeSeriesStore, parseIsoDuration
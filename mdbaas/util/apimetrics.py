@@ -0,0 +1,328 @@
+import sys
+sys.path.append('')
+import re
+import json
+import atexit
+import bisect
+import logging
+import threading
+from urllib.parse import urlparse
+
+# Upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_LATENCY_BUCKETS = [ 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0 ]
+
+# Quantiles reported for every endpoint
+REPORTED_QUANTILES = [ 0.5, 0.95, 0.99 ]
+
+# Collections whose next path segment is always the id or name of a single resource, e.g. /hosts/{id}, whatever
+# that id looks like: ObjectIds, 32 character host ids, host:port pairs, disk partitions and database names alike
+_RESOURCE_COLLECTIONS = [ "groups", "orgs", "hosts", "clusters", "processes", "disks", "databases", "users", "teams",
+                          "apiKeys", "snapshots", "backupConfigs", "restoreJobs", "alerts", "alertConfigs" ]
+
+# Path segments after which the next segment is always a name, e.g. /groups/byName/{id}
+_BY_NAME_SEGMENTS = [ "byName", "byHostname", "byAgentApiKey" ]
+
+# Path segments that identify a single resource wherever they appear: ObjectIds, UUIDs and numbers
+_ID_SEGMENT_REGEX = re.compile(
+    r"^(?:[0-9a-fA-F]{24}|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|\d+)$"
+)
+
+_API_PREFIX_REGEX = re.compile(r"^/api/(?:public|atlas)/v\d+\.\d+")
+
+
+def getEndpointTemplate(url):
+    """
+    Get Endpoint Template
+
+    :param url: A String representing the url of a request
+    :return:    The path of the url without the API prefix and with every resource id replaced by {id}, e.g.
+                /groups/{id}/hosts/{id}/measurements
+    """
+    path = _API_PREFIX_REGEX.sub("", urlparse(url).path)
+    segments = path.split("/")
+    # The segment before, unless it was an id itself, so a database named e.g. "hosts" does not template what follows
+    previous = None
+    for i in range(len(segments)):
+        segment = segments[i]
+        if segment == "" or segment in _BY_NAME_SEGMENTS:
+            previous = segment
+            continue
+        if previous in _RESOURCE_COLLECTIONS or previous in _BY_NAME_SEGMENTS or _ID_SEGMENT_REGEX.match(segment):
+            segments[i] = "{id}"
+            previous = None
+        else:
+            previous = segment
+    return "/".join(segments) or "/"
+
+
+class LatencyHistogram:
+    """
+    LatencyHistogram class
+
+    A cumulative histogram of request latencies over fixed buckets, as exposed by Prometheus. Quantiles are
+    estimated by interpolating within the bucket that contains them.
+    """
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets    = list(buckets)
+        self.counts     = [ 0 ] * (len(self.buckets) + 1)
+        self.count      = 0
+        self.sum        = 0.0
+        self.max        = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """
+        Quantile
+
+        :param q:   The quantile to estimate, between 0 and 1
+        :return:    The estimated latency in seconds, or None if nothing was observed
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucketCount in enumerate(self.counts):
+            if bucketCount > 0 and seen + bucketCount >= rank:
+                lower = self.buckets[i-1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / bucketCount)
+            seen += bucketCount
+        return self.max
+
+    def getCumulativeCounts(self):
+        cumulativeCounts = []
+        total = 0
+        for bucketCount in self.counts:
+            total += bucketCount
+            cumulativeCounts.append(total)
+        return cumulativeCounts
+
+
+class EndpointMetrics:
+    """
+    EndpointMetrics class
+
+    The counters and latency histogram of a single (method, endpoint template) pair
+    """
+    def __init__(self, method, endpoint, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.method     = method
+        self.endpoint   = endpoint
+        self.count      = 0
+        self.errors     = 0
+        self.bytesOut   = 0
+        self.bytesIn    = 0
+        self.bytesInDecoded = 0
+        self.statuses   = {}
+        self.latency    = LatencyHistogram(buckets)
+
+    def getDocument(self):
+        doc = {
+            "method"        : self.method,
+            "endpoint"      : self.endpoint,
+            "count"         : self.count,
+            "errors"        : self.errors,
+            "bytesOut"      : self.bytesOut,
+            "bytesIn"       : self.bytesIn,
+            "bytesInDecoded": self.bytesInDecoded,
+            "statuses"      : dict(self.statuses),
+            "latencySum"    : self.latency.sum,
+            "latencyMax"    : self.latency.max
+        }
+        for q in REPORTED_QUANTILES:
+            doc["latencyP{}".format(int(q*100))] = self.latency.quantile(q)
+        return doc
+
+
+class ApiMetrics:
+    """
+    ApiMetrics class
+
+    Records every request sent by the connectors by endpoint template: the number of requests, bytes sent and
+    received, response statuses and a latency histogram. The metrics can be read in process with getDocument, or
+    written out as JSON or in the Prometheus text format.
+    """
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        """
+        Constructor to create an ApiMetrics object.
+
+        :param buckets: The upper bounds, in seconds, of the latency histogram buckets
+        """
+        self.buckets    = buckets
+        self.lock       = threading.Lock()
+        self.endpoints  = {}
+
+    def getEndpointMetrics(self, method, url):
+        # Must be called with the lock held
+        key = (method.upper(), getEndpointTemplate(url))
+        if key not in self.endpoints:
+            self.endpoints[key] = EndpointMetrics(key[0], key[1], self.buckets)
+        return self.endpoints[key]
+
+    def record(self, method, url, status, latency, bytesOut=0, bytesIn=0, bytesInDecoded=None):
+        """
+        Record
+
+        :param method:          A String representing the HTTP method
+        :param url:             A String representing the url of the request
+        :param status:          The HTTP status of the response, or None if the request failed without one
+        :param latency:         The number of seconds the request took
+        :param bytesOut:        The number of bytes of the request body
+        :param bytesIn:         The number of bytes of the response body as received, i.e. compressed if it was
+        :param bytesInDecoded:  The number of bytes of the response body once decompressed, by default bytesIn
+        """
+        with self.lock:
+            endpointMetrics = self.getEndpointMetrics(method, url)
+            endpointMetrics.count += 1
+            endpointMetrics.bytesOut += bytesOut
+            endpointMetrics.bytesIn += bytesIn
+            endpointMetrics.bytesInDecoded += bytesIn if bytesInDecoded is None else bytesInDecoded
+            statusName = str(status) if status is not None else "error"
+            endpointMetrics.statuses[statusName] = endpointMetrics.statuses.get(statusName, 0) + 1
+            if status is None or status >= 400:
+                endpointMetrics.errors += 1
+            endpointMetrics.latency.observe(latency)
+
+    def recordTransfer(self, method, url, bytesIn, bytesInDecoded):
+        """
+        Record Transfer
+
+        Adds the body of a streamed response, which is only known once it has been read, to a request already
+        recorded
+
+        :param method:          A String representing the HTTP method
+        :param url:             A String representing the url of the request
+        :param bytesIn:         The number of bytes of the response body as received
+        :param bytesInDecoded:  The number of bytes of the response body once decompressed
+        """
+        with self.lock:
+            endpointMetrics = self.getEndpointMetrics(method, url)
+            endpointMetrics.bytesIn += bytesIn
+            endpointMetrics.bytesInDecoded += bytesInDecoded
+
+    def getTransferTotals(self):
+        """
+        Get Transfer Totals
+
+        :return:    A document with the number of requests and of bytes sent, received and received once
+                    decompressed over all endpoints
+        """
+        totals = { "requests" : 0, "bytesOut" : 0, "bytesIn" : 0, "bytesInDecoded" : 0 }
+        with self.lock:
+            for endpointMetrics in self.endpoints.values():
+                totals["requests"] += endpointMetrics.count
+                totals["bytesOut"] += endpointMetrics.bytesOut
+                totals["bytesIn"] += endpointMetrics.bytesIn
+                totals["bytesInDecoded"] += endpointMetrics.bytesInDecoded
+        return totals
+
+    def getDocument(self):
+        """
+        Get Document
+
+        :return:    An array with a document of counters and latency quantiles per endpoint, slowest in total first
+        """
+        with self.lock:
+            docs = [ endpointMetrics.getDocument() for endpointMetrics in self.endpoints.values() ]
+        return sorted(docs, key=lambda doc: doc["latencySum"], reverse=True)
+
+    def reset(self):
+        with self.lock:
+            self.endpoints = {}
+
+    def toJson(self):
+        return json.dumps(self.getDocument(), indent=4)
+
+    def toPrometheus(self):
+        """
+        To Prometheus
+
+        :return:    A String with the metrics in the Prometheus text exposition format
+        """
+        lines = [
+            "# HELP mdbaas_api_requests_total Requests sent per endpoint and status",
+            "# TYPE mdbaas_api_requests_total counter"
+        ]
+        with self.lock:
+            endpointMetricsList = sorted(self.endpoints.values(), key=lambda e: (e.endpoint, e.method))
+            for e in endpointMetricsList:
+                for status, count in sorted(e.statuses.items()):
+                    lines.append('mdbaas_api_requests_total{{method="{}",endpoint="{}",status="{}"}} {}'.format(
+                        e.method, e.endpoint, status, count))
+
+            lines.append("# HELP mdbaas_api_bytes_sent_total Request body bytes sent per endpoint")
+            lines.append("# TYPE mdbaas_api_bytes_sent_total counter")
+            for e in endpointMetricsList:
+                lines.append('mdbaas_api_bytes_sent_total{{method="{}",endpoint="{}"}} {}'.format(
+                    e.method, e.endpoint, e.bytesOut))
+
+            lines.append("# HELP mdbaas_api_bytes_received_total Response body bytes received per endpoint, as sent over the wire")
+            lines.append("# TYPE mdbaas_api_bytes_received_total counter")
+            for e in endpointMetricsList:
+                lines.append('mdbaas_api_bytes_received_total{{method="{}",endpoint="{}"}} {}'.format(
+                    e.method, e.endpoint, e.bytesIn))
+
+            lines.append("# HELP mdbaas_api_bytes_decoded_total Response body bytes received per endpoint once decompressed")
+            lines.append("# TYPE mdbaas_api_bytes_decoded_total counter")
+            for e in endpointMetricsList:
+                lines.append('mdbaas_api_bytes_decoded_total{{method="{}",endpoint="{}"}} {}'.format(
+                    e.method, e.endpoint, e.bytesInDecoded))
+
+            lines.append("# HELP mdbaas_api_request_duration_seconds Request latency per endpoint")
+            lines.append("# TYPE mdbaas_api_request_duration_seconds histogram")
+            for e in endpointMetricsList:
+                labels = 'method="{}",endpoint="{}"'.format(e.method, e.endpoint)
+                cumulativeCounts = e.latency.getCumulativeCounts()
+                for bucket, cumulativeCount in zip(e.latency.buckets, cumulativeCounts):
+                    lines.append('mdbaas_api_request_duration_seconds_bucket{{{},le="{}"}} {}'.format(
+                        labels, bucket, cumulativeCount))
+                lines.append('mdbaas_api_request_duration_seconds_bucket{{{},le="+Inf"}} {}'.format(
+                    labels, e.latency.count))
+                lines.append('mdbaas_api_request_duration_seconds_sum{{{}}} {}'.format(labels, e.latency.sum))
+                lines.append('mdbaas_api_request_duration_seconds_count{{{}}} {}'.format(labels, e.latency.count))
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path, format="json"):
+        """
+        Dump
+
+        :param path:    The path of the file to write the metrics to
+        :param format:  Either json or prometheus
+        """
+        if format == "prometheus":
+            content = self.toPrometheus()
+        elif format == "json":
+            content = self.toJson()
+        else:
+            raise ValueError("Unsupported metrics format {}".format(format))
+        with open(path, "w") as metricsFile:
+            metricsFile.write(content)
+        logging.info("Wrote API metrics to {}".format(path))
+
+    def dumpOnExit(self, path, format="json"):
+        """
+        Dump On Exit
+
+        Writes the metrics to a file when the interpreter exits
+
+        :param path:    The path of the file to write the metrics to
+        :param format:  Either json or prometheus
+        """
+        atexit.register(self.dump, path, format)
+
+
+# Metrics shared by every session that is not given its own
+_DEFAULT_API_METRICS = ApiMetrics()
+
+
+def getApiMetrics():
+    """
+    Get Api Metrics
+
+    :return:    The ApiMetrics shared by every session that is not given its own
+    """
+    return _DEFAULT_API_METRICS
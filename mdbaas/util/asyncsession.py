@@ -0,0 +1,314 @@
+import sys
+sys.path.append('')
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from urllib.parse import urlparse
+from mdbaas.util.session import ConnectionStats, AdaptiveLimiter, computeBackoff, RETRY_STATUSES, IDEMPOTENT_METHODS, \
+    DEFAULT_MAX_RETRIES, DEFAULT_BACKOFF_BASE, DEFAULT_BACKOFF_MAX, IDENTITY_ACCEPT_ENCODING
+from mdbaas.errors.omerrors import RequestRetriesExhaustedError
+from mdbaas.util.apimetrics import getApiMetrics
+from mdbaas.util.lazylog import LazyJson
+from mdbaas.util.jsondecode import loads
+
+# httpx is only needed by the async connectors
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Connection pool defaults
+DEFAULT_ASYNC_POOL_MAXSIZE  = 100
+DEFAULT_ASYNC_TIMEOUT       = 60.0
+
+# Async in-flight limiters shared by every async session talking to the same server, per event loop since an
+# asyncio.Condition can only be used on the loop it was first used on
+_ASYNC_IN_FLIGHT_LIMITERS       = weakref.WeakKeyDictionary()
+_ASYNC_IN_FLIGHT_LIMITERS_LOCK  = threading.Lock()
+
+
+class AsyncAdaptiveLimiter(AdaptiveLimiter):
+    """
+    AsyncAdaptiveLimiter class
+
+    The asyncio counterpart of AdaptiveLimiter: waiting for a slot suspends the coroutine instead of blocking the
+    thread, and the cap adapts to push back from the server in the same AIMD fashion
+    """
+    def __init__(self, maxInFlight, minInFlight=1, decreaseFactor=0.5, decreaseCooldown=1.0):
+        AdaptiveLimiter.__init__(self, maxInFlight, minInFlight=minInFlight, decreaseFactor=decreaseFactor,
+                                 decreaseCooldown=decreaseCooldown)
+        self.asyncCondition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self.asyncCondition:
+            while self.inFlight >= int(self.limit):
+                await self.asyncCondition.wait()
+            self.inFlight += 1
+
+    async def release(self, pushedBack=False):
+        async with self.asyncCondition:
+            self.inFlight -= 1
+            self._adjust(pushedBack)
+            self.asyncCondition.notify_all()
+
+    def getLimit(self):
+        return int(self.limit)
+
+
+def getAsyncInFlightLimiter(url, maxInFlight):
+    """
+    Get Async In Flight Limiter
+
+    Must be called from a coroutine. The cap of an existing limiter is kept, and a warning logged if a later
+    session asks for a different one.
+
+    :param url:         A String representing a url on the target server
+    :param maxInFlight: The maximum number of requests outstanding against the server
+    :return:            The AsyncAdaptiveLimiter shared by all async sessions talking to the server on the running
+                        event loop
+    """
+    parsedUrl = urlparse(url)
+    key = "{}://{}".format(parsedUrl.scheme, parsedUrl.netloc)
+    loop = asyncio.get_running_loop()
+    with _ASYNC_IN_FLIGHT_LIMITERS_LOCK:
+        loopLimiters = _ASYNC_IN_FLIGHT_LIMITERS.setdefault(loop, {})
+        if key not in loopLimiters:
+            loopLimiters[key] = AsyncAdaptiveLimiter(maxInFlight)
+        limiter = loopLimiters[key]
+    if limiter.maxInFlight != maxInFlight:
+        logging.warning("Ignoring maxInFlight={} for {}: the async sessions talking to it already share a limit of {} "
+                        "requests in flight".format(maxInFlight, key, limiter.maxInFlight))
+    return limiter
+
+
+class AsyncPooledSession:
+    """
+    AsyncPooledSession class
+
+    The asyncio counterpart of PooledSession, built on httpx. All requests of a connector share one connection pool
+    and one digest auth object, so the nonce negotiated by the first request is reused by every following request
+    on the event loop. Requests are retried and throttled exactly like PooledSession does.
+    """
+    def __init__(self, apiUser, apiKey, poolMaxSize=DEFAULT_ASYNC_POOL_MAXSIZE, keepAlive=True, maxInFlight=None,
+                 maxRetries=DEFAULT_MAX_RETRIES, backoffBase=DEFAULT_BACKOFF_BASE, backoffMax=DEFAULT_BACKOFF_MAX,
+                 timeout=DEFAULT_ASYNC_TIMEOUT, apiMetrics=None, compress=True):
+        """
+        Constructor to create an AsyncPooledSession object.
+
+        :param apiUser:         The api user with which we will authenticate
+        :param apiKey:          The api key for the api user with which we will authenticate
+        :param poolMaxSize:     The maximum number of connections to open
+        :param keepAlive:       Whether or not to keep connections open between requests
+        :param maxInFlight:     The maximum number of requests outstanding against a single server across all
+                                async sessions, or None for no cap
+        :param maxRetries:      The number of times to resend a request that was throttled, failed with a 5xx or
+                                lost its connection
+        :param backoffBase:     The number of seconds to wait before the first retry; doubled for every retry
+        :param backoffMax:      The maximum number of seconds to wait between retries
+        :param timeout:         The number of seconds after which a request times out
+        :param apiMetrics:      The ApiMetrics in which to record every request, by default the shared one
+        :param compress:        Whether or not to ask for compressed responses; httpx offers every encoding it can
+                                decode, including br and zstd when brotli and zstandard are installed
+        """
+        if httpx is None:
+            raise ImportError("The async connectors require the httpx package; install it with 'pip install httpx'")
+        self.maxInFlight    = maxInFlight
+        self.maxRetries     = maxRetries
+        self.backoffBase    = backoffBase
+        self.backoffMax     = backoffMax
+        self.stats          = ConnectionStats()
+        self.apiMetrics     = apiMetrics if apiMetrics is not None else getApiMetrics()
+        self.auth           = httpx.DigestAuth(apiUser, apiKey)
+        self.limits         = httpx.Limits(max_connections=poolMaxSize,
+                                           max_keepalive_connections=poolMaxSize if keepAlive else 0)
+        self.timeout        = timeout
+        self.headers        = {} if compress else { "Accept-Encoding" : IDENTITY_ACCEPT_ENCODING }
+        self.clients        = {}
+
+    def _getClient(self, verifyBool):
+        # TLS verification is a property of an httpx client rather than of a request, and its connections belong to
+        # the event loop they were opened on, so there is one client per loop and verifyBool
+        loop = asyncio.get_running_loop()
+        key = (loop, verifyBool)
+        if key not in self.clients:
+            # Connections of loops that have since been closed can neither be reused nor closed
+            self.clients = { clientKey : client for clientKey, client in self.clients.items()
+                             if not clientKey[0].is_closed() }
+            self.clients[key] = httpx.AsyncClient(auth=self.auth, verify=verifyBool, limits=self.limits,
+                                                  timeout=self.timeout, headers=self.headers,
+                                                  event_hooks={ "response" : [ self._countDigestChallenges ] })
+        return self.clients[key]
+
+    async def _countDigestChallenges(self, response):
+        self.stats.increment("requests", 1 + len(response.history))
+        numChallenges = len([ r for r in response.history if r.status_code == 401 ])
+        if numChallenges > 0:
+            self.stats.increment("digestChallenges", numChallenges)
+
+    async def _traceConnections(self, eventName, info):
+        if eventName == "connection.connect_tcp.complete":
+            self.stats.increment("newConnections")
+
+    def recordMetrics(self, method, url, response, latency):
+        if response is None:
+            self.apiMetrics.record(method, url, None, latency)
+            return
+        bytesOut = len(response.request.content)
+        bytesDecoded = len(response.content)
+        # num_bytes_downloaded counts the body as received, before it is decompressed
+        bytesIn = response.num_bytes_downloaded
+        self.apiMetrics.record(method, url, response.status_code, latency, bytesOut=bytesOut, bytesIn=bytesIn,
+                               bytesInDecoded=bytesDecoded)
+        self.stats.recordTransfer(bytesOut, bytesIn, bytesDecoded)
+
+    async def request(self, method, url, verifyBool=True, **kwargs):
+        """
+        Request
+
+        Sends an HTTP request over the pooled client, with the same retry behavior as PooledSession.request
+
+        :param method:      A String representing the HTTP method
+        :param url:         A String representing the url to which the request shall go
+        :param verifyBool:  Whether or not to verify TLS certificates
+
+        :return:            The httpx response object
+        """
+        client = self._getClient(verifyBool)
+        limiter = getAsyncInFlightLimiter(url, self.maxInFlight) if self.maxInFlight is not None else None
+        isIdempotent = method.upper() in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            response = None
+            error = None
+            if limiter is not None:
+                await limiter.acquire()
+            startTime = time.perf_counter()
+            try:
+                response = await client.request(method, url, extensions={ "trace" : self._traceConnections }, **kwargs)
+            except httpx.TransportError as e:
+                error = e
+            finally:
+                self.recordMetrics(method, url, response, time.perf_counter() - startTime)
+                pushedBack = error is not None or (response is not None and response.status_code in RETRY_STATUSES)
+                if limiter is not None:
+                    await limiter.release(pushedBack=pushedBack)
+
+            if not pushedBack:
+                return response
+            if response is not None and response.status_code == 429:
+                self.stats.increment("throttled")
+            retryable = isIdempotent or (response is not None and response.status_code == 429)
+            if not retryable:
+                if error is not None:
+                    raise error
+                return response
+            if attempt >= self.maxRetries:
+                if error is not None:
+                    raise error
+                raise RequestRetriesExhaustedError(method, url, attempt + 1, response.status_code)
+
+            backoff = computeBackoff(attempt, response, backoffBase=self.backoffBase, backoffMax=self.backoffMax)
+            logging.info("{} {} failed with {}; retrying in {:.1f}s (attempt {} of {})".format(
+                method, url, error if error is not None else response.status_code, backoff, attempt + 1, self.maxRetries))
+            self.stats.increment("retries")
+            await asyncio.sleep(backoff)
+            attempt += 1
+
+    def getConnectionStats(self):
+        """
+        Get Connection Stats
+
+        :return:    A document with the number of connections opened versus reused by this session
+        """
+        return self.stats.getDocument()
+
+    async def close(self):
+        """
+        Close
+
+        Closes all pooled connections opened on the running event loop
+        """
+        loop = asyncio.get_running_loop()
+        for (clientLoop, _), client in self.clients.items():
+            if clientLoop is loop:
+                await client.aclose()
+        self.clients = {}
+
+
+class AsyncRequestMethods:
+    """
+    AsyncRequestMethods class
+
+    The base HTTP request methods of a connector as coroutines. Mixed in ahead of a blocking connector class, every
+    API method of that class that returns self.get(...), self.post(...) etc. then returns an awaitable instead, so
+    the async connector keeps the exact method surface of the blocking one. Expects self.httpSession to be an
+    AsyncPooledSession and self.singleFlight to be an AsyncSingleFlight or None.
+    """
+    async def close(self):
+        """
+        Close
+
+        Closes all pooled connections opened on the running event loop
+        """
+        await self.httpSession.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, excType, excValue, traceback):
+        await self.close()
+
+    async def post(self, url, payload, verifyBool=True):
+        logging.debug("Sending a POST request to %s with payload:\n %s", url, LazyJson(payload, sortKeys=True))
+        result = loads((await self.httpSession.request("POST", url, verifyBool=verifyBool, json=payload)).content)
+        if "error" in result:
+            logging.debug("Encountered an error: %s ", LazyJson(result, sortKeys=True))  #TODO more sophisticated error handling
+        else:
+            logging.debug("Received response: %s", LazyJson(result, sortKeys=True))
+        return result
+
+    async def put(self, url, payload, verifyBool=True):
+        logging.debug("Sending a PUT request to %s with payload:\n %s", url, LazyJson(payload, sortKeys=True))
+        result = loads((await self.httpSession.request("PUT", url, verifyBool=verifyBool, json=payload)).content)
+        if "error" in result:
+            logging.debug("Encountered an error %s: ", LazyJson(result, sortKeys=True))  #TODO more sophisticated error handling
+        else:
+            logging.debug("Received response: %s", LazyJson(result, sortKeys=True))
+        return result
+
+    async def patch(self, url, payload, verifyBool=True):
+        logging.debug("Sending a PATCH request to %s with payload:\n %s", url, LazyJson(payload, sortKeys=True))
+        result = loads((await self.httpSession.request("PATCH", url, verifyBool=verifyBool, json=payload)).content)
+        if "error" in result:
+            logging.debug("Encountered an error: %s", LazyJson(result, sortKeys=True))  #TODO more sophisticated error handling
+        else:
+            logging.debug("Received response: %s", LazyJson(result, sortKeys=True))
+        return result
+
+    async def get(self, url, verifyBool=True):
+        if self.singleFlight is None:
+            return await self.sendGet(url, verifyBool=verifyBool)
+        return await self.singleFlight.do((url, verifyBool), lambda: self.sendGet(url, verifyBool=verifyBool))
+
+    async def sendGet(self, url, verifyBool=True):
+        logging.debug("Sending a GET request to %s", url)
+        result = loads((await self.httpSession.request("GET", url, verifyBool=verifyBool)).content)
+        if "error" in result:
+            logging.debug("Encountered an error: %s", LazyJson(result, sortKeys=True))  #TODO more sophisticated error handling
+        else:
+            logging.debug("Received response: %s", LazyJson(result, sortKeys=True))
+        return result
+
+    async def delete(self, url, verifyBool=True):
+        logging.debug("Sending a DELETE request to %s", url)
+        result = await self.httpSession.request("DELETE", url, verifyBool=verifyBool)
+        if result.status_code == 204:
+            return result
+        result = loads(result.content)
+        if "error" in result:
+            logging.debug("Encountered an error: %s ", LazyJson(result, sortKeys=True))  #TODO more sophisticated error handling
+        else:
+            logging.debug("Received response: %s ", LazyJson(result, sortKeys=True))
+        return result
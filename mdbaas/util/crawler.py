@@ -0,0 +1,92 @@
+import sys
+sys.path.append('')
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Crawl defaults
+DEFAULT_CRAWL_WORKERS = 16
+
+
+class FleetCrawler:
+    """
+    FleetCrawler class
+
+    A bounded thread pool used to fan blocking connector calls out over many groups, clusters or hosts at
+    once. Results are always returned in the order of the inputs so that a parallel crawl produces exactly
+    the same output as a serial walk over the same items.
+    """
+    def __init__(self, maxWorkers=DEFAULT_CRAWL_WORKERS):
+        """
+        Constructor to create a FleetCrawler object.
+
+        :param maxWorkers:  The maximum number of calls that may run at the same time
+        """
+        self.maxWorkers = max(1, int(maxWorkers))
+        self.executor = ThreadPoolExecutor(max_workers=self.maxWorkers)
+
+    def map(self, fn, items):
+        """
+        Map
+
+        Applies fn to every item in parallel. Any exception raised by fn is re-raised to the caller once all
+        preceding items have completed.
+
+        :param fn:      The function to apply to each item
+        :param items:   An iterable of items
+        :return:        A list of the results of fn, in the same order as items
+        """
+        items = list(items)
+        if self.maxWorkers == 1 or len(items) <= 1:
+            return [ fn(item) for item in items ]
+        futures = [ self.executor.submit(fn, item) for item in items ]
+        return [ future.result() for future in futures ]
+
+    def flatMap(self, fn, items):
+        """
+        Flat Map
+
+        Applies fn to every item in parallel, where fn returns a list, and concatenates the returned lists
+
+        :param fn:      The function to apply to each item
+        :param items:   An iterable of items
+        :return:        A single list of the concatenated results of fn, in the same order as items
+        """
+        results = []
+        for result in self.map(fn, items):
+            results.extend(result)
+        return results
+
+    def findFirst(self, fn, items):
+        """
+        Find First
+
+        Applies fn to every item in parallel and returns the first result that is not None, in order of completion.
+        Calls that have not started yet are cancelled as soon as a result is found.
+
+        :param fn:      The function to apply to each item
+        :param items:   An iterable of items
+        :return:        The first result of fn that is not None, or None if there is none
+        """
+        futures = [ self.executor.submit(fn, item) for item in items ]
+        try:
+            for future in as_completed(futures):
+                result = future.result()
+                if result is not None:
+                    return result
+            return None
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self):
+        """
+        Shutdown
+
+        Waits for outstanding calls and releases the worker threads
+        """
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.shutdown()
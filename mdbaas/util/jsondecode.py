@@ -0,0 +1,183 @@
+import sys
+sys.path.append('')
+import json
+import codecs
+import logging
+
+# Optional faster decoders, in order of preference
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+# Number of bytes read from the socket at a time when decoding incrementally
+DEFAULT_CHUNK_SIZE = 64*1024
+
+_WHITESPACE = " \t\n\r"
+
+
+def _stdlibLoads(data):
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode("utf-8")
+    return json.loads(data)
+
+
+_BACKENDS = { "stdlib" : _stdlibLoads }
+if simdjson is not None:
+    _BACKENDS["simdjson"] = simdjson.loads
+if orjson is not None:
+    _BACKENDS["orjson"] = orjson.loads
+
+_backendName = "orjson" if orjson is not None else "simdjson" if simdjson is not None else "stdlib"
+_loads = _BACKENDS[_backendName]
+
+
+def getJsonBackend():
+    """
+    Get JSON Backend
+
+    :return:    The name of the decoder in use: orjson, simdjson or stdlib
+    """
+    return _backendName
+
+
+def setJsonBackend(backendName):
+    """
+    Set JSON Backend
+
+    :param backendName: One of orjson, simdjson or stdlib; the backend must be installed
+    """
+    global _backendName, _loads
+    if backendName not in _BACKENDS:
+        raise ValueError("JSON backend {} is not available; available backends are {}".format(
+            backendName, list(_BACKENDS.keys())))
+    _backendName = backendName
+    _loads = _BACKENDS[backendName]
+    logging.debug("Decoding JSON with {}".format(backendName))
+
+
+def loads(data):
+    """
+    Loads
+
+    :param data:    A JSON document as bytes or a String
+    :return:        The decoded document, using the fastest decoder installed
+    """
+    return _loads(data)
+
+
+class _IncrementalReader:
+    """
+    _IncrementalReader class
+
+    A text buffer over an iterator of byte chunks that only holds the part of the document not yet consumed
+    """
+    def __init__(self, chunks):
+        self.chunks     = iter(chunks)
+        self.decoder    = codecs.getincrementaldecoder("utf-8")()
+        self.buffer     = ""
+        self.pos        = 0
+        self.exhausted  = False
+
+    def fill(self):
+        """
+        Fill
+
+        :return:    Whether or not more text was read
+        """
+        if self.exhausted:
+            return False
+        for chunk in self.chunks:
+            text = self.decoder.decode(chunk)
+            if text:
+                self.buffer = self.buffer[self.pos:] + text
+                self.pos = 0
+                return True
+        self.buffer = self.buffer[self.pos:] + self.decoder.decode(b"", final=True)
+        self.pos = 0
+        self.exhausted = True
+        return False
+
+    def peek(self):
+        """
+        Peek
+
+        :return:    The next non-whitespace character, or None at the end of the document
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return None
+
+    def expect(self, chars):
+        char = self.peek()
+        if char is None or char not in chars:
+            raise ValueError("Expected one of {} in JSON document but found {}".format(list(chars), char))
+        self.pos += 1
+        return char
+
+    def readValue(self, decoder):
+        """
+        Read Value
+
+        Decodes the next complete JSON value, reading more chunks until it is complete. A value that runs to the end
+        of the buffer is only accepted once the document has been read to the end, since a number could continue
+        in the next chunk.
+
+        :param decoder: The json.JSONDecoder to decode the value with
+        :return:        The decoded value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.pos)
+                if end < len(self.buffer) or self.exhausted:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.exhausted:
+                    raise
+            self.fill()
+
+
+def iterArrayItems(chunks, key):
+    """
+    Iterate Array Items
+
+    Incrementally decodes a JSON document of the form { ..., key : [ item, item, ... ], ... } as it is read, yielding
+    each item of the array as soon as it is complete. Only the item being decoded is held in memory, however long
+    the array is. The other members of the document are decoded and skipped.
+
+    :param chunks:  An iterator of byte chunks of the document, e.g. response.iter_content()
+    :param key:     The name of the top level member holding the array, e.g. results or slowQueries
+    :return:        A generator of the decoded items
+    """
+    reader = _IncrementalReader(chunks)
+    decoder = json.JSONDecoder()
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        memberName = reader.readValue(decoder)
+        reader.expect(":")
+        if memberName == key and reader.peek() == "[":
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.expect("]")
+            else:
+                while True:
+                    yield reader.readValue(decoder)
+                    if reader.expect(",]") == "]":
+                        break
+        else:
+            reader.readValue(decoder)
+        if reader.expect(",}") == "}":
+            return
@@ -0,0 +1,68 @@
+import sys
+sys.path.append('')
+import json
+
+# Longest String a logged payload is rendered as before it is cut off
+DEFAULT_MAX_LOG_CHARS   = 4096
+
+# Number of items of an array kept when a logged payload is rendered; the rest are summarized
+DEFAULT_MAX_LOG_ITEMS   = 10
+
+
+def samplePayload(payload, maxItems=DEFAULT_MAX_LOG_ITEMS):
+    """
+    Sample Payload
+
+    :param payload:     A JSON document
+    :param maxItems:    The number of items of each array to keep
+    :return:            A copy of the document in which every array longer than maxItems keeps only its first
+                        maxItems items followed by a note of how many were left out
+    """
+    if isinstance(payload, dict):
+        return { key : samplePayload(value, maxItems) for key, value in payload.items() }
+    if isinstance(payload, (list, tuple)):
+        sample = [ samplePayload(value, maxItems) for value in payload[:maxItems] ]
+        if len(payload) > maxItems:
+            sample.append("... {} more items".format(len(payload) - maxItems))
+        return sample
+    return payload
+
+
+class LazyJson:
+    """
+    LazyJson class
+
+    Wraps a JSON document passed as a logging argument, e.g. logging.debug("Received response: %s", LazyJson(doc)),
+    so that it is only serialized if the record is actually emitted. Creating one is O(1). When it is rendered, long
+    arrays are sampled and the output is cut off at maxChars, so even an emitted record of a multi-megabyte response
+    stays small.
+    """
+    __slots__ = [ "payload", "indent", "sortKeys", "maxChars", "maxItems" ]
+
+    def __init__(self, payload, indent=4, sortKeys=False, maxChars=DEFAULT_MAX_LOG_CHARS, maxItems=DEFAULT_MAX_LOG_ITEMS):
+        """
+        Constructor to create a LazyJson object.
+
+        :param payload:     The JSON document to log
+        :param indent:      The indent to render the document with, or None to render it on a single line
+        :param sortKeys:    Whether or not to sort the keys of the document
+        :param maxChars:    The longest String to render, or None for no limit
+        :param maxItems:    The number of items of each array to render, or None for all of them
+        """
+        self.payload    = payload
+        self.indent     = indent
+        self.sortKeys   = sortKeys
+        self.maxChars   = maxChars
+        self.maxItems   = maxItems
+
+    def __str__(self):
+        payload = self.payload if self.maxItems is None else samplePayload(self.payload, self.maxItems)
+        try:
+            rendered = json.dumps(payload, indent=self.indent, sort_keys=self.sortKeys, default=str)
+        except (TypeError, ValueError):
+            rendered = repr(payload)
+        if self.maxChars is not None and len(rendered) > self.maxChars:
+            rendered = "{}... ({} more chars)".format(rendered[:self.maxChars], len(rendered) - self.maxChars)
+        return rendered
+
+    __repr__ = __str__
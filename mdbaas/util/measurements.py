@@ -0,0 +1,145 @@
+import sys
+sys.path.append('')
+import numpy
+
+
+def parseTimestamps(timestamps):
+    """
+    Parse Timestamps
+
+    :param timestamps:  An array of ISO-8601 UTC timestamp Strings as returned by ops manager, e.g.
+                        2024-06-13T10:00:00Z
+    :return:            A numpy datetime64[s] array
+    """
+    return numpy.array([ timestamp.rstrip("Z") for timestamp in timestamps ], dtype="datetime64[s]")
+
+
+class MeasurementSeries:
+    """
+    MeasurementSeries class
+
+    The data points of a single measurement as numpy arrays: one datetime64 array of timestamps and one float64 array
+    of values, with NaN in place of null values. The original data points are kept so that values read back from a
+    series are exactly those returned by ops manager.
+    """
+    def __init__(self, name, units, dataPoints):
+        """
+        Constructor to create a MeasurementSeries object.
+
+        :param name:        The name of the measurement, e.g. DB_DATA_SIZE_TOTAL
+        :param units:       The units of the measurement
+        :param dataPoints:  The array of {timestamp, value} documents returned by ops manager
+        """
+        self.name       = name
+        self.units      = units
+        self.dataPoints = dataPoints
+        self.timestamps = parseTimestamps([ dataPoint["timestamp"] for dataPoint in dataPoints ])
+        self.values     = numpy.fromiter(
+            (numpy.nan if dataPoint["value"] is None else dataPoint["value"] for dataPoint in dataPoints),
+            dtype=numpy.float64, count=len(dataPoints)
+        )
+        self.nonNullMask    = ~numpy.isnan(self.values)
+        self.nonNullValues  = self.values[self.nonNullMask]
+
+    @staticmethod
+    def fromMeasurement(measurement):
+        return MeasurementSeries(measurement["name"], measurement.get("units", None), measurement["dataPoints"])
+
+    def __len__(self):
+        return len(self.values)
+
+    def current(self):
+        """
+        Current
+
+        :return:    The value of the latest non-null data point, as returned by ops manager
+        """
+        return self.dataPoints[numpy.flatnonzero(self.nonNullMask)[-1]]["value"]
+
+    def mean(self):
+        return numpy.mean(self.nonNullValues)
+
+    def std(self):
+        return numpy.std(self.nonNullValues)
+
+    def percentAboveThreshold(self, threshold):
+        """
+        Percent Above Threshold
+
+        :param threshold:   The threshold value
+        :return:            The percentage of non-null data points strictly above the threshold
+        """
+        return 100*float(numpy.count_nonzero(self.nonNullValues > threshold))/float(len(self.nonNullValues))
+
+    def growth(self):
+        """
+        Growth
+
+        :return:    The percentage growth from the first to the last non-null data point, treating a first value of
+                    0 as 1; None if there are no non-null data points
+        """
+        if len(self.nonNullValues) == 0:
+            return None
+        first   = self.nonNullValues[0]
+        last    = self.nonNullValues[-1]
+        if first == 0 and last == 0:
+            return 0
+        elif first == 0:
+            first = 1
+        return 100*(float(last) / float(first) - 1.0)
+
+
+class MeasurementSet:
+    """
+    MeasurementSet class
+
+    All of the measurements of a measurements API response, keyed by name
+    """
+    def __init__(self, measurementsData):
+        """
+        Constructor to create a MeasurementSet object.
+
+        :param measurementsData:    The response of a measurements API endpoint
+        """
+        self.start  = measurementsData.get("start", None)
+        self.end    = measurementsData.get("end", None)
+        self.series = {}
+        for measurement in measurementsData.get("measurements", []):
+            self.series[measurement["name"]] = MeasurementSeries.fromMeasurement(measurement)
+
+    def __contains__(self, name):
+        return name in self.series
+
+    def __getitem__(self, name):
+        return self.series[name]
+
+    def names(self):
+        return list(self.series.keys())
+
+    def latestNonNullSample(self, names):
+        """
+        Latest Non-null Sample
+
+        Finds the latest index, within the length of the shortest of the named series, at which every named series
+        has a non-null value
+
+        :param names:   An array of measurement names
+        :return:        A document mapping each name to its value at that index, or to None if there is no such index
+        """
+        missing = [ name for name in names if name not in self.series ]
+        if missing:
+            raise KeyError(missing[0])
+
+        validSample = { name : None for name in names }
+        if len(names) == 0:
+            return validSample
+        endIndex = min(len(self.series[name]) for name in names)
+        if endIndex == 0:
+            return validSample
+
+        nonNullMasks = numpy.vstack([ self.series[name].nonNullMask[:endIndex] for name in names ])
+        validIndexes = numpy.flatnonzero(nonNullMasks.all(axis=0))
+        if len(validIndexes) == 0:
+            return validSample
+        index = validIndexes[-1]
+        return { name : self.series[name].dataPoints[index]["value"] for name in names }
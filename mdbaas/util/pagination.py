@@ -0,0 +1,90 @@
+import sys
+sys.path.append('')
+import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Pagination defaults
+DEFAULT_PAGE_WORKERS = 4
+
+
+def addPagingParams(url, pageNum, itemsPerPage):
+    """
+    Add Paging Params
+
+    :param url:             A String representing the url of a list endpoint, with or without a query string
+    :param pageNum:         The 1-based number of the page to fetch
+    :param itemsPerPage:    The number of items per page
+    :return:                The url with the pageNum and itemsPerPage query parameters appended
+    """
+    separator = "&" if "?" in url else "?"
+    return "{}{}pageNum={}&itemsPerPage={}".format(url, separator, pageNum, itemsPerPage)
+
+
+def iterPages(fetchPage, itemsPerPage, maxWorkers=DEFAULT_PAGE_WORKERS):
+    """
+    Iterate Pages
+
+    Lazily yields every page of a paginated list endpoint in page order. The first page is fetched on its own to
+    learn totalCount and is yielded as is rather than fetched again; the remaining pages are then fetched
+    concurrently, at most maxWorkers at a time, so later pages are loading while the caller consumes earlier ones.
+
+    :param fetchPage:       A function taking (pageNum, itemsPerPage) and returning the page document
+    :param itemsPerPage:    The number of items per page
+    :param maxWorkers:      The maximum number of pages to fetch at the same time
+    :return:                A generator of page documents
+    """
+    firstPage = fetchPage(1, itemsPerPage)
+    yield firstPage
+
+    totalCount = firstPage.get("totalCount", 0) if isinstance(firstPage, dict) else 0
+    numPages = int(math.ceil(float(totalCount) / float(itemsPerPage)))
+    if numPages <= 1:
+        return
+
+    maxWorkers = max(1, min(int(maxWorkers), numPages - 1))
+    executor = ThreadPoolExecutor(max_workers=maxWorkers)
+    pending = deque()
+    nextPageNum = 2
+    try:
+        while nextPageNum <= numPages or pending:
+            while nextPageNum <= numPages and len(pending) < maxWorkers:
+                pending.append(executor.submit(fetchPage, nextPageNum, itemsPerPage))
+                nextPageNum += 1
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def iterResults(fetchPage, itemsPerPage, maxWorkers=DEFAULT_PAGE_WORKERS):
+    """
+    Iterate Results
+
+    :param fetchPage:       A function taking (pageNum, itemsPerPage) and returning the page document
+    :param itemsPerPage:    The number of items per page
+    :param maxWorkers:      The maximum number of pages to fetch at the same time
+    :return:                A generator of the items in the results array of every page, in order
+    """
+    for page in iterPages(fetchPage, itemsPerPage, maxWorkers=maxWorkers):
+        for result in page.get("results", []):
+            yield result
+
+
+def getAllPages(fetchPage, itemsPerPage, maxWorkers=DEFAULT_PAGE_WORKERS):
+    """
+    Get All Pages
+
+    :param fetchPage:       A function taking (pageNum, itemsPerPage) and returning the page document
+    :param itemsPerPage:    The number of items per page
+    :param maxWorkers:      The maximum number of pages to fetch at the same time
+    :return:                A document with the results of every page and the totalCount
+    """
+    doc             = {}
+    doc["results"]  = []
+    doc["totalCount"] = 0
+    for page in iterPages(fetchPage, itemsPerPage, maxWorkers=maxWorkers):
+        doc["results"].extend(page.get("results", []))
+        doc["totalCount"] = page.get("totalCount", doc["totalCount"])
+    return doc
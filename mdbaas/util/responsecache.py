@@ -0,0 +1,236 @@
+import sys
+sys.path.append('')
+import re
+import json
+import time
+import logging
+import sqlite3
+import threading
+from urllib.parse import urlparse
+
+# Response cache defaults
+DEFAULT_CACHE_MAX_BYTES = 256*1024*1024
+
+# Time to live, in seconds, of each kind of cached response. The first pattern matching the path of a url wins;
+# urls that match no pattern, or match one with a ttl of 0, are never cached. Measurements change every minute so
+# they are explicitly excluded before the host patterns.
+DEFAULT_CACHE_TTLS = [
+    (r"/measurements",                      0),
+    (r"/automationConfig$",                 5*60),
+    (r"/automationStatus$",                 0),
+    (r"/groups/[^/]+/hosts/[^/]+/disks/?$", 24*60*60),
+    (r"/groups/[^/]+/hosts/?$",             60*60),
+    (r"/groups/[^/]+/hosts/[^/]+/?$",       60*60),
+    (r"/groups/[^/]+/clusters(/[^/]+)?/?$", 60*60),
+    (r"/groups/[^/]+/?$",                   60*60),
+    (r"/groups/?$",                         60*60),
+    (r"/orgs/[^/]+/groups/?$",              60*60),
+    (r"/orgs/?$",                           60*60)
+]
+
+
+class CacheEntry:
+    """
+    CacheEntry class
+
+    A response read back from the cache
+    """
+    def __init__(self, url, body, etag, lastModified, storedAt, ttl):
+        self.url            = url
+        self.body           = body
+        self.etag           = etag
+        self.lastModified   = lastModified
+        self.storedAt       = storedAt
+        self.ttl            = ttl
+
+    def isFresh(self, now=None):
+        now = time.time() if now is None else now
+        return (now - self.storedAt) < self.ttl
+
+    def getDocument(self):
+        """
+        Get Document
+
+        :return:    A new copy of the cached JSON document, safe for the caller to modify
+        """
+        return json.loads(self.body)
+
+
+class ResponseCache:
+    """
+    ResponseCache class
+
+    A persistent cache of JSON GET responses backed by a sqlite file. Each kind of endpoint has its own time to live;
+    once an entry expires it is kept so that it can be revalidated with the ETag or Last-Modified value the server
+    sent with it. The file is bounded in size by evicting the least recently used entries. Safe to share between
+    threads.
+    """
+    def __init__(self, path, ttls=None, maxBytes=DEFAULT_CACHE_MAX_BYTES, refresh=False):
+        """
+        Constructor to create a ResponseCache object.
+
+        :param path:        The path of the sqlite file in which to store responses; ":memory:" for a cache that
+                            only lives for this run
+        :param ttls:        An array of (regex, seconds) tuples giving the time to live of urls whose path matches the
+                            regex; defaults to DEFAULT_CACHE_TTLS
+        :param maxBytes:    The maximum total size of the cached responses
+        :param refresh:     Whether to treat every entry stored before this run as expired, forcing it to be fetched
+                            or revalidated again
+        """
+        self.path       = path
+        self.ttls       = [ (re.compile(pattern), ttl) for pattern, ttl in (DEFAULT_CACHE_TTLS if ttls is None else ttls) ]
+        self.maxBytes   = maxBytes
+        self.refreshedBefore = time.time() if refresh else None
+        self.lock       = threading.Lock()
+        self.hits       = 0
+        self.misses     = 0
+        self.revalidations = 0
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " url TEXT PRIMARY KEY,"
+            " body TEXT NOT NULL,"
+            " etag TEXT,"
+            " lastModified TEXT,"
+            " storedAt REAL NOT NULL,"
+            " lastAccess REAL NOT NULL,"
+            " size INTEGER NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responsesByLastAccess ON responses (lastAccess)")
+        self.connection.commit()
+
+    def getTtl(self, url):
+        """
+        Get TTL
+
+        :param url:     A String representing the url of a GET request
+        :return:        The time to live, in seconds, of responses to the url; 0 if they should not be cached
+        """
+        path = urlparse(url).path
+        for pattern, ttl in self.ttls:
+            if pattern.search(path):
+                return ttl
+        return 0
+
+    def isCacheable(self, url):
+        return self.getTtl(url) > 0
+
+    def lookup(self, url):
+        """
+        Lookup
+
+        :param url:     A String representing the url of a GET request
+        :return:        The CacheEntry for the url, fresh or expired, or None if there is none
+        """
+        ttl = self.getTtl(url)
+        if ttl <= 0:
+            return None
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT body, etag, lastModified, storedAt FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            now = time.time()
+            self.connection.execute("UPDATE responses SET lastAccess = ? WHERE url = ?", (now, url))
+            self.connection.commit()
+        body, etag, lastModified, storedAt = row
+        if self.refreshedBefore is not None and storedAt < self.refreshedBefore:
+            ttl = 0
+        entry = CacheEntry(url, body, etag, lastModified, storedAt, ttl)
+        with self.lock:
+            if entry.isFresh(now):
+                self.hits += 1
+            else:
+                self.revalidations += 1
+        return entry
+
+    def store(self, url, document, etag=None, lastModified=None):
+        """
+        Store
+
+        Stores a response, replacing any previous response for the same url, and evicts the least recently used
+        responses if the cache has grown over its size limit
+
+        :param url:             A String representing the url of the GET request
+        :param document:        The JSON document returned by the server
+        :param etag:            The ETag header returned by the server, if any
+        :param lastModified:    The Last-Modified header returned by the server, if any
+        """
+        if not self.isCacheable(url):
+            return
+        body = json.dumps(document)
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (url, body, etag, lastModified, storedAt, lastAccess, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, body, etag, lastModified, now, now, len(body))
+            )
+            self._evict()
+            self.connection.commit()
+
+    def touch(self, url):
+        """
+        Touch
+
+        Marks the response for a url as fresh again after the server confirmed it has not changed
+
+        :param url:     A String representing the url of the GET request
+        """
+        now = time.time()
+        with self.lock:
+            self.connection.execute("UPDATE responses SET storedAt = ?, lastAccess = ? WHERE url = ?", (now, now, url))
+            self.connection.commit()
+
+    def invalidate(self, url):
+        """
+        Invalidate
+
+        Removes the response for a url, e.g. once the resource behind it has been modified
+
+        :param url:     A String representing the url of the GET request
+        """
+        with self.lock:
+            self.connection.execute("DELETE FROM responses WHERE url = ?", (url,))
+            self.connection.commit()
+
+    def _evict(self):
+        totalBytes = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if totalBytes <= self.maxBytes:
+            return
+        for url, size in self.connection.execute("SELECT url, size FROM responses ORDER BY lastAccess ASC").fetchall():
+            if totalBytes <= self.maxBytes:
+                break
+            self.connection.execute("DELETE FROM responses WHERE url = ?", (url,))
+            totalBytes -= size
+        logging.debug("Evicted responses from cache {}; {} bytes remain".format(self.path, totalBytes))
+
+    def clear(self):
+        """
+        Clear
+
+        Removes every cached response
+        """
+        with self.lock:
+            self.connection.execute("DELETE FROM responses")
+            self.connection.commit()
+
+    def getStats(self):
+        """
+        Get Stats
+
+        :return:    A document with the number of cache hits, misses and revalidations of this run
+        """
+        with self.lock:
+            return {
+                "hits"          : self.hits,
+                "misses"        : self.misses,
+                "revalidations" : self.revalidations
+            }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,440 @@
+import sys
+sys.path.append('')
+import time
+import random
+import logging
+import threading
+import requests
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPDigestAuth
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.request import ACCEPT_ENCODING
+from mdbaas.errors.omerrors import RequestRetriesExhaustedError
+from mdbaas.util.apimetrics import getApiMetrics
+
+# Connection pool defaults
+DEFAULT_POOL_CONNECTIONS    = 10
+DEFAULT_POOL_MAXSIZE        = 10
+
+# Encodings offered to the server: gzip and deflate always, br and zstd when brotli and zstandard are installed
+COMPRESSED_ACCEPT_ENCODING  = ACCEPT_ENCODING
+IDENTITY_ACCEPT_ENCODING    = "identity"
+
+# Retry defaults
+DEFAULT_MAX_RETRIES         = 5
+DEFAULT_BACKOFF_BASE        = 0.5
+DEFAULT_BACKOFF_MAX         = 60.0
+
+# Statuses that mean the server is overloaded or briefly unavailable and the request may be sent again
+RETRY_STATUSES              = [ 429, 500, 502, 503, 504 ]
+
+# Methods that may be sent again after a connection error without risk of applying them twice
+IDEMPOTENT_METHODS          = [ "GET", "HEAD", "OPTIONS", "PUT", "DELETE" ]
+
+# Exceptions raised by requests for dropped connections, timeouts and truncated bodies
+RETRY_EXCEPTIONS            = (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                               requests.exceptions.ChunkedEncodingError)
+
+# In-flight limiters shared by every session talking to the same server
+_IN_FLIGHT_LIMITERS         = {}
+_IN_FLIGHT_LIMITERS_LOCK    = threading.Lock()
+
+
+class ConnectionStats:
+    """
+    ConnectionStats class
+
+    Thread safe counters describing how the underlying connection pools have been used
+    """
+    def __init__(self):
+        self.lock               = threading.Lock()
+        self.requests           = 0
+        self.newConnections     = 0
+        self.digestChallenges   = 0
+        self.retries            = 0
+        self.throttled          = 0
+        self.bytesSent          = 0
+        self.bytesReceived      = 0
+        self.bytesDecoded       = 0
+
+    def increment(self, counterName, amount=1):
+        with self.lock:
+            setattr(self, counterName, getattr(self, counterName) + amount)
+
+    def getDocument(self):
+        """
+        Get Document
+
+        :return:    A document with the number of requests sent, connections opened and connections reused, and
+                    the number of body bytes sent, received over the wire and received once decompressed
+        """
+        with self.lock:
+            return {
+                "requests"          : self.requests,
+                "newConnections"    : self.newConnections,
+                "reusedConnections" : max(0, self.requests - self.newConnections),
+                "digestChallenges"  : self.digestChallenges,
+                "retries"           : self.retries,
+                "throttled"         : self.throttled,
+                "bytesSent"         : self.bytesSent,
+                "bytesReceived"     : self.bytesReceived,
+                "bytesDecoded"      : self.bytesDecoded
+            }
+
+    def recordTransfer(self, bytesSent, bytesReceived, bytesDecoded):
+        with self.lock:
+            self.bytesSent += bytesSent
+            self.bytesReceived += bytesReceived
+            self.bytesDecoded += bytesDecoded
+
+
+class AdaptiveLimiter:
+    """
+    AdaptiveLimiter class
+
+    Caps the number of requests that may be outstanding against a single server at the same time, adapting the cap
+    AIMD style: it grows by one request per window of healthy responses and is halved when the server pushes back
+    with a 429, a 5xx or a dropped connection, never going above maxInFlight or below minInFlight.
+    """
+    def __init__(self, maxInFlight, minInFlight=1, decreaseFactor=0.5, decreaseCooldown=1.0):
+        """
+        Constructor to create an AdaptiveLimiter object.
+
+        :param maxInFlight:         The largest cap, which is also the starting cap
+        :param minInFlight:         The smallest cap
+        :param decreaseFactor:      The factor by which the cap is multiplied when the server pushes back
+        :param decreaseCooldown:    The number of seconds after a decrease during which further push backs are
+                                    ignored, so that a burst of failures from one overloaded moment only counts once
+        """
+        self.maxInFlight        = maxInFlight
+        self.minInFlight        = max(1, min(minInFlight, maxInFlight))
+        self.decreaseFactor     = decreaseFactor
+        self.decreaseCooldown   = decreaseCooldown
+        self.limit              = float(maxInFlight)
+        self.inFlight           = 0
+        self.lastDecrease       = 0.0
+        self.condition          = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.inFlight >= int(self.limit):
+                self.condition.wait()
+            self.inFlight += 1
+
+    def release(self, pushedBack=False):
+        """
+        Release
+
+        :param pushedBack:  Whether the server pushed back on the request, rather than answering it normally
+        """
+        with self.condition:
+            self.inFlight -= 1
+            self._adjust(pushedBack)
+            self.condition.notify_all()
+
+    def _adjust(self, pushedBack):
+        now = time.time()
+        if pushedBack:
+            if now - self.lastDecrease >= self.decreaseCooldown:
+                self.limit = max(float(self.minInFlight), self.limit * self.decreaseFactor)
+                self.lastDecrease = now
+                logging.debug("Server pushed back; lowered in flight limit to {}".format(int(self.limit)))
+        else:
+            self.limit = min(float(self.maxInFlight), self.limit + 1.0 / self.limit)
+
+    def getLimit(self):
+        with self.condition:
+            return int(self.limit)
+
+
+def getInFlightLimiter(url, maxInFlight):
+    """
+    Get In Flight Limiter
+
+    Gets the limiter shared by all sessions talking to the server of the specified url, creating it with the
+    specified cap if this is the first session to ask for it. The cap of an existing limiter is kept, and a warning
+    logged if a later session asks for a different one.
+
+    :param url:         A String representing a url on the target server
+    :param maxInFlight: The maximum number of requests outstanding against the server
+    :return:            The AdaptiveLimiter for the server
+    """
+    parsedUrl = urlparse(url)
+    key = "{}://{}".format(parsedUrl.scheme, parsedUrl.netloc)
+    with _IN_FLIGHT_LIMITERS_LOCK:
+        if key not in _IN_FLIGHT_LIMITERS:
+            _IN_FLIGHT_LIMITERS[key] = AdaptiveLimiter(maxInFlight)
+        limiter = _IN_FLIGHT_LIMITERS[key]
+    if limiter.maxInFlight != maxInFlight:
+        logging.warning("Ignoring maxInFlight={} for {}: the sessions talking to it already share a limit of {} "
+                        "requests in flight".format(maxInFlight, key, limiter.maxInFlight))
+    return limiter
+
+
+def getRetryAfter(response):
+    """
+    Get Retry After
+
+    :param response:    A requests response object
+    :return:            The number of seconds the server asked us to wait in its Retry-After header, or None
+    """
+    retryAfter = response.headers.get("Retry-After", None)
+    if retryAfter is None:
+        return None
+    try:
+        return max(0.0, float(retryAfter))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retryAfter).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def getWireBytes(response, bytesDecoded):
+    """
+    Get Wire Bytes
+
+    :param response:        A requests response whose body has been read
+    :param bytesDecoded:    The number of bytes of the body once decompressed
+    :return:                The number of bytes of the body as received over the wire, before decompression
+    """
+    raw = response.raw
+    if raw is not None and hasattr(raw, "tell"):
+        try:
+            return raw.tell()
+        except (OSError, ValueError):
+            pass
+    return bytesDecoded
+
+
+def computeBackoff(attempt, response=None, backoffBase=DEFAULT_BACKOFF_BASE, backoffMax=DEFAULT_BACKOFF_MAX):
+    """
+    Compute Backoff
+
+    :param attempt:     The number of the attempt that just failed, starting at 0
+    :param response:    The response of the failed attempt, if there was one
+    :param backoffBase: The number of seconds to wait before the first retry
+    :param backoffMax:  The maximum number of seconds to wait
+    :return:            The number of seconds to wait before the next attempt: the server's Retry-After if it sent
+                        one, otherwise a random wait of up to backoffBase * 2^attempt
+    """
+    retryAfter = getRetryAfter(response) if response is not None else None
+    if retryAfter is not None:
+        return min(backoffMax, retryAfter) + random.uniform(0, backoffBase)
+    return random.uniform(0, min(backoffMax, backoffBase * (2 ** attempt)))
+
+
+def _countingPoolClass(poolClass, stats):
+    """
+    Counting Pool Class
+
+    Builds a subclass of a urllib3 connection pool class that reports every request sent and every connection
+    (re)opened to the specified stats object
+
+    :param poolClass:   The urllib3 connection pool class to extend
+    :param stats:       The ConnectionStats object to report to
+    :return:            The new connection pool class
+    """
+    class CountingConnection(poolClass.ConnectionCls):
+        def connect(self):
+            stats.increment("newConnections")
+            return super().connect()
+
+    class CountingConnectionPool(poolClass):
+        ConnectionCls = CountingConnection
+
+        def urlopen(self, *args, **kwargs):
+            stats.increment("requests")
+            return super().urlopen(*args, **kwargs)
+
+    return CountingConnectionPool
+
+
+class PooledAdapter(HTTPAdapter):
+    """
+    PooledAdapter class
+
+    An HTTPAdapter whose connection pools report their usage to a ConnectionStats object
+    """
+    def __init__(self, stats, poolConnections=DEFAULT_POOL_CONNECTIONS, poolMaxSize=DEFAULT_POOL_MAXSIZE):
+        self.stats = stats
+        super().__init__(pool_connections=poolConnections, pool_maxsize=poolMaxSize)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http"  : _countingPoolClass(HTTPConnectionPool, self.stats),
+            "https" : _countingPoolClass(HTTPSConnectionPool, self.stats)
+        }
+
+
+class PooledSession:
+    """
+    PooledSession class
+
+    A wrapper around a requests session shared by all calls of a connector. Connections are kept alive and pooled
+    between calls, and the digest auth nonce negotiated on the first request of each thread is reused for the
+    following requests so that the 401 challenge round trip is only paid once.
+    """
+    def __init__(self, apiUser, apiKey, poolConnections=DEFAULT_POOL_CONNECTIONS, poolMaxSize=DEFAULT_POOL_MAXSIZE,
+                 keepAlive=True, maxInFlight=None, maxRetries=DEFAULT_MAX_RETRIES, backoffBase=DEFAULT_BACKOFF_BASE,
+                 backoffMax=DEFAULT_BACKOFF_MAX, apiMetrics=None, compress=True):
+        """
+        Constructor to create a PooledSession object.
+
+        :param apiUser:         The api user with which we will authenticate
+        :param apiKey:          The api key for the api user with which we will authenticate
+        :param poolConnections: The number of distinct hosts for which to keep a connection pool
+        :param poolMaxSize:     The maximum number of connections to keep alive per host
+        :param keepAlive:       Whether or not to keep connections open between requests
+        :param maxInFlight:     The maximum number of requests outstanding against a single server across all
+                                sessions, or None for no cap. The cap adapts to the server, shrinking when it pushes
+                                back and growing back up to this value while responses are healthy.
+        :param maxRetries:      The number of times to resend a request that was throttled, failed with a 5xx or
+                                lost its connection
+        :param backoffBase:     The number of seconds to wait before the first retry; doubled for every retry
+        :param backoffMax:      The maximum number of seconds to wait between retries
+        :param apiMetrics:      The ApiMetrics in which to record every request, by default the shared one
+        :param compress:        Whether or not to ask for compressed responses; they are decompressed as they are
+                                read, so streamed responses stay streamed
+        """
+        self.maxInFlight = maxInFlight
+        self.maxRetries = maxRetries
+        self.backoffBase = backoffBase
+        self.backoffMax = backoffMax
+        self.stats      = ConnectionStats()
+        self.apiMetrics = apiMetrics if apiMetrics is not None else getApiMetrics()
+        self.auth       = HTTPDigestAuth(apiUser, apiKey)
+        self.adapter    = PooledAdapter(self.stats, poolConnections=poolConnections, poolMaxSize=poolMaxSize)
+
+        self.session        = requests.Session()
+        self.session.auth   = self.auth
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.session.hooks["response"].append(self._countDigestChallenges)
+        self.session.headers["Accept-Encoding"] = COMPRESSED_ACCEPT_ENCODING if compress else IDENTITY_ACCEPT_ENCODING
+        if not keepAlive:
+            self.session.headers["Connection"] = "close"
+
+    def _countDigestChallenges(self, response, *args, **kwargs):
+        numChallenges = len([ r for r in response.history if r.status_code == 401 ])
+        if numChallenges > 0:
+            self.stats.increment("digestChallenges", numChallenges)
+        return response
+
+    def recordMetrics(self, method, url, response, latency, stream=False):
+        if response is None:
+            self.apiMetrics.record(method, url, None, latency)
+            return
+        body = response.request.body if response.request is not None else None
+        bytesOut = len(body) if body else 0
+        if stream:
+            # Reading the content of a streamed response would load it all into memory; iterContent records its
+            # bytes once they have been read
+            bytesIn = bytesDecoded = 0
+        else:
+            bytesDecoded = len(response.content)
+            bytesIn = getWireBytes(response, bytesDecoded)
+        self.apiMetrics.record(method, url, response.status_code, latency, bytesOut=bytesOut, bytesIn=bytesIn,
+                               bytesInDecoded=bytesDecoded)
+        self.stats.recordTransfer(bytesOut, bytesIn, bytesDecoded)
+
+    def iterContent(self, response, chunkSize):
+        """
+        Iterate Content
+
+        :param response:    A response sent with stream=True
+        :param chunkSize:   The number of bytes to read from the socket at a time
+        :return:            A generator of the decompressed chunks of the body, recording the bytes of the body once
+                            it has been read
+        """
+        bytesDecoded = 0
+        try:
+            for chunk in response.iter_content(chunk_size=chunkSize):
+                bytesDecoded += len(chunk)
+                yield chunk
+        finally:
+            bytesIn = getWireBytes(response, bytesDecoded)
+            self.apiMetrics.recordTransfer(response.request.method, response.url, bytesIn, bytesDecoded)
+            self.stats.recordTransfer(0, bytesIn, bytesDecoded)
+
+    def getBackoff(self, attempt, response=None):
+        return computeBackoff(attempt, response, backoffBase=self.backoffBase, backoffMax=self.backoffMax)
+
+    def request(self, method, url, verifyBool=True, **kwargs):
+        """
+        Request
+
+        Sends an HTTP request over the pooled session. Requests that are throttled with a 429 are retried for every
+        method; requests that fail with a 5xx or lose their connection are only retried for idempotent methods.
+        Retries wait with jittered exponential backoff, or as long as the server's Retry-After asks.
+
+        :param method:      A String representing the HTTP method
+        :param url:         A String representing the url to which the request shall go
+        :param verifyBool:  Whether or not to verify TLS certificates
+
+        :return:            The requests response object
+        """
+        limiter = getInFlightLimiter(url, self.maxInFlight) if self.maxInFlight is not None else None
+        isIdempotent = method.upper() in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            response = None
+            error = None
+            if limiter is not None:
+                limiter.acquire()
+            startTime = time.perf_counter()
+            try:
+                response = self.session.request(method, url, verify=verifyBool, **kwargs)
+            except RETRY_EXCEPTIONS as e:
+                error = e
+            finally:
+                elapsed = time.perf_counter() - startTime
+                pushedBack = error is not None or (response is not None and response.status_code in RETRY_STATUSES)
+                # Release the slot before anything else can raise, so a failure below never leaks it
+                if limiter is not None:
+                    limiter.release(pushedBack=pushedBack)
+                self.recordMetrics(method, url, response, elapsed, stream=kwargs.get("stream", False))
+
+            if not pushedBack:
+                return response
+            if response is not None and response.status_code == 429:
+                self.stats.increment("throttled")
+            retryable = isIdempotent or (response is not None and response.status_code == 429)
+            if not retryable:
+                if error is not None:
+                    raise error
+                return response
+            if response is not None:
+                # Give the connection back to the pool; a streamed body nobody reads would otherwise pin it
+                response.close()
+            if attempt >= self.maxRetries:
+                if error is not None:
+                    raise error
+                raise RequestRetriesExhaustedError(method, url, attempt + 1, response.status_code)
+
+            backoff = self.getBackoff(attempt, response)
+            logging.info("{} {} failed with {}; retrying in {:.1f}s (attempt {} of {})".format(
+                method, url, error if error is not None else response.status_code, backoff, attempt + 1, self.maxRetries))
+            self.stats.increment("retries")
+            time.sleep(backoff)
+            attempt += 1
+
+    def getConnectionStats(self):
+        """
+        Get Connection Stats
+
+        :return:    A document with the number of connections opened versus reused by this session
+        """
+        return self.stats.getDocument()
+
+    def close(self):
+        """
+        Close
+
+        Closes all pooled connections
+        """
+        self.session.close()
@@ -0,0 +1,134 @@
+import sys
+sys.path.append('')
+import copy
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done       = threading.Event()
+        self.result     = None
+        self.error      = None
+        self.followers  = 0
+        # A copy of the result taken before anyone could modify it, from which every follower gets its own copy
+        self.snapshot   = None
+
+
+class SingleFlight:
+    """
+    SingleFlight class
+
+    Merges identical calls made at the same time: the first caller for a key runs the call, and every caller that
+    asks for the same key while it is running waits for it and gets its result instead of making its own call.
+    Nothing is kept once the call has finished, so a later caller always makes a fresh call. The result is copied
+    before any caller gets it and every follower gets its own copy, so a caller modifying its result does not affect
+    the others.
+    """
+    def __init__(self):
+        self.lock   = threading.Lock()
+        self.calls  = {}
+        self.merged = 0
+
+    def do(self, key, fn):
+        """
+        Do
+
+        :param key: A hashable value identifying the call, e.g. the url of a GET request
+        :param fn:  A function taking no arguments that makes the call
+        :return:    The result of the call
+        """
+        with self.lock:
+            call = self.calls.get(key, None)
+            if call is not None:
+                call.followers += 1
+                self.merged += 1
+                isLeader = False
+            else:
+                call = _Call()
+                self.calls[key] = call
+                isLeader = True
+
+        if not isLeader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.snapshot)
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+                # No follower can join once the call is removed
+                hasFollowers = call.followers > 0
+            if hasFollowers and call.error is None:
+                call.snapshot = copy.deepcopy(call.result)
+            call.done.set()
+        return call.result
+
+    def getMergedCount(self):
+        """
+        Get Merged Count
+
+        :return:    The number of calls that were served by another caller's call
+        """
+        with self.lock:
+            return self.merged
+
+
+class _AsyncCall:
+    def __init__(self, future):
+        self.future     = future
+        self.followers  = 0
+
+
+class AsyncSingleFlight:
+    """
+    AsyncSingleFlight class
+
+    The asyncio counterpart of SingleFlight, merging identical coroutine calls made on the same event loop
+    """
+    def __init__(self):
+        self.calls  = {}
+        self.merged = 0
+
+    async def do(self, key, fn):
+        """
+        Do
+
+        :param key: A hashable value identifying the call, e.g. the url of a GET request
+        :param fn:  A function taking no arguments that returns the coroutine making the call
+        :return:    The result of the call
+        """
+        call = self.calls.get(key, None)
+        if call is not None:
+            self.merged += 1
+            call.followers += 1
+            return copy.deepcopy(await asyncio.shield(call.future))
+
+        future = asyncio.get_running_loop().create_future()
+        call = _AsyncCall(future)
+        self.calls[key] = call
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+                # Retrieve the exception so it is not reported as unhandled when nobody was waiting for it
+                future.exception()
+            raise
+        finally:
+            del self.calls[key]
+        # Followers resume only after the leader has returned, so they copy a snapshot rather than the result
+        future.set_result(copy.deepcopy(result) if call.followers > 0 else result)
+        return result
+
+    def getMergedCount(self):
+        return self.merged
@@ -0,0 +1,234 @@
+import sys
+sys.path.append('')
+import os
+import re
+import math
+import time
+import logging
+import threading
+import numpy
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+# On-disk layout of a single (host, metric) series: one row per sample
+SERIES_DTYPE = numpy.dtype([ ("timestamp", "<i8"), ("value", "<f8") ])
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+_ISO_DURATION_REGEX = re.compile(
+    r"^P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?$"
+)
+
+
+def parseIsoDuration(duration):
+    """
+    Parse ISO Duration
+
+    :param duration:    An ISO-8601 duration String as used by the measurements API, e.g. PT1H or P30D
+    :return:            The duration in seconds
+    """
+    match = _ISO_DURATION_REGEX.match(duration)
+    if match is None:
+        raise ValueError("Unsupported ISO-8601 duration {}".format(duration))
+    parts = { key : int(value) if value else 0 for key, value in match.groupdict().items() }
+    return (((parts["weeks"]*7 + parts["days"])*24 + parts["hours"])*60 + parts["minutes"])*60 + parts["seconds"]
+
+
+def formatIsoDuration(seconds):
+    """
+    Format ISO Duration
+
+    :param seconds: A duration in seconds
+    :return:        The duration as an ISO-8601 String in whole minutes, rounded up
+    """
+    return "PT{}M".format(int(math.ceil(seconds / 60.0)))
+
+
+def toEpochSeconds(timestamp):
+    return int(datetime.strptime(timestamp, TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc).timestamp())
+
+
+def toTimestamp(epochSeconds):
+    return datetime.fromtimestamp(int(epochSeconds), tz=timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+
+class TimeSeriesStore:
+    """
+    TimeSeriesStore class
+
+    A local columnar store of measurement series. Each (host, metric) series lives in its own .npy file of
+    (timestamp, value) rows, with NaN for null values, and is read back memory-mapped. Series are merged with newly
+    fetched samples and trimmed to a retention window, so repeat runs only need to ask ops manager for the samples
+    since the last stored non-null sample, their high-water mark. Null samples at the end of a series, which ops
+    manager fills in later, are stored but asked for again.
+    """
+    def __init__(self, rootDir):
+        """
+        Constructor to create a TimeSeriesStore object.
+
+        :param rootDir: The directory under which to keep the series files
+        """
+        self.rootDir    = rootDir
+        self.lock       = threading.Lock()
+        self.keyLocks   = {}
+
+    def _getKeyLock(self, key):
+        with self.lock:
+            if key not in self.keyLocks:
+                self.keyLocks[key] = threading.Lock()
+            return self.keyLocks[key]
+
+    def getPath(self, key, metric):
+        """
+        Get Path
+
+        :param key:     A tuple identifying the series owner, e.g. ("hosts", groupId, hostId)
+        :param metric:  The name of the measurement
+        :return:        The path of the file holding the series
+        """
+        parts = [ quote(str(part), safe="") for part in key ]
+        return os.path.join(self.rootDir, *parts, "{}.npy".format(quote(metric, safe="")))
+
+    def read(self, key, metric):
+        """
+        Read
+
+        :param key:     A tuple identifying the series owner
+        :param metric:  The name of the measurement
+        :return:        The stored series as a read-only memory-mapped structured array, or an empty array
+        """
+        path = self.getPath(key, metric)
+        if not os.path.exists(path):
+            return numpy.empty(0, dtype=SERIES_DTYPE)
+        return numpy.load(path, mmap_mode="r")
+
+    def write(self, key, metric, series):
+        path = self.getPath(key, metric)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmpPath = "{}.tmp.npy".format(path[:-len(".npy")])
+        numpy.save(tmpPath, numpy.ascontiguousarray(series, dtype=SERIES_DTYPE))
+        os.replace(tmpPath, path)
+
+    def getLastTimestamp(self, key, metrics):
+        """
+        Get Last Timestamp
+
+        :param key:     A tuple identifying the series owner
+        :param metrics: An array of measurement names
+        :return:        The earliest of the timestamps of the last non-null samples of the series, in epoch seconds,
+                        or None if any of them has no non-null sample stored yet
+        """
+        lastTimestamps = []
+        for metric in metrics:
+            series = self.read(key, metric)
+            timestamps = series["timestamp"][~numpy.isnan(series["value"])]
+            if len(timestamps) == 0:
+                return None
+            lastTimestamps.append(int(timestamps[-1]))
+        return min(lastTimestamps) if lastTimestamps else None
+
+    def merge(self, key, measurementsData, oldestTimestamp=None):
+        """
+        Merge
+
+        Merges the series of a measurements API response into the store. Samples for timestamps that are already
+        stored are replaced by the new ones, since the latest sample of a previous run may have been incomplete.
+
+        :param key:                 A tuple identifying the series owner
+        :param measurementsData:    The response of a measurements API endpoint
+        :param oldestTimestamp:     Samples older than this epoch timestamp are dropped, if specified
+        """
+        for measurement in measurementsData.get("measurements", []):
+            dataPoints = measurement["dataPoints"]
+            fetched = numpy.empty(len(dataPoints), dtype=SERIES_DTYPE)
+            fetched["timestamp"] = [ toEpochSeconds(dataPoint["timestamp"]) for dataPoint in dataPoints ]
+            fetched["value"] = [ numpy.nan if dataPoint["value"] is None else dataPoint["value"] for dataPoint in dataPoints ]
+
+            stored = numpy.array(self.read(key, measurement["name"]))
+            if len(fetched) > 0:
+                stored = stored[stored["timestamp"] < fetched["timestamp"].min()]
+            merged = numpy.concatenate([ stored, fetched ])
+            merged = merged[numpy.argsort(merged["timestamp"], kind="stable")]
+            if oldestTimestamp is not None:
+                merged = merged[merged["timestamp"] >= oldestTimestamp]
+            self.write(key, measurement["name"], merged)
+
+    def getMeasurementsDocument(self, key, metrics, startTimestamp, endTimestamp, units=None):
+        """
+        Get Measurements Document
+
+        Builds a document shaped like a measurements API response from the stored series
+
+        :param key:             A tuple identifying the series owner
+        :param metrics:         An array of measurement names
+        :param startTimestamp:  The epoch timestamp of the start of the window
+        :param endTimestamp:    The epoch timestamp of the end of the window
+        :param units:           An optional document mapping each measurement name to its units
+        :return:                A document with the start, end and measurements of the window
+        """
+        units = {} if units is None else units
+        measurements = []
+        for metric in metrics:
+            series = self.read(key, metric)
+            series = series[series["timestamp"] >= startTimestamp]
+            measurements.append({
+                "name"          : metric,
+                "units"         : units.get(metric, None),
+                "dataPoints"    : [
+                    {
+                        "timestamp" : toTimestamp(timestamp),
+                        "value"     : None if math.isnan(value) else value
+                    } for timestamp, value in zip(series["timestamp"].tolist(), series["value"].tolist())
+                ]
+            })
+        return {
+            "start"         : toTimestamp(startTimestamp),
+            "end"           : toTimestamp(endTimestamp),
+            "measurements"  : measurements
+        }
+
+    def getFetchPeriod(self, key, metrics, granularity, period, now=None):
+        """
+        Get Fetch Period
+
+        :param key:         A tuple identifying the series owner, e.g. ("hosts", groupId, hostId)
+        :param metrics:     An array of measurement names
+        :param granularity: The ISO-8601 duration between samples, e.g. PT1H
+        :param period:      The ISO-8601 duration of the window wanted, e.g. P30D
+        :param now:         The epoch timestamp of the end of the window; defaults to the current time
+        :return:            The ISO-8601 period to fetch from ops manager: the whole period on the first run for a
+                            series, otherwise only the time since the last stored non-null sample
+        """
+        now = int(time.time()) if now is None else int(now)
+        periodSeconds = parseIsoDuration(period)
+        startTimestamp = now - periodSeconds
+
+        fetchPeriod = period
+        lastTimestamp = self.getLastTimestamp(key, metrics)
+        if lastTimestamp is not None and lastTimestamp > startTimestamp:
+            # Re-fetch the last stored sample too, it may have been incomplete
+            fetchSeconds = now - lastTimestamp + parseIsoDuration(granularity)
+            if fetchSeconds < periodSeconds:
+                fetchPeriod = formatIsoDuration(fetchSeconds)
+        logging.debug("Fetching {} of {} for {}".format(fetchPeriod, metrics, key))
+        return fetchPeriod
+
+    def update(self, key, metrics, period, measurementsData, now=None):
+        """
+        Update
+
+        :param key:                 A tuple identifying the series owner, e.g. ("hosts", groupId, hostId)
+        :param metrics:             An array of measurement names
+        :param period:              The ISO-8601 duration of the window to return, e.g. P30D
+        :param measurementsData:    The measurements API response over the period returned by getFetchPeriod
+        :param now:                 The epoch timestamp of the end of the window; defaults to the current time
+        :return:                    A document shaped like a measurements API response over the whole period
+        """
+        now = int(time.time()) if now is None else int(now)
+        startTimestamp = now - parseIsoDuration(period)
+        units = { measurement["name"] : measurement.get("units", None) for measurement in measurementsData.get("measurements", []) }
+        # Only the read-merge-write of the series is serialized; the fetch happens before, without the lock
+        with self._getKeyLock(key):
+            self.merge(key, measurementsData, oldestTimestamp=startTimestamp)
+            return self.getMeasurementsDocument(key, metrics, startTimestamp, now, units=units)
+
@@ -9,7 +9,8 @@ import argparse
 import json
 
 
-from mdbaas.opsmgrutil import OpsMgrConnector
+from mdbaas.opsmgrutil import OpsMgrConnector, ProjectHostIndex, AutomationConfig, TopologyIndex, getProcessHostAndPort
+from mdbaas.util import ResponseCache, LazyJson
 
 # Script metadata
 version         = "1.0.0"
@@ -34,9 +35,8 @@ def collectAuditData(config):
     :return:
     """
     rowData = []
-    allGroups  = opsMgrConnector.getAllGroups()
-    for group in allGroups["results"]:
-        logging.debug("Examining group {}".format(json.dumps(group)))
+    for group in opsMgrConnector.iterGroups():
+        logging.debug("Examining group %s", LazyJson(group, indent=None))
 
         if shouldSkipOpsMgrProject(config, group):
             continue
@@ -129,39 +129,46 @@ def getRowDataForGroup(group):
     :return:
     """
     clusters = opsMgrConnector.getClustersForGroup(group["id"])
-    automationConfigForGroup = opsMgrConnector.getAutomationConfig(group["id"])
+    topology = TopologyIndex(AutomationConfig(opsMgrConnector.getAutomationConfig(group["id"]), groupId=group["id"]))
     rowData = []
+    processesSeen = set()
     for cluster in clusters["results"]:
-        rowData.extend(getRowDataForCluster(cluster, group, automationConfigForGroup))
+        rowData.extend(getRowDataForCluster(cluster, group, topology, processesSeen))
     return rowData
 
 
-def getRowDataForCluster(cluster, group, automationConfig=None):
+def getRowDataForCluster(cluster, group, topology=None, processesSeen=None):
     logging.debug("Getting data for cluster " + cluster["clusterName"])
-    if automationConfig is None:
-        automationConfig = opsMgrConnector.getAutomationConfig(cluster["groupId"])
-    processes = getProcessesForCluster(cluster, automationConfig)
+    if topology is None:
+        topology = TopologyIndex(AutomationConfig(opsMgrConnector.getAutomationConfig(cluster["groupId"]), groupId=cluster["groupId"]))
+    processes = getProcessesForCluster(cluster, topology)
 
     rowData = []
     for process in processes:
-        rowData.extend(getRowDataForProcess(cluster, group, process, automationConfig))
+        # The processes of a sharded cluster are listed under the sharded cluster and again under its shards
+        if processesSeen is not None:
+            if process["name"] in processesSeen:
+                continue
+            processesSeen.add(process["name"])
+        rowData.extend(getRowDataForProcess(cluster, group, process, topology))
 
     return rowData
 
-def getRowDataForProcess(cluster, group, process, automationConfig):
+def getRowDataForProcess(cluster, group, process, topology):
     """
     Get Row Data for Process
 
     :param process:
-    :param automationConfig:
+    :param topology:    The TopologyIndex of the automation config of the group
     :return:
     """
     # Get host information
-    logging.debug("Getting host information for process {}".format(json.dumps(process, indent=4)))
-    hostname = process["hostname"]
-    port = process["args2_6"]["net"]["port"]
-    hostData = opsMgrConnector.getHostByHostnameAndPort(cluster["groupId"], hostname, port)
-    logging.debug("Received host data {}".format(json.dumps(hostData, indent=4)))
+    logging.debug("Getting host information for process %s", LazyJson(process))
+    hostname, port = getProcessHostAndPort(process)
+    hostData = hostIndex.getHostByHostnameAndPort(cluster["groupId"], hostname, port)
+    if hostData is None:
+        hostData = opsMgrConnector.getHostByHostnameAndPort(cluster["groupId"], hostname, port)
+    logging.debug("Received host data %s", LazyJson(hostData))
 
     hostType = hostData["typeName"]
     hostStatus = "RECOVERING" if hostType == "RECOVERING" else ( "DOWN/NO RECENT PING" if hostType == "NO_DATA" else "HEALTHY")
@@ -170,19 +177,15 @@ def getRowDataForProcess(cluster, group, process, automationConfig):
     processType = "SECONDARY" if hostType == "RECOVERING" else hostType
 
     # Get Databases for host
-    dbsSeen = []
-    pageNum = 0
-    dbsOnHost = opsMgrConnector.getDatabasesForHost(cluster["groupId"], hostData["id"], pageNum)
-    while len(dbsSeen) < dbsOnHost["totalCount"]:
-        logging.debug("Examining page {} of db results; there are a total of {} dbs".format(pageNum, dbsOnHost["totalCount"]))
-        dbsSeen.extend([ db["databaseName"] for db in dbsOnHost["results"]])
-        pageNum += 1
-        dbsOnHost = opsMgrConnector.getDatabasesForHost(cluster["groupId"], hostData["id"], pageNum)
+    dbsSeen = [ db["databaseName"] for db in opsMgrConnector.iterDatabasesForHost(cluster["groupId"], hostData["id"]) ]
+    logging.debug("Found {} dbs on host {}".format(len(dbsSeen), hostData["id"]))
 
-    dbsSeen.add("admin")
+    if "admin" not in dbsSeen:
+        dbsSeen.append("admin")
 
-    # TODO -- need to add for sharded cluster
-    clusterName = cluster["replicaSetName"] if "replicaSetName" in cluster else cluster["clusterName"]
+    clusterName = topology.getClusterNameForProcess(process["name"])
+    if clusterName is None:
+        clusterName = cluster["replicaSetName"] if "replicaSetName" in cluster else cluster["clusterName"]
 
     # Create Row Data
     rows = []
@@ -206,32 +209,16 @@ def getRowDataForProcess(cluster, group, process, automationConfig):
     return rows
 
 
-def getProcessesForCluster(cluster, automationConfig=None):
+def getProcessesForCluster(cluster, topology):
     """
     Get Processes for Cluster
 
-    :param cluster:
-    :param automationConfig:
-    :return:
+    :param cluster:     A cluster document of the group
+    :param topology:    The TopologyIndex of the automation config of the group
+    :return:            The process documents of the replica set, shard, config servers or whole sharded cluster
     """
     logging.debug("Getting processes for cluster with name " + cluster["clusterName"])
-    processes = []
-
-
-    replicaSetFound = False
-    if "replicaSetName" in cluster:
-        for replicaSet in automationConfig["replicaSets"]:
-            if replicaSet["_id"] == cluster["replicaSetName"]:
-                replicaSetFound = True
-                members = [ member["host"] for member in replicaSet["members"] ]
-                processes = [ process for process in automationConfig["processes"] if process["name"] in members]
-
-    # TODO -- finish this for sharding
-    # if not replicaSetFound:
-    #     for shardedCluster in automationConfig["shardedClusters"]:
-    #         if shardedCluster["_id"] == cluster["name"]:
-
-    return processes
+    return topology.getProcessesForCluster(cluster)
 
 
 def writeDataToFile(fileName, data):
@@ -280,8 +267,11 @@ def setupArgs():
 
     parser.add_argument('--fileName',                 required=False, action="store", dest='fileName',          default=None,                 help='Path of the file to write to; if not used, will write to standard out')
     parser.add_argument('--loglevel',                 required=False, action="store", dest='logLevel',                default='info',                 help='Log level. Possible values are [none, info, verbose]')
+    parser.add_argument('--cacheFile',                required=False, action="store", dest='cacheFile',               default=None,                 help='Path of a file in which to cache slow changing ops manager metadata between runs; caching is off if not used')
+    parser.add_argument('--refresh',                  required=False, action="store_true", dest='refresh',            default=False,                help='Include flag to refetch all cached metadata')
+    parser.add_argument('--metricsFile',              required=False, action="store", dest='metricsFile',             default=None,                 help='Path of a file to which to write per endpoint API call metrics on exit; off if not used')
+    parser.add_argument('--metricsFormat',            required=False, action="store", dest='metricsFormat',           default='json',               help='Format of the API call metrics. One of [json, prometheus]')
 
-    # TODO Command line arg for update/refresh
     return parser.parse_args()
 
 def _configureLogger(logLevel):
@@ -341,8 +331,16 @@ def main():
     # checkOsCompatibility()
 
     # Get Ops Manager connection
+    responseCache = None
+    if args.cacheFile is not None:
+        responseCache = ResponseCache(args.cacheFile, refresh=args.refresh)
     global opsMgrConnector
-    opsMgrConnector = OpsMgrConnector(args.opsMgrUri, args.opsMgrApiUser, args.opsMgrApiKey)
+    opsMgrConnector = OpsMgrConnector(args.opsMgrUri, args.opsMgrApiUser, args.opsMgrApiKey, responseCache=responseCache)
+    if args.metricsFile is not None:
+        opsMgrConnector.getApiMetrics().dumpOnExit(args.metricsFile, args.metricsFormat)
+
+    global hostIndex
+    hostIndex = ProjectHostIndex(opsMgrConnector)
 
     config = {
         "projectAppEnv"  : args.projectAppEnv,
@@ -351,6 +349,11 @@ def main():
         "projectName" : args.projectName
     }
     auditData = collectAuditData(config)
+    logging.info("Ops Manager connection stats: {}".format(opsMgrConnector.getConnectionStats()))
+    opsMgrConnector.close()
+    if responseCache is not None:
+        logging.info("Response cache stats: {}".format(responseCache.getStats()))
+        responseCache.close()
 
     if args.fileName is None:
         print(auditData)
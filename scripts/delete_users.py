@@ -4,246 +4,138 @@ import sys
 
 sys.path.append('.')
 import os
+import csv
 import logging
 import subprocess
 import argparse
-import json
-import string
-from getpass import getpass
 
-from mdbaas.opsmgrutil import OpsMgrConnector
+from mdbaas.opsmgrutil import OpsMgrConnector, AutomationConfig, BulkAutomationUpdater
+from mdbaas.opsmgrutil.bulkautomation import BulkUpdateStatus, formatSummary, DEFAULT_CONFLICT_RETRIES, \
+    DEFAULT_GOAL_STATE_TIMEOUT
+from mdbaas.util import DEFAULT_CRAWL_WORKERS
 
 # Script metadata
-version = "1.0.0"
-revdate = "05-13-2024"
-scriptName = "setpassword"
+version = "1.1.0"
+revdate = "10-18-2026"
+scriptName = "delete_users"
 scriptNameFull = scriptName + ".py"
 completionStr = "\n====================================================================\n                      Completed " + scriptName + "!!!!              \n ====================================================================\n"
 
-BYTES_IN_GB = 1024 * 1024 * 1024
-SECONDS_IN_HOUR = 60 * 60
-APPLICATION_ENVS = ["PROD", "UAT", "DEV"]
+DEFAULT_USER_DB = "admin"
+
+# Column names of the csv file of users to remove across projects
+CSV_PROJECT_ID_COLUMN   = "projectId"
+CSV_USER_NAME_COLUMN    = "userName"
+CSV_DB_NAME_COLUMN      = "dbName"
+
+# Outcomes of a project whose automation config was written without its users
+WRITTEN_STATUSES = [ BulkUpdateStatus.CONVERGED, BulkUpdateStatus.APPLIED, BulkUpdateStatus.TIMED_OUT ]
 
 
 ########################################################################################################################
-# Password Rules
+# Main Substantive Methods
 ########################################################################################################################
 
-class PasswordRule():
-
-    def __init__(self):
-        self.name = "PasswordRule"
-        self.desc = "Generic abstract password rule"
-
-    def validate(self, password):
-        return {"passed": False}
-
-
-class LongPasswordRule():
-
-    def __init__(self, numChars):
-        super().__init__()
-        self.name = "LongPasswordRule"
-        self.numChars = numChars
-        self.desc = "Password must be at least {} chars long".format(self.numChars)
-        self.validationErrMsg = "{} rule failed: Password must be at least {} chars long".format(self.name,
-                                                                                                 self.numChars)
-
-    def validate(self, password):
-        logging.debug(f'Attempting to validate password according to rule {self.name}')
-        resp = {
-            "passed": len(password) >= self.numChars
-        }
-        return resp
-
-
-class UppercaseCharPasswordRule():
-
-    def __init__(self, numCharsMustSatisfyRule):
-        super().__init__()
-        self.name = "UppercaseCharPasswordRule"
-        self.numCharsMustSatisfyRule = numCharsMustSatisfyRule
-        self.desc = "Password should have at least {} chars that are uppercase".format(self.numCharsMustSatisfyRule)
-        self.validationErrMsg = "{} rule failed: Password should have at least {} chars that are uppercase".format(
-            self.name,
-            self.numCharsMustSatisfyRule)
-
-    def validate(self, password):
-        logging.debug(f'Attempting to validate password according to sub-rule {self.name}')
-        uppercaseChars = ''.join(c for c in password if c.isupper())
-        resp = {
-            "passed": len(uppercaseChars) >= self.numCharsMustSatisfyRule
-        }
-        return resp
-
-
-class LowercaseCharPasswordRule():
-
-    def __init__(self, numCharsMustSatisfyRule):
-        super().__init__()
-        self.name = "LowercaseCharPasswordRule"
-        self.numCharsMustSatisfyRule = numCharsMustSatisfyRule
-        self.desc = "Password should have at least {} chars that are lowercase".format(self.numCharsMustSatisfyRule)
-        self.validationErrMsg = "{} rule failed: Password should have at least {} chars that are lowercase".format(
-            self.name,
-            self.numCharsMustSatisfyRule)
-
-    def validate(self, password):
-        logging.debug(f'Attempting to validate password according to sub-rule {self.name}')
-        lowercaseChars = ''.join(c for c in password if c.islower())
-        resp = {
-            "passed": len(lowercaseChars) >= self.numCharsMustSatisfyRule
-        }
-        return resp
-
-
-class SpecialCharPasswordRule():
-
-    def __init__(self, numCharsMustSatisfyRule):
-        super().__init__()
-        self.name = "SpecialCharPasswordRule"
-        self.numCharsMustSatisfyRule = numCharsMustSatisfyRule
-        self.specialChars = ['$', '#', '@', '%', '!', '&']
-        self.desc = "Password should have at least {} special characters ({})".format(self.numCharsMustSatisfyRule,
-                                                                                      self.specialChars)
-        self.validationErrMsg = "{} rule failed: Password should have at least {} special characters ({})".format(
-            self.name,
-            self.numCharsMustSatisfyRule,
-            self.specialChars)
-
-    def validate(self, password):
-        logging.debug(f'Attempting to validate password according to sub-rule {self.name}')
-        specialChars = ''.join(c for c in password if c in self.specialChars)
-        resp = {
-            "passed": len(specialChars) >= self.numCharsMustSatisfyRule
-        }
-        return resp
-
-
-class AlphaNumericCharPasswordRule():
-
-    def __init__(self, numCharsMustSatisfyRule):
-        super().__init__()
-        self.name = "AlphanumericCharPasswordRule"
-        self.numCharsMustSatisfyRule = numCharsMustSatisfyRule
-        self.desc = "Password should have at least {} alphanumeric characters".format(self.numCharsMustSatisfyRule)
-        self.validationErrMsg = "{} rule failed: Password should have at least {} alphanumeric characters".format(
-            self.name,
-            self.numCharsMustSatisfyRule)
-
-    def validate(self, password):
-        logging.debug(f'Attempting to validate password according to sub-rule {self.name}')
-        alphabeticalChars = ''.join(c for c in password if c in string.ascii_letters)
-        numericalChars = ''.join(c for c in password if c in string.digits)
-        resp = {
-            "passed": (len(alphabeticalChars) >= self.numCharsMustSatisfyRule and len(
-                numericalChars) >= self.numCharsMustSatisfyRule)
-        }
-        return resp
-
-
-class CharacterCategoriesPasswordRule():
-
-    def __init__(self, numSubRulesMet):
-        super().__init__()
-        self.name = "CharacterCategoriesPasswordRule"
-        self.numSubRulesMet = numSubRulesMet
-        self.subRules = [
-            UppercaseCharPasswordRule(1),
-            LowercaseCharPasswordRule(1),
-            SpecialCharPasswordRule(1),
-            AlphaNumericCharPasswordRule(1)
-        ]
-        self.desc = "Password must meet at least {}  of the following subrules: {} ".format(self.numSubRulesMet,
-                                                                                            [r.name for r in
-                                                                                             self.subRules])
-        self.validationErrMsg = "{} rule failed: Password must meet at least {}  of the following subrules: {}".format(
-            self.name,
-            self.numSubRulesMet, [r.name for r in self.subRules])
-
-    def validate(self, password):
-        logging.debug(f'Attempting to validate password according to rule {self.name}')
-        numCategoriesWhereCriteriaSatisfied = 0
-        subRulesPassedMap = {}
-        for subrule in self.subRules:
-            subRuleResp = subrule.validate(password)
-            subRulesPassedMap[subrule.name] = subRuleResp["passed"]
-            numCategoriesWhereCriteriaSatisfied += 1 if subRuleResp["passed"] else 0
-        resp = {
-            "passed": numCategoriesWhereCriteriaSatisfied >= self.numSubRulesMet,
-            "subRulesMap": subRulesPassedMap
-        }
-        return resp
-
-
-def captureAndValidatePassword(passwordRules, userName):
+def parseUser(userStr):
+    """
+    Parse User
+
+    Parses a user given explicitly as user@db. User names may themselves contain @, e.g. alice@example.com@admin, so
+    the db is whatever follows the last @. Names without a db are rejected rather than guessed at; they belong in
+    --users with --dbName.
+
+    :param userStr:     A user given as user@db
+    :return:            A (userName, dbName) tuple
+    """
+    userName, _, dbName = userStr.rpartition("@")
+    if not userName or not dbName:
+        raise argparse.ArgumentTypeError("{} is not of the form user@db".format(userStr))
+    return (userName, dbName)
+
+
+def readUsersFile(fileName):
     """
-    Capture and Validate Password
+    Read Users File
 
-    :return:
+    Reads the users to remove from a csv file with a header row naming the projectId, userName and, optionally,
+    dbName columns. Users without a dbName are taken from the admin database.
+
+    :param fileName:    The path of the csv file
+    :return:            An array of (projectId, userName, dbName) tuples
     """
-    passwordValid = False
-    enteredPass = None
-    while not passwordValid:
-        # enteredPass = input(f'Please enter the password for user {userName}')
-        enteredPass = getpass(f'Please enter the password for user {userName}')
-
-        passwordValid = True
-
-        # Must be 16+ chars, at least one char from 3+ of the following categories
-        # 1) Uppercase
-        # 2) Lowercase
-        # 3) Alphanumeric
-        # 4) Special chars
-        for rule in passwordRules:
-            ruleValidationResp = rule.validate(enteredPass)
-            passedRule = ruleValidationResp["passed"]
-            passwordValid = passwordValid and passedRule
-            if not passedRule:
-                print(rule.validationErrMsg)
-                if "subRulesMap" in ruleValidationResp:
-                    print("Sub-rule details: {}".format(json.dumps(
-                        ruleValidationResp["subRulesMap"], indent=4
-                    )))
-                break
-
-        if not passwordValid:
-            print("Please enter a new password...")
-
-    print("Password passed all checks")
-    return enteredPass
-
-
-def capturePassword():
+    users = []
+    with open(fileName, newline="") as file:
+        for row in csv.DictReader(file):
+            projectId = (row.get(CSV_PROJECT_ID_COLUMN) or "").strip()
+            userName = (row.get(CSV_USER_NAME_COLUMN) or "").strip()
+            if not projectId or not userName:
+                logging.warning("Ignoring incomplete row {}".format(row))
+                continue
+            users.append((projectId, userName, (row.get(CSV_DB_NAME_COLUMN) or "").strip() or DEFAULT_USER_DB))
+    return users
+
+
+def groupUsersByProject(users):
     """
-    Capture and Validate Password
+    Group Users By Project
 
-    :return:
+    :param users:   An array of (projectId, userName, dbName) tuples
+    :return:        A document mapping each projectId to an array of its (userName, dbName) tuples, without duplicates
+                    and in the order given
     """
-    enteredPass = getpass(f'Please enter the password for automation agent')
-    return enteredPass
+    usersByProject = {}
+    for projectId, userName, dbName in users:
+        usersByProject.setdefault(projectId, {})[(userName, dbName)] = None
+    return { projectId : list(projectUsers) for projectId, projectUsers in usersByProject.items() }
+
 
-def setPassword(projectId, newPass):
+def deleteUsersInProjects(usersByProject, args):
     """
+    Delete Users In Projects
 
-    :param projectId:
-    :param userName:
-    :param dbName:
-    :param newPass:
-    :param omUrl:
-    :return:
+    Removes users from one or many projects at once, with a single automation config write and therefore a single
+    deploy per project however many of its users are removed
+
+    :param usersByProject:  A document mapping each projectId to an array of its (userName, dbName) tuples
+    :param args:            The parsed command line arguments with the update settings
+    :return:                The summary document of the BulkAutomationUpdater
     """
-    logging.info("Setting password for automation agent user")
+    logging.info("Removing {} users from {} projects".format(sum(len(users) for users in usersByProject.values()),
+                                                             len(usersByProject)))
     global opsMgrConnector
 
-    # Get the existing user
-    automationConfig = opsMgrConnector.getAutomationConfig(projectId, verifyBool=False)
-    auth = automationConfig["auth"]
-    auth["newAutoPwd"] = newPass
+    removedByProject = {}
+    def modify(automationConfig):
+        users = usersByProject[automationConfig.groupId]
+        removed = automationConfig.removeUsers(users)
+        removedByProject[automationConfig.groupId] = removed
+        if not removed:
+            return False
+        if args.dryRun:
+            logging.info("DRY-RUN: Would remove users {} from project {}".format(removed, automationConfig.groupId))
+            return False
+
+    updater = BulkAutomationUpdater(opsMgrConnector, maxInFlight=args.maxInFlight,
+                                    maxConflictRetries=args.maxConflictRetries, waitForGoalState=not args.noWait,
+                                    goalStateTimeout=args.goalStateTimeout, verifyBool=False)
+    summary = updater.run(list(usersByProject.keys()), modify)
+
+    for projectId, users in usersByProject.items():
+        removed = removedByProject.get(projectId, [])
+        notFound = [ user for user in users if user not in removed ]
+        if notFound:
+            logging.info("Could not find users {} in project {}".format(notFound, projectId))
+    # Only the projects whose config was written lost their users; a dry run writes none
+    removedByProject = { result["groupId"] : removedByProject.get(result["groupId"], [])
+                         for result in summary["results"] if args.dryRun or result["status"] in WRITTEN_STATUSES }
+    summaryStr = formatSummary(summary)
+    print(summaryStr)
+    print("{} {} users from {} projects".format("Would remove" if args.dryRun else "Removed",
+                                                sum(len(removed) for removed in removedByProject.values()),
+                                                len([ removed for removed in removedByProject.values() if removed ])))
+    logging.info(summaryStr)
+    return summary
 
-    # TODO -- wait until automation complete
-    resp = opsMgrConnector.putAutomationConfig(projectId, automationConfig, verifyBool=False)
-    logging.info("Got response: {}".format(json.dumps(resp, indent=4)))
 
 ########################################################################################################################
 # Base Methods
@@ -269,7 +161,7 @@ def setupArgs():
     Setup args
     Parses all command line arguments to the script
     """
-    parser = argparse.ArgumentParser(description='Conducts a health check on the specified host')
+    parser = argparse.ArgumentParser(description='Removes database users from one or many projects')
     parser.add_argument('--opsmgrUri', required=False, action="store", dest='opsMgrUri', default='http:127.0.0.1:8080/',
                         help='The uri of the ops manager instance under which this server will be managed.')
     parser.add_argument('--opsmgrapiuser', required=False, action="store", dest='opsMgrApiUser', default='',
@@ -277,19 +169,32 @@ def setupArgs():
     parser.add_argument('--opsmgrapikey', required=False, action="store", dest='opsMgrApiKey', default='',
                         help='The api key for the designated ops manager instance')
 
-    parser.add_argument('--projectName', required=False, action="store", dest='projectName', default=None,
-                        help='The full name of the project.')
     parser.add_argument('--projectId', required=False, action="store", dest='projectId', default=None,
-                        help='The id of the project in ops manager.')
-    # parser.add_argument('--projectAppName',           required=False, action="store", dest='projectAppName',    default=None,                help='The Application pneumonic.')
-    # parser.add_argument('--projectAppEnv',            required=False, action="store", dest='projectAppEnv',     default=None,                help='The application environment. One of ' + APPLICATION_ENVS.__str__() )
+                        help='The id of the project in ops manager to remove the users from.')
+    parser.add_argument('--userName', required=False, action="store", dest='userName', default=None,
+                        help='The user to remove from the project.')
+    parser.add_argument('--dbName', required=False, action="store", dest='dbName', default=DEFAULT_USER_DB,
+                        help='Name of the db to which the user belongs')
+    parser.add_argument('--users', required=False, action="store", dest='users', nargs="+", default=None,
+                        help='The users to remove from the project, all of the db given by --dbName. Names are taken as given, including any @.')
+    parser.add_argument('--usersWithDb', required=False, action="store", dest='usersWithDb', nargs="+", default=None,
+                        type=parseUser, help='The users to remove from the project, each as user@db; the db is whatever follows the last @.')
+    parser.add_argument('--usersFile', required=False, action="store", dest='usersFile', default=None,
+                        help='A csv file with projectId, userName and dbName columns listing the users to remove across projects.')
+
+    parser.add_argument('--maxInFlight', required=False, action="store", dest='maxInFlight', default=DEFAULT_CRAWL_WORKERS, type=int,
+                        help='The maximum number of projects to update at the same time.')
+    parser.add_argument('--maxConflictRetries', required=False, action="store", dest='maxConflictRetries', default=DEFAULT_CONFLICT_RETRIES, type=int,
+                        help='The number of times to retry a project whose automation config was modified concurrently.')
+    parser.add_argument('--goalStateTimeout', required=False, action="store", dest='goalStateTimeout', default=DEFAULT_GOAL_STATE_TIMEOUT, type=int,
+                        help='The number of seconds to wait for all projects to reach their goal state.')
+    parser.add_argument('--noWait', required=False, action="store_true", dest='noWait', default=False,
+                        help='Do not wait for the projects to reach their goal state.')
 
     parser.add_argument('--dryRun', required=False, action="store_true", dest='dryRun', default=False,
-                        help='Include this flag to test out the password without actually creating it.')
+                        help='Include this flag to list the users that would be removed without removing them.')
     parser.add_argument('--loglevel', required=False, action="store", dest='logLevel', default='info',
                         help='Log level. Possible values are [none, info, verbose]')
-
-    # TODO Command line arg for update/refresh
     return parser.parse_args()
 
 
@@ -354,25 +259,29 @@ def main():
 
     # Get Ops Manager connection
     global opsMgrConnector
-    opsMgrConnector = OpsMgrConnector(args.opsMgrUri, args.opsMgrApiUser, args.opsMgrApiKey)
-
-    config = {
-        # "projectAppEnv"  : args.projectAppEnv,
-        # "projectAppName" : args.projectAppName,
-        "projectId": args.projectId,
-        "projectName": args.projectName
-    }
-
-
-    validatedPass = capturePassword()
-    dryRun = False if args.dryRun is None else args.dryRun
-    if not dryRun:
-        logging.info("Setting automation agent password")
-        setPassword(args.projectId, validatedPass)
-    else:
-        logging.info("DRY-RUN: Not Setting Password...")
+    opsMgrConnector = OpsMgrConnector(args.opsMgrUri, args.opsMgrApiUser, args.opsMgrApiKey,
+                                      poolMaxSize=args.maxInFlight, maxInFlight=args.maxInFlight)
+
+    users = []
+    if args.usersFile is not None:
+        users.extend(readUsersFile(args.usersFile))
+    if args.projectId is not None:
+        if args.userName is not None:
+            users.append((args.projectId, args.userName, args.dbName))
+        for userName in args.users or []:
+            users.append((args.projectId, userName, args.dbName))
+        for userName, dbName in args.usersWithDb or []:
+            users.append((args.projectId, userName, dbName))
+    if not users:
+        print("No users to remove; specify --projectId with --userName, --users or --usersWithDb, or --usersFile")
+        sys.exit(1)
+
+    summary = deleteUsersInProjects(groupUsersByProject(users), args)
+    if summary["failed"] > 0:
+        sys.exit(1)
+    print(completionStr)
 
 
 # -------------------------------
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -4,13 +4,15 @@ import platform
 import sys
 sys.path.append('.')
 import os
+import time
 import logging
 import subprocess
 import argparse
 import json
 from prettytable import PrettyTable
 
-from mdbaas.opsmgrutil import OpsMgrConnector
+from mdbaas.opsmgrutil import OpsMgrConnector, ProjectHostIndex, MeasurementPlanner
+from mdbaas.util import FleetCrawler, ResponseCache, MeasurementSet, TimeSeriesStore, LazyJson, DEFAULT_CRAWL_WORKERS
 
 # Script metadata
 version         = "1.0.0"
@@ -19,6 +21,8 @@ scriptName      = "get_storage_data"
 scriptNameFull  = scriptName + ".py"
 completionStr   = "\n====================================================================\n                      Completed " + scriptName + "!!!!              \n ====================================================================\n"
 
+# Number of hosts whose measurement requests are planned and sent together
+MEASUREMENT_BATCH_HOSTS = 100
 
 BYTES_IN_GB = 1024*1024*1024
 VALID_SCALES = {
@@ -61,6 +65,9 @@ SECONDS_IN_HOUR = 60*60
 APPLICATION_ENVS = [ "PROD", "UAT", "DEV"]
 
 verifyCerts = True
+crawler = None
+hostIndex = None
+timeSeriesStore = None
 
 ########################################################################################################################
 # Base Methods
@@ -81,11 +88,7 @@ def collect_storage_data(destFileName, scale="BYTES"):
 
     metricScale = SCALE_MAP[VALID_SCALES.get(scale)]
 
-    allGroups = opsMgrConnector.getAllGroups(verifyBool=verifyCerts)
-    storageData = []
-    for group in allGroups["results"]:
-        storageDataForGroup = collect_storage_data_for_group(group)
-        storageData.extend(storageDataForGroup)
+    storageData = crawl_storage_data(opsMgrConnector.iterGroups(verifyBool=verifyCerts))
 
 
     # storageData = get_mock_data()
@@ -146,85 +149,133 @@ def collect_storage_data(destFileName, scale="BYTES"):
 #         # If they are equal, we should consider the next column for sorting
 #     return -1
 
-def collect_storage_data_for_group(group):
+def crawl_storage_data(groups):
     """
-    Collect Storage Data For Group
+    Crawl Storage Data
 
-    :param groupId:
-    :return:
+    Walks groups -> clusters -> hosts -> host measurements one level at a time, fetching every item of a level
+    in parallel. The records come back in the same order as a serial walk of the same groups.
+
+    The measurements are fetched MEASUREMENT_BATCH_HOSTS hosts at a time: the requests of every host of a batch are
+    added to one shared MeasurementPlanner, which sends them over the same crawler, then the records of the batch
+    are built from the results.
+
+    :param groups:  An iterable of group documents
+    :return:        An array of storage data records, one per host
+    """
+    groupClusters = crawler.flatMap(collect_clusters_for_group, groups)
+    clusterHosts = crawler.flatMap(lambda groupCluster: collect_hosts_for_cluster(*groupCluster), groupClusters)
+
+    # Every window of the run ends at the same now, which the time series store also trims its series to
+    now = int(time.time())
+    planner = MeasurementPlanner(opsMgrConnector, verifyBool=verifyCerts, end=now if timeSeriesStore is not None else None,
+                                 crawler=crawler)
+    storageData = []
+    for batchStart in range(0, len(clusterHosts), MEASUREMENT_BATCH_HOSTS):
+        batch = clusterHosts[batchStart:batchStart + MEASUREMENT_BATCH_HOSTS]
+        hostPlans = crawler.map(lambda clusterHost: plan_storage_requests_for_host(planner, now, *clusterHost), batch)
+        planner.execute()
+        storageData.extend(crawler.map(lambda hostPlan: collect_storage_data_for_host(now, *hostPlan), hostPlans))
+    return storageData
+
+def collect_clusters_for_group(group):
+    """
+    Collect Clusters For Group
+
+    :param group:
+    :return:        An array of (group, cluster) tuples
     """
     groupId = group["id"]
     logging.info("Found group with id {}".format(groupId))
-    logging.debug("Found group: {}".format(json.dumps(group, indent=4)))
-
-    storageDataForGroup = []
+    logging.debug("Found group: %s", LazyJson(group))
 
     # Get each cluster in this project
     clusterForProject = opsMgrConnector.getClustersForGroup(group["id"], verifyBool=verifyCerts)
-    for cluster in clusterForProject["results"]:
-        storageDataForCluster = collect_storage_data_for_cluster(group, cluster)
-        storageDataForGroup.extend(storageDataForCluster)
+    return [ (group, cluster) for cluster in clusterForProject["results"] ]
 
-    return storageDataForGroup
-
-def collect_storage_data_for_cluster(group, cluster):
+def collect_hosts_for_cluster(group, cluster):
     """
-    Collect Storage Data for Cluster
+    Collect Hosts for Cluster
 
+    :param group:
     :param cluster:
-    :return:
+    :return:        An array of (group, cluster, host) tuples
     """
     clusterId = cluster["id"]
     logging.info("Found cluster with id {}".format(clusterId))
-    logging.debug("Found cluster: {}".format(json.dumps(cluster, indent=4)))
-
-    storageDataForCluster = []
+    logging.debug("Found cluster: %s", LazyJson(cluster))
 
     # Get each host in this cluster
-    hostsForProject = opsMgrConnector.getHosts(cluster["groupId"], verifyBool=verifyCerts)
-    for host in hostsForProject["results"]:
-        if host["clusterId"] == clusterId:
-            storageDataForHost = collect_storage_data_for_host(group, cluster, host)
-            storageDataForCluster.append(storageDataForHost)
+    hostsForCluster = hostIndex.getHostsForCluster(cluster["groupId"], clusterId)
+    return [ (group, cluster, host) for host in hostsForCluster ]
+
+
+DISK_MEASUREMENT_NAMES = [
+    "DISK_PARTITION_SPACE_FREE",
+    "DISK_PARTITION_SPACE_PERCENT_FREE",
+    "DISK_PARTITION_SPACE_USED",
+    "DISK_PARTITION_SPACE_PERCENT_USED"
+]
 
-    return storageDataForCluster
+STORAGE_MEASUREMENT_NAMES = [
+    "DB_DATA_SIZE_TOTAL",
+    "DB_STORAGE_TOTAL",
+    "DB_INDEX_SIZE_TOTAL"
+]
 
+def plan_storage_requests_for_host(planner, now, group, cluster, host):
+    """
+    Plan Storage Requests For Host
+
+    Adds the disk and host measurement requests of a host to the shared planner
+
+    :param planner: The MeasurementPlanner of the batch the host belongs to
+    :param now:     The epoch timestamp the measurement windows end at
+    :param group:
+    :param cluster:
+    :param host:
+    :return:        A (group, cluster, host, diskRequests, hostRequest) tuple, where diskRequests is an array of
+                    (diskKey, MeasurementRequest) tuples
+    """
+    disks = opsMgrConnector.getDiskPartitionName(host["groupId"], host["id"], verifyBool=verifyCerts)
 
-def collect_storage_data_for_host(group, cluster, host):
+    diskRequests = []
+    for disk in disks["results"]:
+        diskKey = ("disks", host["groupId"], host["id"], disk["partitionName"])
+        diskRequests.append((diskKey, planner.addDiskRequest(
+            host["groupId"], host["id"], disk["partitionName"], DISK_MEASUREMENT_NAMES, "PT1H",
+            get_fetch_period(diskKey, DISK_MEASUREMENT_NAMES, "PT1H", "P30D", now)
+        )))
+    hostKey = ("hosts", host["groupId"], host["id"])
+    hostRequest = planner.addHostRequest(host["groupId"], host["id"], STORAGE_MEASUREMENT_NAMES, "PT1H",
+                                         get_fetch_period(hostKey, STORAGE_MEASUREMENT_NAMES, "PT1H", "P30D", now))
+    return (group, cluster, host, diskRequests, hostRequest)
+
+def collect_storage_data_for_host(now, group, cluster, host, diskRequests, hostRequest):
     """
     Collect Storage Data For Host
 
+    :param now:             The epoch timestamp the measurement windows end at
+    :param group:
+    :param cluster:
     :param host:
+    :param diskRequests:    The executed (diskKey, MeasurementRequest) tuples of the host
+    :param hostRequest:     The executed host MeasurementRequest of the host
     :return:
     """
-    diskMeasurementNames = [
-        "DISK_PARTITION_SPACE_FREE",
-        "DISK_PARTITION_SPACE_PERCENT_FREE",
-        "DISK_PARTITION_SPACE_USED",
-        "DISK_PARTITION_SPACE_PERCENT_USED"
-    ]
-    disks = opsMgrConnector.getDiskPartitionName(host["groupId"], host["id"], verifyBool=verifyCerts)
+    hostKey = ("hosts", host["groupId"], host["id"])
 
     disk_measurement_data = None
-    for disk in disks["results"]:
-        diskMeaurementsForPartition = opsMgrConnector.getDiskPartitionMeasurementOverPeriodForHost(
-            host["groupId"], host["id"], disk["partitionName"], "PT1H", "P30D", diskMeasurementNames, verifyBool=verifyCerts
-        )
+    for diskKey, diskRequest in diskRequests:
+        diskMeaurementsForPartition = get_measurements_over_period(diskKey, DISK_MEASUREMENT_NAMES, "P30D",
+                                                                   diskRequest.getResult(), now)
         disk_measurement_data = diskMeaurementsForPartition
 
-    validDiskMeasurements = get_valid_nonnull_measurement(disk_measurement_data, diskMeasurementNames)
-
-    storageMeasurements = [
-        "DB_DATA_SIZE_TOTAL",
-        "DB_STORAGE_TOTAL",
-        "DB_INDEX_SIZE_TOTAL"
-    ]
+    validDiskMeasurements = get_valid_nonnull_measurement(disk_measurement_data, DISK_MEASUREMENT_NAMES)
 
-    host_measurement_data = opsMgrConnector.getMeasurementsOverPeriodForHost(
-        host["groupId"], host["id"], "PT1H", "P30D", storageMeasurements, verifyBool=verifyCerts
-    )
+    host_measurement_data = get_measurements_over_period(hostKey, STORAGE_MEASUREMENT_NAMES, "P30D", hostRequest.getResult(), now)
 
-    validMeasurement = get_valid_nonnull_measurement(host_measurement_data, storageMeasurements)
+    validMeasurement = get_valid_nonnull_measurement(host_measurement_data, STORAGE_MEASUREMENT_NAMES)
 
     cluster_name = cluster["clusterName"]
     if cluster["typeName"] == "REPLICA_SET":
@@ -319,44 +370,49 @@ def get_mock_data():
     return data
 
 
-def get_valid_nonnull_measurement(measurements_data, measurement_names):
+def get_fetch_period(key, measurement_names, granularity, period, now):
     """
-    Get Valid Non-null Measurements
+    Get Fetch Period
 
-    :param measurements_data:
+    :param key:                 A tuple identifying the host or disk the measurements belong to
     :param measurement_names:
-    :return:
+    :param granularity:
+    :param period:
+    :param now:                 The epoch timestamp of the end of the period
+    :return:                    The period to fetch: only the time since the previous run when the local time series
+                                store is configured, otherwise the whole period
     """
-    # Get minimum length of data points among all of the measurements in question
-    endIndex = 10000000
-    for measurement in measurements_data["measurements"]:
-        if measurement["name"] in measurement_names:
-            endIndex = min(endIndex, len(measurement["dataPoints"]))
-
-    # Construct Default Measurement
-    valid_measurement = { }
-    for name in measurement_names:
-        valid_measurement[name] = None
+    if timeSeriesStore is None:
+        return period
+    return timeSeriesStore.getFetchPeriod(key, measurement_names, granularity, period, now)
 
-    # Find valid measurement
-    for i in sorted(range(0, endIndex), reverse=True):
+def get_measurements_over_period(key, measurement_names, period, measurements_data, now):
+    """
+    Get Measurements Over Period
 
-        # Construct measurement at index i
-        measurementAtIndex = { }
-        for name in measurement_names:
-            for measurement in measurements_data["measurements"]:
-                if measurement["name"] == name:
-                    measurementAtIndex[name] = measurement["dataPoints"][i]["value"]
+    Merges the fetched measurements into the local time series store when one is configured and returns the
+    stored measurements over the whole period; otherwise returns the fetched measurements as they are
 
-        # Check if valid
-        isValid = True
-        for name in measurement_names:
-            isValid = isValid and measurementAtIndex[name] is not None
+    :param key:                 A tuple identifying the host or disk the measurements belong to
+    :param measurement_names:
+    :param period:
+    :param measurements_data:   The measurements fetched over the period returned by get_fetch_period
+    :param now:                 The epoch timestamp of the end of the period
+    :return:
+    """
+    if timeSeriesStore is None:
+        return measurements_data
+    return timeSeriesStore.update(key, measurement_names, period, measurements_data, now)
 
-        if isValid:
-            return measurementAtIndex
+def get_valid_nonnull_measurement(measurements_data, measurement_names):
+    """
+    Get Valid Non-null Measurements
 
-    return valid_measurement
+    :param measurements_data:
+    :param measurement_names:
+    :return:
+    """
+    return MeasurementSet(measurements_data).latestNonNullSample(measurement_names)
 
 
 def shouldSkipOpsMgrProject(scriptConfig, groupData):
@@ -397,151 +453,6 @@ def shouldSkipOpsMgrProject(scriptConfig, groupData):
     return True
 
 
-class RowData():
-    """
-    Row Data
-    """
-    def setProjectName(self, name):
-        self.name = name
-
-    def setProjectId(self, id):
-        self.projectId = id
-
-    def setClusterName(self, clusterName):
-        self.clusterName = clusterName
-
-    def setClusterHost(self, clusterHost):
-        self.clusterHost = clusterHost
-
-    def setMDBVersion(self, version):
-        self.version = version
-
-    def setDB(self, dbName):
-        self.dbName = dbName
-
-    def setStatus(self, status):
-        self.status = status
-
-    def setOpenMode(self, openMode):
-        self.openMode = openMode
-
-    def getRowStr(self):
-        return "{},{},{},{},{},{}".format(self.clusterHost, self.clusterName, self.version, self.dbName, self.status, self.openMode)
-
-
-def getRowDataForGroup(group):
-    """
-    Get Row Data for Group
-
-    :param group:
-    :return:
-    """
-    clusters = opsMgrConnector.getClustersForGroup(group["id"], verifyBool=verifyCerts)
-    automationConfigForGroup = opsMgrConnector.getAutomationConfig(group["id"], verifyBool=verifyCerts)
-    rowData = []
-    for cluster in clusters["results"]:
-        rowData.extend(getRowDataForCluster(cluster, group, automationConfigForGroup))
-    return rowData
-
-
-def getRowDataForCluster(cluster, group, automationConfig=None):
-    logging.debug("Getting data for cluster " + cluster["clusterName"])
-    if automationConfig is None:
-        automationConfig = opsMgrConnector.getAutomationConfig(cluster["groupId"], verifyBool=verifyCerts)
-    processes = getProcessesForCluster(cluster, automationConfig)
-
-    rowData = []
-    for process in processes:
-        rowData.extend(getRowDataForProcess(cluster, group, process, automationConfig))
-
-    return rowData
-
-def getRowDataForProcess(cluster, group, process, automationConfig):
-    """
-    Get Row Data for Process
-
-    :param process:
-    :param automationConfig:
-    :return:
-    """
-    # Get host information
-    logging.debug("Getting host information for process {}".format(json.dumps(process, indent=4)))
-    hostname = process["hostname"]
-    port = process["args2_6"]["net"]["port"]
-    hostData = opsMgrConnector.getHostByHostnameAndPort(cluster["groupId"], hostname, port, verifyBool=verifyCerts)
-    logging.debug("Received host data {}".format(json.dumps(hostData, indent=4)))
-
-    hostType = hostData["typeName"]
-    hostStatus = "RECOVERING" if hostType == "RECOVERING" else ( "DOWN/NO RECENT PING" if hostType == "NO_DATA" else "HEALTHY")
-
-    # PRIMARY_TYPES = [ "REPLICA_PRIMARY", "SHARD_PRIMARY" ]
-    processType = "SECONDARY" if hostType == "RECOVERING" else hostType
-
-    # Get Databases for host
-    dbsSeen = []
-    pageNum = 0
-    dbsOnHost = opsMgrConnector.getDatabasesForHost(cluster["groupId"], hostData["id"], pageNum, verifyBool=verifyCerts)
-    while len(dbsSeen) < dbsOnHost["totalCount"]:
-        logging.debug("Examining page {} of db results; there are a total of {} dbs".format(pageNum, dbsOnHost["totalCount"]))
-        dbsSeen.extend([ db["databaseName"] for db in dbsOnHost["results"]])
-        pageNum += 1
-        dbsOnHost = opsMgrConnector.getDatabasesForHost(cluster["groupId"], hostData["id"], pageNum, verifyBool=verifyCerts)
-
-    dbsSeen.add("admin")
-
-    # TODO -- need to add for sharded cluster
-    clusterName = cluster["replicaSetName"] if "replicaSetName" in cluster else cluster["clusterName"]
-
-    # Create Row Data
-    rows = []
-    for db in dbsSeen:
-        rowData = RowData()
-        rowData.setProjectName(group["name"])
-        rowData.setProjectId(cluster["groupId"])
-        rowData.setClusterName(clusterName)
-        rowData.setClusterHost(process["hostname"])
-        rowData.setMDBVersion(process["version"])
-
-        # Add db info
-        rowData.setDB(db)
-
-        # Add host info
-        rowData.setStatus(hostStatus)
-        rowData.setOpenMode(processType)
-
-        data = rowData.getRowStr()
-        rows.append(data)
-    return rows
-
-
-def getProcessesForCluster(cluster, automationConfig=None):
-    """
-    Get Processes for Cluster
-
-    :param cluster:
-    :param automationConfig:
-    :return:
-    """
-    logging.debug("Getting processes for cluster with name " + cluster["clusterName"])
-    processes = []
-
-
-    replicaSetFound = False
-    if "replicaSetName" in cluster:
-        for replicaSet in automationConfig["replicaSets"]:
-            if replicaSet["_id"] == cluster["replicaSetName"]:
-                replicaSetFound = True
-                members = [ member["host"] for member in replicaSet["members"] ]
-                processes = [ process for process in automationConfig["processes"] if process["name"] in members]
-
-    # TODO -- finish this for sharding
-    # if not replicaSetFound:
-    #     for shardedCluster in automationConfig["shardedClusters"]:
-    #         if shardedCluster["_id"] == cluster["name"]:
-
-    return processes
-
-
 def checkOsCompatibility():
     """
     Check OS Compatibility
@@ -579,8 +490,14 @@ def setupArgs():
     parser.add_argument('--fileName',     required=False, action="store", dest='fileName',          default=None,                 help='Path of the file to write to; if not used, will write to standard out')
     parser.add_argument('--verifycerts',  required=False, action="store", dest='verifycerts',       default=True,                 help='Whether or not to verify TLS certs on HTTPS requests')
     parser.add_argument('--loglevel',     required=False, action="store", dest='logLevel',          default='info',                 help='Log level. Possible values are [none, info, verbose]')
+    parser.add_argument('--threads',      required=False, action="store", dest='threads',           default=DEFAULT_CRAWL_WORKERS,  help='Number of groups, clusters or hosts to crawl in parallel')
+    parser.add_argument('--maxInFlight',  required=False, action="store", dest='maxInFlight',       default=None,                   help='Maximum number of requests outstanding against ops manager at once; defaults to --threads')
+    parser.add_argument('--cacheFile',    required=False, action="store", dest='cacheFile',         default=None,                   help='Path of a file in which to cache slow changing ops manager metadata between runs; caching is off if not used')
+    parser.add_argument('--tsStoreDir',   required=False, action="store", dest='tsStoreDir',        default=None,                   help='Directory in which to keep collected measurements so later runs only fetch new samples; off if not used')
+    parser.add_argument('--refresh',      required=False, action="store_true", dest='refresh',      default=False,                  help='Include flag to refetch all cached metadata')
+    parser.add_argument('--metricsFile',  required=False, action="store", dest='metricsFile',       default=None,                   help='Path of a file to which to write per endpoint API call metrics on exit; off if not used')
+    parser.add_argument('--metricsFormat', required=False, action="store", dest='metricsFormat',    default='json',                 help='Format of the API call metrics. One of [json, prometheus]')
 
-    # TODO Command line arg for update/refresh
     return parser.parse_args()
 
 def _configureLogger(logLevel):
@@ -653,12 +570,35 @@ def main():
     # checkOsCompatibility()
 
     # Get Ops Manager connection
+    threads = int(args.threads)
+    maxInFlight = threads if args.maxInFlight is None else int(args.maxInFlight)
+    responseCache = None
+    if args.cacheFile is not None:
+        responseCache = ResponseCache(args.cacheFile, refresh=args.refresh)
     global opsMgrConnector
-    opsMgrConnector = OpsMgrConnector(args.opsMgrUri, args.opsMgrApiUser, args.opsMgrApiKey)
+    opsMgrConnector = OpsMgrConnector(args.opsMgrUri, args.opsMgrApiUser, args.opsMgrApiKey,
+                                      poolMaxSize=maxInFlight, maxInFlight=maxInFlight, responseCache=responseCache)
+    if args.metricsFile is not None:
+        opsMgrConnector.getApiMetrics().dumpOnExit(args.metricsFile, args.metricsFormat)
 
     global verifyCerts
-    verifyCerts = (args.verifycerts.lower() == 'true')
-    collect_storage_data(args.fileName, args.scale)
+    verifyCerts = (str(args.verifycerts).lower() == 'true')
+
+    global timeSeriesStore
+    if args.tsStoreDir is not None:
+        timeSeriesStore = TimeSeriesStore(args.tsStoreDir)
+
+    global hostIndex
+    hostIndex = ProjectHostIndex(opsMgrConnector, verifyBool=verifyCerts)
+
+    global crawler
+    with FleetCrawler(threads) as crawler:
+        collect_storage_data(args.fileName, args.scale)
+    logging.info("Ops Manager connection stats: {}".format(opsMgrConnector.getConnectionStats()))
+    opsMgrConnector.close()
+    if responseCache is not None:
+        logging.info("Response cache stats: {}".format(responseCache.getStats()))
+        responseCache.close()
 
 
 #-------------------------------
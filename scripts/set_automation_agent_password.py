@@ -11,7 +11,11 @@ import json
 import string
 from getpass import getpass
 
-from mdbaas.opsmgrutil import OpsMgrConnector
+from mdbaas.opsmgrutil import OpsMgrConnector, AutomationConfig, BulkAutomationUpdater
+from mdbaas.opsmgrutil.goalstate import waitForGoalState
+from mdbaas.opsmgrutil.bulkautomation import resolveGroupIds, formatSummary, DEFAULT_CONFLICT_RETRIES, \
+    DEFAULT_GOAL_STATE_TIMEOUT
+from mdbaas.util import LazyJson, DEFAULT_CRAWL_WORKERS
 
 # Script metadata
 version = "1.0.0"
@@ -236,14 +240,49 @@ def setPassword(projectId, newPass):
     logging.info("Setting password for automation agent user")
     global opsMgrConnector
 
-    # Get the existing user
-    automationConfig = opsMgrConnector.getAutomationConfig(projectId, verifyBool=False)
-    auth = automationConfig["auth"]
-    auth["newAutoPwd"] = newPass
+    automationConfig = AutomationConfig.load(opsMgrConnector, projectId, verifyBool=False)
+    automationConfig.setAutomationAgentPassword(newPass)
+
+    resp = automationConfig.save(opsMgrConnector, verifyBool=False)
+    logging.info("Got response: %s", LazyJson(resp))
+    if resp is None:
+        return
+    goalState = waitForGoalState(opsMgrConnector, projectId, version=automationConfig.getVersion(), verifyBool=False)
+    if goalState["converged"]:
+        logging.info("All processes reached goal version {}".format(goalState["version"]))
+    else:
+        logging.warning("Processes still behind goal version {}: {}".format(goalState["version"],
+                                                                            goalState["laggingProcesses"]))
+
+def setPasswordInProjects(groupIds, newPass, args):
+    """
+    Set Password In Projects
+
+    Sets the password for the automation agent user in many projects at once and waits for them to reach their
+    goal state
+
+    :param groupIds:    The ids of the projects to set the password in
+    :param newPass:     The new password of the automation agent user
+    :param args:        The parsed command line arguments with the bulk mode settings
+    :return:            The summary document of the BulkAutomationUpdater
+    """
+    logging.info("Setting password for the automation agent user in {} projects".format(len(groupIds)))
+    global opsMgrConnector
+
+    updater = BulkAutomationUpdater(opsMgrConnector, maxInFlight=args.maxInFlight,
+                                    maxConflictRetries=args.maxConflictRetries, waitForGoalState=not args.noWait,
+                                    goalStateTimeout=args.goalStateTimeout, verifyBool=False)
+
+    def modify(automationConfig):
+        # Projects already using the password are reported as unchanged
+        automationConfig.setAutomationAgentPassword(newPass)
+
+    summary = updater.run(groupIds, modify)
+    summaryStr = formatSummary(summary)
+    print(summaryStr)
+    logging.info(summaryStr)
+    return summary
 
-    # TODO -- wait until automation complete
-    resp = opsMgrConnector.putAutomationConfig(projectId, automationConfig, verifyBool=False)
-    logging.info("Got response: {}".format(json.dumps(resp, indent=4)))
 
 ########################################################################################################################
 # Base Methods
@@ -284,6 +323,21 @@ def setupArgs():
     # parser.add_argument('--projectAppName',           required=False, action="store", dest='projectAppName',    default=None,                help='The Application pneumonic.')
     # parser.add_argument('--projectAppEnv',            required=False, action="store", dest='projectAppEnv',     default=None,                help='The application environment. One of ' + APPLICATION_ENVS.__str__() )
 
+    parser.add_argument('--projectIds', required=False, action="store", dest='projectIds', nargs="+", default=None,
+                        help='Bulk mode: the ids of the projects to set the password in.')
+    parser.add_argument('--projectFile', required=False, action="store", dest='projectFile', default=None,
+                        help='Bulk mode: a file with the id of a project to set the password in on every line.')
+    parser.add_argument('--orgId', required=False, action="store", dest='orgId', default=None,
+                        help='Bulk mode: the id of an organization to set the password in all projects of.')
+    parser.add_argument('--maxInFlight', required=False, action="store", dest='maxInFlight', default=DEFAULT_CRAWL_WORKERS, type=int,
+                        help='Bulk mode: the maximum number of projects to update at the same time.')
+    parser.add_argument('--maxConflictRetries', required=False, action="store", dest='maxConflictRetries', default=DEFAULT_CONFLICT_RETRIES, type=int,
+                        help='Bulk mode: the number of times to retry a project whose automation config was modified concurrently.')
+    parser.add_argument('--goalStateTimeout', required=False, action="store", dest='goalStateTimeout', default=DEFAULT_GOAL_STATE_TIMEOUT, type=int,
+                        help='Bulk mode: the number of seconds to wait for all projects to reach their goal state.')
+    parser.add_argument('--noWait', required=False, action="store_true", dest='noWait', default=False,
+                        help='Bulk mode: do not wait for the projects to reach their goal state.')
+
     parser.add_argument('--dryRun', required=False, action="store_true", dest='dryRun', default=False,
                         help='Include this flag to test out the password without actually creating it.')
     parser.add_argument('--loglevel', required=False, action="store", dest='logLevel', default='info',
@@ -354,7 +408,9 @@ def main():
 
     # Get Ops Manager connection
     global opsMgrConnector
-    opsMgrConnector = OpsMgrConnector(args.opsMgrUri, args.opsMgrApiUser, args.opsMgrApiKey)
+    opsMgrConnector = OpsMgrConnector(args.opsMgrUri, args.opsMgrApiUser, args.opsMgrApiKey,
+                                      poolMaxSize=args.maxInFlight, maxInFlight=args.maxInFlight)
+    bulkMode = args.projectIds is not None or args.projectFile is not None or args.orgId is not None
 
     config = {
         # "projectAppEnv"  : args.projectAppEnv,
@@ -367,8 +423,14 @@ def main():
     validatedPass = capturePassword()
     dryRun = False if args.dryRun is None else args.dryRun
     if not dryRun:
-        logging.info("Setting automation agent password")
-        setPassword(args.projectId, validatedPass)
+        if bulkMode:
+            groupIds = resolveGroupIds(opsMgrConnector, args.projectIds, args.projectFile, args.orgId, verifyBool=False)
+            summary = setPasswordInProjects(groupIds, validatedPass, args)
+            if summary["failed"] > 0:
+                sys.exit(1)
+        else:
+            logging.info("Setting automation agent password")
+            setPassword(args.projectId, validatedPass)
     else:
         logging.info("DRY-RUN: Not Setting Password...")
 
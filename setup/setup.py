@@ -21,4 +21,12 @@ setup(
         'requests',
         'urllib3'
     ],
+    extras_require={
+        'async': [
+            'httpx'
+        ],
+        'compression': [
+            'brotli'
+        ]
+    },
 )